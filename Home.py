@@ -1,4 +1,5 @@
 import streamlit as st
+from cury.warmup import start_warmup, warmup_status
 
 st.set_page_config(
     page_title='Home',
@@ -11,6 +12,12 @@ st.sidebar.markdown('# Cury Company')
 st.sidebar.markdown('## Fastest Delivery in Town')
 st.sidebar.markdown('''---''')
 
+# pré-cálculo dos gráficos com os filtros padrão em segundo plano (uma thread por processo)
+start_warmup()
+status = warmup_status()
+if status.running:
+    st.sidebar.progress(status.done / max(status.total, 1), text=f'Preparando os painéis: {status.done}/{status.total}')
+
 st.write('# Cury Company Growth Dashboard')
 st.markdown(
     '''
@@ -0,0 +1,7 @@
+'''
+Módulos compartilhados pelas páginas do Growth Dashboard da Cury Company.
+
+Os submódulos são importados diretamente (ex.: from cury.loader import load_orders)
+para que os utilitários de linha de comando (python -m cury.store) não carreguem
+o pacote inteiro.
+'''
@@ -0,0 +1,776 @@
+'''
+Backend de cálculo das métricas das páginas e da API (cury.metrics).
+
+    - pandas (padrão): o data frame limpo fica na memória do processo (cury.loader) e as
+      agregações são feitas sobre o recorte dos filtros (índice de posições por data e categoria).
+    - duckdb: o data frame limpo fica num arquivo Parquet ao lado do csv e cada agregação é
+      uma consulta SQL no DuckDB, com os filtros e o agrupamento executados no próprio
+      arquivo (só as colunas e os grupos de linhas necessários são lidos). Os pedidos não
+      são carregados na memória do processo; só os resultados das consultas.
+
+As consultas calculam as mesmas células dos módulos em pandas (contagens, somas e somas
+dos quadrados do cubo diário e do resumo do tempo, estatística por entregador, pares de
+entregadores dos sketches, restaurantes distintos), e o restante é o mesmo código
+(rollup, summary, ranking, sketch, spatial), então os dois backends produzem os mesmos
+resultados, a menos da ordem das somas de ponto flutuante.
+
+As funções recebem Filters (filtros da barra lateral e arquivo de origem), então podem
+ser passadas direto ao cached_result (cury.figcache). A escolha do backend vale para o processo:
+CURY_BACKEND=duckdb (ou configure('duckdb')); sem o duckdb instalado fica o pandas.
+
+Uso:
+    python -m cury.backend train.csv                # grava o Parquet (etapa de build)
+    CURY_BACKEND=duckdb streamlit run Home.py
+'''
+# Import libraries
+import argparse
+import os
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from cury import couriers, geo, spatial, store
+from cury.figcache import normalize_filters
+from cury.geo import AVG_EARTH_RADIUS_KM
+from cury.geobins import BIN_KEYS, CELL_DEG, POINTS, GeoBins, load_geo_bins as _load_geo_bins
+from cury.index import date_cut, load_index, select_positions
+from cury.loader import DATA_PATH, data_key, file_key, load_derived, load_orders
+from cury.ranking import RANK_STATS, courier_stats, rank_stats
+from cury.rollup import CUBE_KEYS, MEASURES, DailyCube, build_cube, cube_mean_std, filter_cube, load_cube as _load_cube
+from cury.sketch import COURIER_KEYS, TIME_COLUMN, TIME_KEYS, sketches_from_counts
+from cury.sketch import load_sketches as _load_sketches
+from cury.summary import SUMMARY_KEYS, summary_cells, summary_from_cells
+
+try:
+    import duckdb
+    from pyarrow import parquet as pq
+except ImportError:  # sem duckdb (ou pyarrow) só o backend pandas fica disponível
+    duckdb = None
+    pq = None
+
+BACKENDS = ['pandas', 'duckdb']
+
+# colunas dos filtros de categoria
+FILTER_COLUMNS = {'traffic': 'Road_traffic_density', 'weather': 'Weatherconditions', 'city': 'City'}
+
+# colunas categóricas no pandas: os resultados das consultas voltam como texto e são convertidos
+CATEGORY_COLUMNS = ['City', 'Road_traffic_density', 'Weatherconditions', 'Festival', 'Type_of_order',
+                    'Delivery_person_ID']
+
+# dias antes da data limite em que um entregador conta como ativo nas consultas por raio
+ACTIVE_DAYS = 7
+
+# date: data limite (exclusiva); traffic, weather, city: listas de valores aceitos (None = todos);
+# path: arquivo csv de origem
+Filters = namedtuple('Filters', ['date', 'traffic', 'weather', 'city', 'path'],
+                     defaults=(None, None, None, None, DATA_PATH))
+
+# orders: pedidos entregues no raio; active_couriers: entregadores distintos desses pedidos nos
+# ACTIVE_DAYS dias antes da data limite; restaurants: restaurantes no raio
+RadiusStats = namedtuple('RadiusStats', ['orders', 'active_couriers', 'restaurants'])
+
+_backend = 'pandas'
+# caminho absoluto do csv -> (chave do arquivo, caminho do Parquet atualizado)
+_parquets = {}
+_lock = threading.Lock()
+# por thread: cursor do DuckDB e o último recorte filtrado em pandas
+_local = threading.local()
+_database = None
+
+
+def configure(name=None):
+    '''
+    Função que escolhe o backend das métricas.
+    Input: 'pandas' ou 'duckdb'; None lê a variável CURY_BACKEND (padrão: pandas)
+    '''
+    global _backend
+    if name is None:
+        name = os.environ.get('CURY_BACKEND', '').strip().lower() or 'pandas'
+    if name not in BACKENDS:
+        raise ValueError(f'backend desconhecido: {name!r} (use um de {BACKENDS})')
+    _backend = name
+
+
+def active():
+    '''
+    Função que retorna o backend em uso (o duckdb só quando a biblioteca está instalada).
+    Output: 'pandas' ou 'duckdb'
+    '''
+    return 'duckdb' if _backend == 'duckdb' and duckdb is not None else 'pandas'
+
+
+def filter_values(valores):
+    '''
+    Função que normaliza um filtro de categoria, que aceita um valor único ou uma lista de valores.
+    Input: texto, lista de valores ou None (todos)
+    Output: lista ou None
+    '''
+    if valores is None:
+        return None
+    return [valores] if isinstance(valores, str) else list(valores)
+
+
+# =========================================
+# Armazenamento em Parquet
+# =========================================
+def parquet_path(csv_path):
+    '''
+    Função que retorna o caminho padrão do Parquet, ao lado do csv de origem.
+    Input: caminho do csv
+    Output: caminho do arquivo .parquet
+    '''
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+
+def parquet_is_fresh(csv_path, out=None):
+    '''
+    Função que verifica se o Parquet corresponde ao csv atual e à versão do schema
+    (os mesmos metadados do cache colunar de cury.store).
+    Input: caminho do csv e do Parquet
+    Output: bool
+    '''
+    out = out or parquet_path(csv_path)
+    if pq is None or not os.path.exists(out):
+        return False
+    try:
+        metadata = pq.read_schema(out).metadata or {}
+    except (OSError, store.pa.ArrowInvalid):
+        return False
+    return store.metadata_is_fresh(metadata, csv_path)
+
+
+def build_parquet(csv_path, out=None, chunksize=100_000):
+    '''
+    Função que grava o data frame limpo em Parquet a partir do cache colunar de cury.store
+    (gerado em modo streaming quando está desatualizado), um record batch por vez: a
+    memória usada depende do tamanho dos blocos, e não do tamanho do csv. Os pedidos já
+    estão ordenados por data (em cada arquivo do cache, incluindo os deltas das ingestões),
+    então as estatísticas de cada grupo de linhas permitem ao DuckDB pular os grupos fora
+    do filtro de data. A escrita é atômica.
+    Input: caminho do csv, caminho de saída (padrão: parquet_path(csv_path)), linhas por bloco
+    Output: caminho do arquivo gravado
+    '''
+    if pq is None:
+        raise ImportError('pyarrow é necessário para gravar o Parquet')
+    out = out or parquet_path(csv_path)
+    origem = store.store_path(csv_path)
+    cadeia = store.fresh_chain(csv_path, origem)
+    if cadeia is None:
+        store.build_store_streaming(csv_path, origem, chunksize)
+        cadeia = store.store_chain(csv_path, origem)
+
+    # schema do arquivo base com a identificação do csv do último delta; os deltas têm as
+    # próprias categorias e são convertidos para os tipos do arquivo base
+    metadata = dict(cadeia[0][1])
+    metadata.update({k: v for k, v in cadeia[-1][1].items() if k.startswith(b'cury.')})
+    tmp = f'{out}.{os.getpid()}.tmp'
+    try:
+        writer = None
+        for caminho, _ in cadeia:
+            with store.pa.memory_map(caminho) as source:
+                reader = store.pa.ipc.open_file(source)
+                if writer is None:
+                    schema = reader.schema.with_metadata(metadata)
+                    writer = pq.ParquetWriter(tmp, schema)
+                for i in range(reader.num_record_batches):
+                    writer.write_table(store.pa.Table.from_batches([reader.get_batch(i)]).cast(schema))
+        writer.close()
+        os.replace(tmp, out)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return out
+
+
+def parquet_source(path=DATA_PATH):
+    '''
+    Função que retorna o Parquet da versão atual do csv, gravando-o quando necessário
+    (uma verificação por versão do arquivo e por processo).
+    Input: caminho do csv
+    Output: caminho do Parquet
+    '''
+    key = file_key(path)
+    with _lock:
+        cached = _parquets.get(key[0])
+        if cached is None or cached[0] != key:
+            out = parquet_path(key[0])
+            if not parquet_is_fresh(key[0], out):
+                build_parquet(key[0], out)
+            cached = (key, out)
+            _parquets[key[0]] = cached
+    return cached[1]
+
+
+def prepare(path=DATA_PATH):
+    '''
+    Função que deixa os dados prontos para as consultas do backend em uso: o data frame
+    limpo em memória (pandas) ou o Parquet atualizado (duckdb).
+    Input: caminho do csv
+    '''
+    if active() == 'duckdb':
+        parquet_source(path)
+    else:
+        load_orders(path)
+
+
+# =========================================
+# Consultas no DuckDB
+# =========================================
+def _cursor():
+    '''
+    Função que retorna o cursor do DuckDB da thread atual (todos sobre o mesmo banco em memória).
+    '''
+    global _database
+    cursor = getattr(_local, 'cursor', None)
+    if cursor is None:
+        with _lock:
+            if _database is None:
+                _database = duckdb.connect()
+        cursor = _local.cursor = _database.cursor()
+    return cursor
+
+
+def _col(nome):
+    return '"' + nome.replace('"', '""') + '"'
+
+
+def _where(filters, keys=()):
+    '''
+    Função que traduz os filtros na condição WHERE (com parâmetros). As chaves de
+    agrupamento nulas ficam de fora, como no groupby do pandas.
+    Output: tupla (texto da condição, dicionário de parâmetros nomeados)
+    '''
+    condicoes, params = [], {}
+    if filters.date is not None:
+        condicoes.append('Order_Date < $date')
+        params['date'] = pd.Timestamp(filters.date).to_pydatetime()
+    for campo, coluna in FILTER_COLUMNS.items():
+        valores = filter_values(getattr(filters, campo))
+        if valores is None:
+            continue
+        nomes = [f'{campo}_{i}' for i in range(len(valores))]
+        condicoes.append(f'{_col(coluna)} IN ({", ".join("$" + n for n in nomes)})' if valores else 'FALSE')
+        params.update(zip(nomes, valores))
+    condicoes += [f'{_col(k)} IS NOT NULL' for k in keys]
+    return ' AND '.join(condicoes) or 'TRUE', params
+
+
+def _source(path):
+    return "read_parquet('" + parquet_source(path).replace("'", "''") + "')"
+
+
+def _categories(path=DATA_PATH):
+    '''
+    Função que retorna os tipos das colunas categóricas do dataset completo: as categorias
+    são os valores distintos em ordem alfabética, como em cury.cleaning.to_categorical.
+    Calculado uma vez por versão do arquivo, para que os resultados de todas as consultas
+    tenham as mesmas categorias do data frame do backend pandas (inclusive as que não
+    aparecem no recorte).
+    Input: caminho do csv
+    Output: dicionário coluna -> CategoricalDtype
+    '''
+    def montar(caminho):
+        tipos = {}
+        for col in CATEGORY_COLUMNS:
+            valores = _cursor().execute(
+                f'SELECT DISTINCT {_col(col)} AS v FROM {_source(caminho)} WHERE {_col(col)} IS NOT NULL').df()['v']
+            tipos[col] = pd.CategoricalDtype(pd.Index(valores.to_numpy()).sort_values())
+        return tipos
+    return load_derived('categories:duckdb', montar, path, from_path=True)
+
+
+def _query(sql, filters, keys=(), params=None):
+    '''
+    Função que executa a consulta sobre o Parquet do recorte. No texto, {src} é a tabela
+    de pedidos e {where} a condição dos filtros (chaves de agrupamento não nulas incluídas);
+    params são os demais parâmetros nomeados ($nome) da consulta.
+    Output: Dataframe com as colunas categóricas convertidas como no pandas
+    '''
+    where, valores = _where(filters, keys)
+    valores.update(params or {})
+    df_aux = _cursor().execute(sql.format(src=_source(filters.path), where=where), valores).df()
+    tipos = None
+    for col in CATEGORY_COLUMNS:
+        if col in df_aux.columns:
+            tipos = tipos or _categories(filters.path)
+            df_aux[col] = df_aux[col].astype(tipos[col])
+    return df_aux
+
+
+def _keys(keys):
+    return ', '.join(_col(k) for k in keys)
+
+
+def query_cube(filters):
+    '''
+    Função que monta o cubo diário (cury.rollup) do recorte com duas consultas: as células
+    (contagem, n, soma e soma dos quadrados de cada medida) e os pares distintos
+    (dia, trânsito, entregador), cujo hash é calculado como em build_cube.
+    Input: Filters
+    Output: DailyCube
+    '''
+    medidas = []
+    for name, col in MEASURES.items():
+        valor = f'CAST({_col(col)} AS DOUBLE)'
+        medidas += [f'count({valor}) AS {name}_n',
+                    f'coalesce(sum({valor}), 0) AS {name}_sum',
+                    f'coalesce(sum({valor} * {valor}), 0) AS {name}_sq']
+    cells = _query(f'''
+        SELECT {_keys(CUBE_KEYS)}, count(*) AS orders, {", ".join(medidas)}
+        FROM {{src}} WHERE {{where}}
+        GROUP BY {_keys(CUBE_KEYS)} ORDER BY {_keys(CUBE_KEYS)}''', filters, CUBE_KEYS)
+
+    pares = _query('''
+        SELECT DISTINCT Order_Date, Road_traffic_density, Delivery_person_ID
+        FROM {src} WHERE {where}''', filters)
+    couriers_aux = pd.DataFrame({
+        'Order_Date': pares['Order_Date'].to_numpy(),
+        'Road_traffic_density': pares['Road_traffic_density'].to_numpy(),
+        'courier': pd.util.hash_pandas_object(pares['Delivery_person_ID'], index=False).to_numpy(),
+    })
+    return DailyCube(cells, couriers_aux)
+
+
+def query_geo_bins(filters, cell=CELL_DEG):
+    '''
+    Função que conta os pedidos por dia, trânsito e célula da grade (cury.geobins) direto no DuckDB.
+    Input: Filters, tamanho da célula em graus
+    Output: GeoBins
+    '''
+    camadas = {}
+    for camada, (lat, lon) in POINTS.items():
+        camadas[camada] = _query(f'''
+            SELECT Order_Date, Road_traffic_density,
+                   CAST(floor({_col(lat)} / $cell) AS INTEGER) AS ilat,
+                   CAST(floor({_col(lon)} / $cell) AS INTEGER) AS ilon,
+                   count(*) AS orders
+            FROM {{src}} WHERE {{where}}
+            GROUP BY ALL ORDER BY {_keys(BIN_KEYS)}''', filters, COURIER_KEYS, params={'cell': float(cell)})
+    return GeoBins(camadas['delivery'], camadas['restaurant'], cell)
+
+
+def query_sketches(filters):
+    '''
+    Função que monta os sketches diários (cury.sketch) a partir de duas agregações no
+    DuckDB: os pares distintos (dia, trânsito, entregador) e a quantidade de pedidos de
+    cada tempo de entrega por TIME_KEYS.
+    Input: Filters
+    Output: DailySketches
+    '''
+    pares = _query(f'''
+        SELECT DISTINCT {_keys(COURIER_KEYS)}, Delivery_person_ID
+        FROM {{src}} WHERE {{where}}''', filters, COURIER_KEYS)
+    tempos = _query(f'''
+        SELECT {_keys(TIME_KEYS)}, {_col(TIME_COLUMN)}, count(*) AS count
+        FROM {{src}} WHERE {{where}}
+        GROUP BY ALL''', filters, TIME_KEYS + [TIME_COLUMN])
+    return sketches_from_counts(pares, tempos)
+
+
+def query_restaurants(filters):
+    '''
+    Função que lista os restaurantes (pares de coordenadas distintos) com a quantidade de
+    pedidos, como em cury.spatial.build_geo_index.
+    Input: Filters
+    Output: Dataframe com lat, lon e orders
+    '''
+    return _query('''
+        SELECT Restaurant_latitude AS lat, Restaurant_longitude AS lon, count(*) AS orders
+        FROM {src} WHERE {where}
+        GROUP BY ALL ORDER BY lat, lon''', filters, ['Restaurant_latitude', 'Restaurant_longitude'])
+
+
+def query_summary_cells(filters):
+    '''
+    Função que calcula as células do resumo do tempo (cury.summary.summary_cells) no DuckDB.
+    Output: tupla (Dataframe das células, deslocamento)
+    '''
+    # deslocamento pela média do recorte, como em summary_cells
+    deslocamento = _query(f'SELECT avg(CAST({_col(TIME_COLUMN)} AS DOUBLE)) AS media FROM {{src}} WHERE {{where}}',
+                          filters)['media'].iloc[0]
+    deslocamento = 0.0 if pd.isna(deslocamento) else float(deslocamento)
+    tempo = f'(CAST({_col(TIME_COLUMN)} AS DOUBLE) - $deslocamento)'
+    celulas = _query(f'''
+        SELECT {_keys(SUMMARY_KEYS)}, count(*) AS n, sum({tempo}) AS soma,
+               sum({tempo} * {tempo}) AS quadrados, sum(distance) AS distancia
+        FROM {{src}} WHERE {{where}}
+        GROUP BY ALL ORDER BY {_keys(SUMMARY_KEYS)}''', filters, SUMMARY_KEYS, params={'deslocamento': deslocamento})
+    return celulas, deslocamento
+
+
+def query_courier_stats(filters, stat='mean', trim=0.1):
+    '''
+    Função que calcula a estatística do tempo de entrega de cada entregador por cidade
+    (cury.ranking.courier_stats) no DuckDB. A média aparada descarta floor(n * trim)
+    valores em cada ponta, pela posição do valor dentro do grupo.
+    Input: Filters, 'mean', 'median' ou 'trimmed', fração descartada em cada ponta
+    Output: Series indexada por (City, Delivery_person_ID), ordenada pelas chaves
+    '''
+    keys = ['City', 'Delivery_person_ID']
+    tempo = _col(TIME_COLUMN)
+    if stat in ('mean', 'median'):
+        funcao = 'avg' if stat == 'mean' else 'median'
+        df_aux = _query(f'''
+            SELECT City, Delivery_person_ID, {funcao}(CAST({tempo} AS DOUBLE)) AS {tempo}
+            FROM {{src}} WHERE {{where}}
+            GROUP BY ALL ORDER BY City, Delivery_person_ID''', filters, keys)
+    elif stat == 'trimmed':
+        df_aux = _query(f'''
+            SELECT City, Delivery_person_ID, avg(CAST({tempo} AS DOUBLE)) AS {tempo}
+            FROM (
+                SELECT City, Delivery_person_ID, {tempo},
+                       row_number() OVER (PARTITION BY City, Delivery_person_ID ORDER BY {tempo}) AS posicao,
+                       count(*) OVER (PARTITION BY City, Delivery_person_ID) AS n
+                FROM {{src}} WHERE {{where}}
+            )
+            WHERE posicao > floor(n * $trim) AND posicao <= n - floor(n * $trim)
+            GROUP BY ALL ORDER BY City, Delivery_person_ID''', filters, keys + [TIME_COLUMN], params={'trim': float(trim)})
+    else:
+        raise ValueError(f'estatística desconhecida: {stat!r} (use uma de {RANK_STATS})')
+    return df_aux.set_index(keys)[TIME_COLUMN]
+
+
+def _haversine_sql(lat, lon, coluna_lat, coluna_lon):
+    '''
+    Função que escreve a distância haversine (em km) do ponto (lat, lon) até as colunas,
+    na mesma ordem de operações de cury.geo.haversine_km.
+    '''
+    def radianos(valor):
+        return f'({valor} * {np.pi / 180!r})'
+
+    lat1, lon1 = radianos(repr(float(lat))), radianos(repr(float(lon)))
+    lat2, lon2 = radianos(_col(coluna_lat)), radianos(_col(coluna_lon))
+    return (f'({AVG_EARTH_RADIUS_KM!r} * 2 * asin(sqrt(pow(sin(({lat2} - {lat1}) * 0.5), 2) + '
+            f'cos({lat1}) * cos({lat2}) * pow(sin(({lon2} - {lon1}) * 0.5), 2))))')
+
+
+def query_radius(filters, lat, lon, radius_km, days=ACTIVE_DAYS):
+    '''
+    Função que conta, no DuckDB, os pedidos entregues a até radius_km do ponto (lat, lon)
+    e os entregadores distintos desses pedidos nos days dias antes da data limite. Um
+    filtro pela faixa de latitude do círculo descarta a maioria das linhas antes da distância.
+    Input: Filters, latitude e longitude em graus, raio em km, dias da janela de entregadores ativos
+    Output: tupla (pedidos, entregadores ativos)
+    '''
+    lat_col, lon_col = geo.DISTANCE_COLUMNS[:2]
+    # margem na faixa de latitude: o arredondamento nunca descarta um ponto dentro do raio
+    dlat = np.degrees(radius_km / AVG_EARTH_RADIUS_KM) * (1 + 1e-9) + 1e-9
+    if filters.date is None:
+        ativos, params = 'TRUE', {}
+    else:
+        inicio = pd.Timestamp(filters.date) - pd.Timedelta(days=days)
+        ativos, params = 'Order_Date >= $inicio', {'inicio': inicio.to_pydatetime()}
+    df_aux = _query(f'''
+        SELECT count(*) AS orders,
+               count(DISTINCT Delivery_person_ID) FILTER (WHERE {ativos}) AS active_couriers
+        FROM {{src}}
+        WHERE {{where}}
+          AND isfinite({_col(lat_col)}) AND isfinite({_col(lon_col)}) AND abs({_col(lat_col)}) <= 90
+          AND {_col(lat_col)} BETWEEN $lat_min AND $lat_max
+          AND {_haversine_sql(lat, lon, lat_col, lon_col)} <= $raio''',
+        filters, params=dict(params, lat_min=float(lat - dlat), lat_max=float(lat + dlat), raio=float(radius_km)))
+    return int(df_aux['orders'].iloc[0]), int(df_aux['active_couriers'].iloc[0])
+
+
+# =========================================
+# Estruturas derivadas (uma vez por versão dos dados)
+# =========================================
+def load_cube(path=DATA_PATH):
+    '''
+    Função que retorna o cubo diário da versão atual dos dados, pelo backend em uso.
+    Input: caminho do arquivo csv
+    Output: DailyCube
+    '''
+    if active() == 'duckdb':
+        return load_derived('daily_cube:duckdb', lambda p: query_cube(Filters(path=p)), path, from_path=True)
+    return _load_cube(path)
+
+
+def load_geo_bins(path=DATA_PATH):
+    '''
+    Função que retorna a grade espacial da versão atual dos dados, pelo backend em uso.
+    Input: caminho do arquivo csv
+    Output: GeoBins
+    '''
+    if active() == 'duckdb':
+        return load_derived('geo_bins:duckdb', lambda p: query_geo_bins(Filters(path=p)), path, from_path=True)
+    return _load_geo_bins(path)
+
+
+def load_sketches(path=DATA_PATH):
+    '''
+    Função que retorna os sketches diários da versão atual dos dados, pelo backend em uso.
+    Input: caminho do arquivo csv
+    Output: DailySketches
+    '''
+    if active() == 'duckdb':
+        return load_derived('daily_sketches:duckdb', lambda p: query_sketches(Filters(path=p)), path, from_path=True)
+    return _load_sketches(path)
+
+
+def _restaurant_index(path):
+    restaurantes = query_restaurants(Filters(path=path))
+    return spatial.GeoIndex(restaurantes, spatial.build_spatial_index(restaurantes['lat'], restaurantes['lon']), None)
+
+
+def load_geo_index(path=DATA_PATH):
+    '''
+    Função que retorna os índices espaciais da versão atual dos dados. No duckdb só os
+    restaurantes são indexados (os pedidos no raio são consultados no Parquet), então
+    delivery_index é None.
+    Input: caminho do arquivo csv
+    Output: GeoIndex
+    '''
+    if active() == 'duckdb':
+        return load_derived('geo_index:duckdb', _restaurant_index, path, from_path=True)
+    return spatial.load_geo_index(path)
+
+
+def derived_loaders():
+    '''
+    Função que lista as estruturas derivadas usadas pelas páginas no backend em uso (para o pré-cálculo).
+    Output: lista de funções (path) -> estrutura
+    '''
+    loaders = [load_cube, load_geo_bins, load_geo_index, load_sketches]
+    return loaders if active() == 'duckdb' else [load_index] + loaders
+
+
+# =========================================
+# Recortes em pandas
+# =========================================
+def _positions(filters):
+    '''
+    Função que converte os filtros em posições do data frame limpo (índice por data,
+    trânsito e clima; cidade por isin).
+    Output: array de posições (ordenado) ou slice
+    '''
+    filtros = {FILTER_COLUMNS[nome]: filter_values(getattr(filters, nome))
+               for nome in ('traffic', 'weather') if getattr(filters, nome) is not None}
+    posicoes = select_positions(load_index(filters.path), filters.date, filtros)
+    if filters.city is None:
+        return posicoes
+    if isinstance(posicoes, slice):
+        posicoes = np.arange(posicoes.start or 0, posicoes.stop)
+    cidades = load_orders(filters.path)['City'].isin(filter_values(filters.city)).to_numpy()
+    return posicoes[cidades[posicoes]]
+
+
+def _orders(filters):
+    '''
+    Função que aplica os filtros ao data frame limpo. O último recorte de cada thread fica
+    guardado: os widgets de uma mesma execução da página filtram os pedidos uma única vez.
+    Output: Dataframe filtrado
+    '''
+    key = (data_key(filters.path), normalize_filters(filters._asdict()))
+    ultimo = getattr(_local, 'orders', None)
+    if ultimo is None or ultimo[0] != key:
+        df1 = load_orders(filters.path)
+        posicoes = _positions(filters)
+        df1 = df1.iloc[posicoes] if isinstance(posicoes, slice) else df1.take(posicoes)
+        ultimo = _local.orders = (key, df1)
+    return ultimo[1]
+
+
+# =========================================
+# Métricas por recorte
+# =========================================
+def filtered_cube(filters):
+    '''
+    Função que retorna o cubo diário do recorte: o cubo em cache filtrado por data e
+    trânsito ou, com filtros de clima ou cidade (que os conjuntos de entregadores do
+    cubo não guardam), um cubo montado só para o recorte.
+    Input: Filters
+    Output: DailyCube
+    '''
+    if filters.weather is None and filters.city is None:
+        return filter_cube(load_cube(filters.path), filters.date, filter_values(filters.traffic))
+    if active() == 'duckdb':
+        return query_cube(filters)
+    return build_cube(_orders(filters))
+
+
+def _cube_cells(filters):
+    '''
+    Função que retorna as células do cubo em cache no recorte. As células têm todas as
+    colunas dos filtros (inclusive clima e cidade), então servem às medidas de qualquer
+    recorte; os conjuntos de entregadores ficam de fora.
+    Input: Filters
+    Output: DailyCube sem os entregadores
+    '''
+    cells = filter_cube(load_cube(filters.path), filters.date, filter_values(filters.traffic)).cells
+    for campo in ['weather', 'city']:
+        valores = filter_values(getattr(filters, campo))
+        if valores is not None:
+            cells = cells.loc[cells[FILTER_COLUMNS[campo]].isin(valores), :]
+    return DailyCube(cells, None)
+
+
+def city_centers(filters):
+    '''
+    Função que calcula a mediana dos locais de entrega de cada cidade por densidade de tráfego.
+    Input: Filters
+    Output: Dataframe com City, Road_traffic_density, Delivery_location_latitude e Delivery_location_longitude
+    '''
+    if active() == 'pandas':
+        return geo.city_centers(_orders(filters))
+    lat, lon = geo.DISTANCE_COLUMNS[:2]
+    return _query(f'''
+        SELECT {_keys(geo.CENTER_KEYS)}, median({_col(lat)}) AS {_col(lat)}, median({_col(lon)}) AS {_col(lon)}
+        FROM {{src}} WHERE {{where}}
+        GROUP BY ALL ORDER BY {_keys(geo.CENTER_KEYS)}''', filters, geo.CENTER_KEYS)
+
+
+def courier_overview(filters):
+    '''
+    Função que calcula a maior e a menor idade dos entregadores e a melhor e a pior condição dos veículos.
+    Input: Filters
+    Output: CourierOverview
+    '''
+    if active() == 'pandas':
+        return couriers.courier_overview(_orders(filters))
+    linha = _query('''
+        SELECT max(Delivery_person_Age) AS max_age, min(Delivery_person_Age) AS min_age,
+               max(Vehicle_condition) AS best_vehicle, min(Vehicle_condition) AS worst_vehicle
+        FROM {src} WHERE {where}''', filters).iloc[0]
+    # recorte vazio: NaN, como o max/min do pandas
+    return couriers.CourierOverview(*(np.nan if pd.isna(v) else v for v in linha))
+
+
+def rating_by_courier(filters):
+    '''
+    Função que calcula a avaliação média de cada entregador.
+    Input: Filters
+    Output: Dataframe com Delivery_person_ID e Delivery_person_Ratings
+    '''
+    if active() == 'pandas':
+        return couriers.rating_by_courier(_orders(filters))
+    nota = _col(couriers.RATING_COLUMN)
+    return _query(f'''
+        SELECT Delivery_person_ID, avg({nota}) AS {nota}
+        FROM {{src}} WHERE {{where}}
+        GROUP BY ALL ORDER BY Delivery_person_ID''', filters, ['Delivery_person_ID'])
+
+
+def rating_stats(filters, column, label=None):
+    '''
+    Função que calcula a média e o desvio padrão das avaliações por uma coluna (ex.: trânsito ou clima).
+    Colunas do cubo diário são respondidas pelas somas e somas dos quadrados das células,
+    sem ler os pedidos.
+    Input: Filters, coluna do agrupamento, nome da coluna no resultado (padrão: column)
+    Output: Dataframe com a coluna do agrupamento, Delivery_mean e Delivery_std
+    '''
+    if column in CUBE_KEYS:
+        df_aux = cube_mean_std(_cube_cells(filters), [column], 'rating').loc[:, [column, 'avg', 'std']]
+        df_aux.columns = [label or column, 'Delivery_mean', 'Delivery_std']
+        return df_aux
+    if active() == 'pandas':
+        return couriers.rating_stats(_orders(filters), column, label)
+    nota = _col(couriers.RATING_COLUMN)
+    df_aux = _query(f'''
+        SELECT {_col(column)}, avg({nota}) AS Delivery_mean, stddev_samp({nota}) AS Delivery_std
+        FROM {{src}} WHERE {{where}}
+        GROUP BY ALL ORDER BY {_col(column)}''', filters, [column])
+    df_aux.columns = [label or column, 'Delivery_mean', 'Delivery_std']
+    return df_aux
+
+
+def rank_couriers(filters, k=10, stat='mean', trim=0.1):
+    '''
+    Função que encontra os k entregadores mais rápidos e os k mais lentos de cada cidade.
+    Input: Filters, quantidade por cidade, estatística ('mean', 'median' ou 'trimmed') e corte da média aparada
+    Output: Ranking
+    '''
+    if active() == 'pandas':
+        return rank_stats(courier_stats(_orders(filters), stat, trim), k)
+    return rank_stats(query_courier_stats(filters, stat, trim), k)
+
+
+def time_summary(filters):
+    '''
+    Função que calcula as médias, desvios padrão e contagens do tempo de entrega da visão restaurante.
+    Input: Filters
+    Output: TimeSummary
+    '''
+    if active() == 'pandas':
+        return summary_from_cells(*summary_cells(_orders(filters)))
+    return summary_from_cells(*query_summary_cells(filters))
+
+
+def count_couriers(filters):
+    '''
+    Função que conta exatamente os entregadores distintos do recorte.
+    Input: Filters
+    Output: int
+    '''
+    if active() == 'pandas':
+        return int(_orders(filters)['Delivery_person_ID'].nunique())
+    return int(_query('SELECT count(DISTINCT Delivery_person_ID) AS n FROM {src} WHERE {where}', filters)['n'].iloc[0])
+
+
+def restaurant_center(filters):
+    '''
+    Função que calcula a mediana da localização dos restaurantes dos pedidos do recorte.
+    Input: Filters
+    Output: tupla (latitude, longitude), ou None quando não há pedidos no recorte
+    '''
+    if active() == 'pandas':
+        df1 = _orders(filters)
+        if len(df1) == 0:
+            return None
+        ponto = df1.loc[:, ['Restaurant_latitude', 'Restaurant_longitude']].median()
+        return float(ponto.iloc[0]), float(ponto.iloc[1])
+    linha = _query('''
+        SELECT median(Restaurant_latitude) AS lat, median(Restaurant_longitude) AS lon
+        FROM {src} WHERE {where}''', filters).iloc[0]
+    return None if pd.isna(linha['lat']) else (float(linha['lat']), float(linha['lon']))
+
+
+def radius_stats(filters, lat, lon, radius_km, days=ACTIVE_DAYS):
+    '''
+    Função que conta os pedidos entregues a até radius_km do ponto (lat, lon), os
+    entregadores ativos desses pedidos (days dias antes da data limite; sem data limite,
+    todo o recorte) e os restaurantes no raio.
+    Input: Filters, latitude e longitude em graus, raio em km, dias da janela
+    Output: RadiusStats
+    '''
+    indice_geo = load_geo_index(filters.path)
+    restaurantes = len(spatial.query_radius(indice_geo.restaurant_index, lat, lon, radius_km)[0])
+    if active() == 'duckdb':
+        return RadiusStats(*query_radius(filters, lat, lon, radius_km, days), restaurantes)
+
+    perto = spatial.orders_near(indice_geo, lat, lon, radius_km, _positions(filters))
+    semana = perto
+    if filters.date is not None:
+        indice = load_index(filters.path)
+        inicio = pd.Timestamp(filters.date) - pd.Timedelta(days=days)
+        semana = spatial.restrict(perto, slice(date_cut(indice, inicio), date_cut(indice, filters.date)))
+    ativos = load_orders(filters.path)['Delivery_person_ID'].take(semana).nunique()
+    return RadiusStats(len(perto), int(ativos), restaurantes)
+
+
+def nearest_restaurants(lat, lon, k=10, path=DATA_PATH):
+    '''
+    Função que encontra os k restaurantes mais próximos do ponto (lat, lon), entre todos os restaurantes.
+    Input: latitude e longitude em graus, quantidade de restaurantes, caminho do arquivo csv
+    Output: Dataframe com lat, lon, orders e distance_km
+    '''
+    return spatial.nearest_restaurants(load_geo_index(path), lat, lon, k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grava o Parquet do dataset de pedidos limpo (backend duckdb).')
+    parser.add_argument('csv_path', nargs='?', default=DATA_PATH)
+    parser.add_argument('--out', default=None, help='arquivo de saída (padrão: <csv>.parquet)')
+    parser.add_argument('--chunksize', type=int, default=100_000,
+                        help='linhas por bloco quando o cache colunar precisa ser regravado')
+    args = parser.parse_args()
+    out = build_parquet(args.csv_path, args.out, args.chunksize)
+    print(f'Parquet gravado em {out} (schema v{store.SCHEMA_VERSION})')
+
+
+configure()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,426 @@
+'''
+Benchmark das funções de dados das páginas com datasets sintéticos de tamanhos crescentes.
+
+Para cada tamanho é gerado um train.csv sintético (mesmo esquema e mesmas sujeiras do
+arquivo original: 'NaN ', espaços sobrando, '(min) ' no tempo). São medidos o tempo de
+cada etapa (leitura, limpeza, cache colunar, agregados, cada função de cury.views e, com o
+duckdb instalado, as mesmas agregações consultadas no Parquet pelo cury.backend), o
+pico de memória alocada pela etapa e, opcionalmente, o caminho completo de cada página
+(execução do script com o AppTest do Streamlit, a frio e a quente) e o tempo de partida
+de cada ponto de entrada (Home e páginas) num processo Python novo, como num worker
+recém-criado pelo autoscaling.
+Os resultados são gravados em json, para comparar execuções.
+
+Uso:
+    python -m cury.bench                                   # 10k, 100k, 1M e 10M linhas
+    python -m cury.bench --sizes 10000 100000 --out bench.json
+    python -m cury.bench --sizes 100000 --compare bench_anterior.json
+    python -m cury.bench --startup-only                    # só o tempo de partida (train.csv local)
+'''
+# Import libraries
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from cury import backend, figcache, loader, store, views
+from cury.cleaning import clean_code, prepare_orders
+from cury.geo import city_centers
+from cury.geobins import build_geo_bins
+from cury.index import build_index, filter_orders
+from cury.memory import peak_rss_mb
+from cury.ranking import rank_couriers, rank_stats
+from cury.rollup import build_cube
+from cury.sketch import build_sketches, distinct_couriers, time_quantiles
+from cury.spatial import build_geo_index, nearest_restaurants, orders_near
+from cury.summary import summary_from_cells, time_summary
+from cury.timeseries import rolling_series, weekly_series
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ['pages/1_visao_empresa.py', 'pages/2_visao_entregadores.py', 'pages/3_visao_restaurante.py']
+ENTRY_POINTS = ['Home.py'] + PAGES
+
+# bibliotecas pesadas cuja carga é registrada na medição do tempo de partida
+HEAVY_MODULES = ['pandas', 'pyarrow', 'duckdb', 'plotly', 'folium', 'streamlit_folium', 'PIL', 'haversine']
+
+# executado num processo novo: roda o ponto de entrada uma vez e informa as bibliotecas carregadas
+_STARTUP_SCRIPT = '''
+import json, sys
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=float(sys.argv[2]))
+app.run()
+print(json.dumps({'exception': [e.message for e in app.exception],
+                  'modules': [m for m in json.loads(sys.argv[3]) if m in sys.modules]}))
+'''
+
+# seconds: melhor tempo entre as repetições; peak_mb: pico de memória alocada pela etapa
+# (tracemalloc) ou None; rows_in/rows_out: linhas de entrada e do resultado (quando houver)
+BenchResult = namedtuple('BenchResult', ['size', 'step', 'seconds', 'peak_mb', 'rows_in', 'rows_out'])
+
+_CITIES = np.array(['Metropolitian ', 'Urban ', 'Semi-Urban ', 'NaN '])
+_TRAFFIC = np.array(['Low ', 'Medium ', 'High ', 'Jam ', 'NaN '])
+_WEATHER = np.array(['conditions Sunny', 'conditions Stormy', 'conditions Sandstorms', 'conditions Cloudy',
+                     'conditions Fog', 'conditions Windy', 'conditions NaN'])
+_ORDER_TYPES = np.array(['Snack ', 'Meal ', 'Drinks ', 'Buffet '])
+_VEHICLES = np.array(['motorcycle ', 'scooter ', 'electric_scooter '])
+_FESTIVAL = np.array(['No ', 'Yes ', 'NaN '])
+
+
+def synthetic_orders(n, seed=0, start=0):
+    '''
+    Função que gera pedidos sintéticos no formato bruto do train.csv, entre 11/02/2022 e 06/04/2022.
+    Input:
+        - n: quantidade de linhas
+        - seed: semente do gerador aleatório
+        - start: número do primeiro pedido (os IDs continuam a partir dele)
+    Output: Dataframe bruto
+    '''
+    rng = np.random.default_rng(seed)
+
+    def com_nan(valores, p):
+        valores = np.asarray(valores, dtype=object)
+        valores[rng.random(len(valores)) < p] = 'NaN '
+        return valores
+
+    # valores repetidos (datas, entregadores, tempos) são formatados uma vez e sorteados por posição
+    datas = pd.date_range('2022-02-11', '2022-04-06').strftime('%d-%m-%Y').to_numpy()
+    entregadores = np.array([f'CITY{c}RES{r:02d}DEL0{d} ' for c in range(40) for r in range(30) for d in range(1, 4)])
+    tempos = np.array([f'(min) {t}' for t in range(10, 55)])
+    lat = rng.uniform(10, 30, n)
+    lon = rng.uniform(70, 88, n)
+    return pd.DataFrame({
+        'ID': [f'0x{i:06x} ' for i in range(start, start + n)],
+        'Delivery_person_ID': entregadores[rng.integers(0, len(entregadores), n)],
+        'Delivery_person_Age': com_nan(rng.integers(18, 40, n).astype(str), 0.04),
+        'Delivery_person_Ratings': com_nan(np.round(rng.uniform(2.5, 5, n), 1).astype(str), 0.04),
+        'Restaurant_latitude': lat,
+        'Restaurant_longitude': lon,
+        'Delivery_location_latitude': lat + rng.uniform(-0.1, 0.1, n),
+        'Delivery_location_longitude': lon + rng.uniform(-0.1, 0.1, n),
+        'Order_Date': datas[rng.integers(0, len(datas), n)],
+        'Time_Orderd': com_nan(np.full(n, '11:30:00'), 0.03),
+        'Time_Order_picked': np.full(n, '11:45:00'),
+        'Weatherconditions': _WEATHER[rng.integers(0, len(_WEATHER), n)],
+        'Road_traffic_density': _TRAFFIC[rng.choice(len(_TRAFFIC), n, p=[0.3, 0.25, 0.25, 0.18, 0.02])],
+        'Vehicle_condition': rng.integers(0, 3, n),
+        'Type_of_order': _ORDER_TYPES[rng.integers(0, len(_ORDER_TYPES), n)],
+        'Type_of_vehicle': _VEHICLES[rng.integers(0, len(_VEHICLES), n)],
+        'multiple_deliveries': com_nan(rng.integers(0, 4, n).astype(str), 0.02),
+        'Festival': _FESTIVAL[rng.choice(len(_FESTIVAL), n, p=[0.95, 0.04, 0.01])],
+        'City': _CITIES[rng.choice(len(_CITIES), n, p=[0.5, 0.3, 0.17, 0.03])],
+        'Time_taken(min)': tempos[rng.integers(0, len(tempos), n)],
+    })
+
+
+def write_synthetic_csv(path, n, seed=0, chunksize=500_000):
+    '''
+    Função que grava um csv sintético com n linhas, gerado em blocos para limitar a memória.
+    Input: caminho do csv, quantidade de linhas, semente, linhas por bloco
+    Output: caminho do csv
+    '''
+    for bloco, inicio in enumerate(range(0, n, chunksize)):
+        df = synthetic_orders(min(chunksize, n - inicio), seed=seed + bloco, start=inicio)
+        df.to_csv(path, mode='w' if bloco == 0 else 'a', header=bloco == 0, index=False)
+    return path
+
+
+def _rows(valor):
+    return len(valor) if isinstance(valor, (pd.DataFrame, pd.Series)) else None
+
+
+def measure(func, repeat=1, trace_memory=True):
+    '''
+    Função que mede o tempo de func() (melhor entre as repetições) e, numa execução
+    extra, o pico de memória alocada com o tracemalloc.
+    Input: função sem argumentos, repetições, mede ou não a memória
+    Output: tupla (segundos, pico em MB ou None, resultado)
+    '''
+    tempos = []
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        resultado = func()
+        tempos.append(time.perf_counter() - inicio)
+    pico = None
+    if trace_memory:
+        del resultado
+        tracemalloc.start()
+        try:
+            resultado = func()
+            pico = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return min(tempos), pico, resultado
+
+
+def _data_steps(csv_path):
+    '''
+    Função que monta a sequência de etapas medidas. Cada etapa recebe o dicionário com
+    os resultados anteriores e devolve o seu resultado.
+    Output: lista de tuplas (nome, entrada, função)
+    '''
+    filtros = {'Road_traffic_density': ['Low', 'Jam']}
+    limite = datetime.datetime(2022, 3, 10)
+
+    steps = [
+        ('read_csv', None, lambda r: pd.read_csv(csv_path)),
+        ('clean_code', 'read_csv', lambda r: clean_code(r['read_csv'])),
+        ('prepare_orders', 'read_csv', lambda r: prepare_orders(r['read_csv'])),
+    ]
+    if store.pa is not None:
+        steps += [
+            ('build_store', 'prepare_orders', lambda r: store.build_store(csv_path, df1=r['prepare_orders'])),
+            ('read_store', 'prepare_orders', lambda r: store.read_store(csv_path)),
+        ]
+    steps += [
+        ('build_cube', 'prepare_orders', lambda r: build_cube(r['prepare_orders'])),
+        ('build_index', 'prepare_orders', lambda r: build_index(r['prepare_orders'])),
+        ('filter_orders', 'prepare_orders',
+         lambda r: filter_orders(r['prepare_orders'], r['build_index'], limite, filtros)),
+        ('Order_Share_by_Week', 'prepare_orders', lambda r: views.Order_Share_by_Week(r['build_cube'])),
+        ('weekly_series', 'prepare_orders', lambda r: weekly_series(r['build_cube'])),
+        ('rolling_series(28)', 'prepare_orders', lambda r: rolling_series(r['build_cube'], 28)),
+        ('build_geo_bins', 'prepare_orders', lambda r: build_geo_bins(r['prepare_orders'])),
+        ('Country_Maps', 'prepare_orders',
+         lambda r: views.Country_Maps((city_centers(r['prepare_orders']), r['build_geo_bins']))),
+        ('build_geo_index', 'prepare_orders', lambda r: build_geo_index(r['prepare_orders'])),
+        ('orders_near', 'prepare_orders', lambda r: orders_near(r['build_geo_index'], 22.7, 87.2, 5)),
+        ('nearest_restaurants', 'prepare_orders',
+         lambda r: nearest_restaurants(r['build_geo_index'], 22.7, 87.2, 10)),
+        ('rank_couriers(mean)', 'prepare_orders', lambda r: rank_couriers(r['prepare_orders'], stat='mean')),
+        ('rank_couriers(median)', 'prepare_orders', lambda r: rank_couriers(r['prepare_orders'], stat='median')),
+        ('rank_couriers(trimmed)', 'prepare_orders', lambda r: rank_couriers(r['prepare_orders'], stat='trimmed')),
+        ('build_sketches', 'prepare_orders', lambda r: build_sketches(r['prepare_orders'])),
+        ('distinct_couriers', 'prepare_orders', lambda r: distinct_couriers(r['build_sketches'])),
+        ('time_quantiles', 'prepare_orders', lambda r: time_quantiles(r['build_sketches'], ['City'])),
+        ('time_summary', 'prepare_orders', lambda r: time_summary(r['prepare_orders'])),
+        ('distance', 'prepare_orders', lambda r: views.distance(r['time_summary'], False)),
+        ('distance(fig)', 'prepare_orders', lambda r: views.distance(r['time_summary'], True)),
+        ('avg_std_time_graph', 'prepare_orders', lambda r: views.avg_std_time_graph(r['time_summary'])),
+        ('avg_std_time_on_traffic', 'prepare_orders',
+         lambda r: views.avg_std_time_on_traffic(r['time_summary'])),
+    ]
+    if backend.duckdb is not None and store.pa is not None:
+        # as mesmas estruturas consultadas no Parquet pelo backend duckdb (sem o data frame em memória)
+        todos = backend.Filters(path=csv_path)
+        recorte = backend.Filters(limite, filtros['Road_traffic_density'], path=csv_path)
+        steps += [
+            ('build_parquet', None, lambda r: backend.build_parquet(csv_path)),
+            ('duckdb:query_cube', None, lambda r: backend.query_cube(todos)),
+            ('duckdb:query_geo_bins', None, lambda r: backend.query_geo_bins(todos)),
+            ('duckdb:query_sketches', None, lambda r: backend.query_sketches(todos)),
+            ('duckdb:query_restaurants', None, lambda r: backend.query_restaurants(todos)),
+            ('duckdb:query_cube(filtros)', None, lambda r: backend.query_cube(recorte)),
+            ('duckdb:query_radius', None, lambda r: backend.query_radius(recorte, 22.7, 87.2, 5)),
+            ('duckdb:rank_couriers(mean)', None, lambda r: rank_stats(backend.query_courier_stats(todos, 'mean'))),
+            ('duckdb:rank_couriers(median)', None, lambda r: rank_stats(backend.query_courier_stats(todos, 'median'))),
+            ('duckdb:rank_couriers(trimmed)', None,
+             lambda r: rank_stats(backend.query_courier_stats(todos, 'trimmed'))),
+            ('duckdb:time_summary', None, lambda r: summary_from_cells(*backend.query_summary_cells(todos))),
+        ]
+    return steps
+
+
+def _reset_caches():
+    loader.clear_cache()
+    figcache.clear_figures()
+
+
+def _page_steps(size, workdir, timeout):
+    '''
+    Função que executa cada página completa com o AppTest, dentro do diretório do dataset
+    sintético: a frio (sem cache colunar nem caches em memória) e a quente (caches prontos).
+    Output: lista de BenchResult
+    '''
+    from streamlit.testing.v1 import AppTest
+
+    from cury import warmup
+
+    # as medições a frio não podem ser aquecidas pela thread de pré-cálculo
+    warmup.configure(False)
+    resultados = []
+    diretorio = os.getcwd()
+    os.chdir(workdir)
+    try:
+        for page in PAGES:
+            nome = os.path.splitext(os.path.basename(page))[0]
+            if os.path.exists(store.store_path('train.csv')):
+                os.remove(store.store_path('train.csv'))
+            _reset_caches()
+            for estado in ('cold', 'warm'):
+                app = AppTest.from_file(os.path.join(ROOT, page), default_timeout=timeout)
+                inicio = time.perf_counter()
+                app.run()
+                segundos = time.perf_counter() - inicio
+                if app.exception:
+                    raise RuntimeError(f'{page}: {app.exception[0].message}')
+                resultados.append(BenchResult(size, f'page:{nome}({estado})', segundos, None, size, None))
+    finally:
+        os.chdir(diretorio)
+        _reset_caches()
+    return resultados
+
+
+def measure_startup(entry, workdir=None, timeout=600):
+    '''
+    Função que mede o tempo de partida de um ponto de entrada: um processo Python novo
+    (interpretador, imports e primeira execução do script com o AppTest), sem a thread de
+    pré-cálculo. Os arquivos de dados e o cache colunar em disco são os de workdir.
+    Input: caminho do script relativo à raiz do projeto, diretório do train.csv, tempo máximo em segundos
+    Output: tupla (segundos, lista das bibliotecas de HEAVY_MODULES carregadas)
+    '''
+    env = dict(os.environ, CURY_WARMUP='0')
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (ROOT, env.get('PYTHONPATH')) if p)
+    inicio = time.perf_counter()
+    processo = subprocess.run(
+        [sys.executable, '-c', _STARTUP_SCRIPT, os.path.join(ROOT, entry), str(timeout), json.dumps(HEAVY_MODULES)],
+        cwd=workdir, env=env, capture_output=True, text=True, timeout=timeout, check=True)
+    segundos = time.perf_counter() - inicio
+    saida = json.loads(processo.stdout.strip().splitlines()[-1])
+    if saida['exception']:
+        raise RuntimeError(f"{entry}: {saida['exception'][0]}")
+    return segundos, saida['modules']
+
+
+def _startup_steps(size, workdir, timeout, verbose=True):
+    '''
+    Função que mede o tempo de partida de cada ponto de entrada (ENTRY_POINTS).
+    Output: lista de BenchResult
+    '''
+    resultados = []
+    for entry in ENTRY_POINTS:
+        nome = os.path.splitext(os.path.basename(entry))[0]
+        segundos, modulos = measure_startup(entry, workdir, timeout)
+        resultados.append(BenchResult(size, f'startup:{nome}', segundos, None, size, None))
+        if verbose:
+            print(f"[{size}] startup:{nome}: {segundos:.4f}s (carregou: {', '.join(modulos) or '-'})")
+    return resultados
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, workdir=None, repeat=1, trace_memory=True, pages=True,
+                  seed=0, timeout=600, verbose=True, startup=True):
+    '''
+    Função que executa o benchmark para cada tamanho de dataset.
+    Input:
+        - sizes: lista com as quantidades de linhas
+        - workdir: diretório dos csv sintéticos (padrão: diretório temporário)
+        - repeat: repetições de cada etapa (vale o melhor tempo)
+        - trace_memory: mede o pico de memória alocada de cada etapa (execução extra)
+        - pages: mede também o caminho completo das páginas (AppTest)
+        - startup: mede também o tempo de partida de cada ponto de entrada (processo novo)
+        - seed: semente dos dados sintéticos
+        - timeout: tempo máximo de cada execução de página, em segundos
+    Output: lista de BenchResult
+    '''
+    resultados = []
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for size in sizes:
+            pasta = os.path.join(tmp, str(size))
+            os.makedirs(pasta)
+            csv_path = os.path.join(pasta, 'train.csv')
+            inicio = time.perf_counter()
+            write_synthetic_csv(csv_path, size, seed=seed)
+            if verbose:
+                print(f'[{size}] csv sintético gerado em {time.perf_counter() - inicio:.1f}s')
+
+            anteriores = {}
+            for step, entrada, func in _data_steps(csv_path):
+                segundos, pico, anteriores[step] = measure(lambda: func(anteriores), repeat, trace_memory)
+                rows_in = size if entrada is None else _rows(anteriores[entrada])
+                resultado = BenchResult(size, step, segundos, pico, rows_in, _rows(anteriores[step]))
+                resultados.append(resultado)
+                if verbose:
+                    print(f'[{size}] {step}: {segundos:.4f}s' + (f', {pico:.1f} MB' if pico is not None else ''))
+            del anteriores
+
+            if pages:
+                for resultado in _page_steps(size, pasta, timeout):
+                    resultados.append(resultado)
+                    if verbose:
+                        print(f'[{size}] {resultado.step}: {resultado.seconds:.4f}s')
+            if startup:
+                resultados += _startup_steps(size, pasta, timeout, verbose)
+    return resultados
+
+
+def save_results(resultados, path):
+    '''
+    Função que grava os resultados em json, junto com o ambiente da execução.
+    Input: lista de BenchResult, caminho do arquivo
+    Output: caminho do arquivo
+    '''
+    dados = {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'peak_rss_mb': peak_rss_mb(),
+        },
+        'results': [r._asdict() for r in resultados],
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, indent=1)
+    return path
+
+
+def compare_results(base_path, new_path):
+    '''
+    Função que compara duas execuções do benchmark, etapa por etapa.
+    Input: json da execução de referência, json da execução nova
+    Output: Dataframe com size, step, os tempos e a razão novo / referência
+    '''
+    def carregar(path):
+        with open(path, encoding='utf-8') as f:
+            return pd.DataFrame(json.load(f)['results']).loc[:, ['size', 'step', 'seconds']]
+
+    df_aux = pd.merge(carregar(base_path), carregar(new_path), on=['size', 'step'], suffixes=('_base', '_new'))
+    df_aux['ratio'] = df_aux['seconds_new'] / df_aux['seconds_base']
+    return df_aux
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark das funções de dados das páginas.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='quantidades de linhas')
+    parser.add_argument('--out', default='bench.json', help='arquivo json com os resultados')
+    parser.add_argument('--repeat', type=int, default=1, help='repetições de cada etapa (vale o melhor tempo)')
+    parser.add_argument('--workdir', default=None, help='diretório dos csv sintéticos')
+    parser.add_argument('--no-memory', action='store_true', help='não mede o pico de memória de cada etapa')
+    parser.add_argument('--no-pages', action='store_true', help='não executa as páginas completas')
+    parser.add_argument('--no-startup', action='store_true', help='não mede o tempo de partida dos pontos de entrada')
+    parser.add_argument('--startup-only', action='store_true',
+                        help='mede só o tempo de partida, com o train.csv do diretório atual')
+    parser.add_argument('--compare', default=None, help='json de uma execução anterior para comparação')
+    args = parser.parse_args()
+
+    # avisos de depreciação e de execução fora do servidor do Streamlit (não afetam as medidas)
+    from streamlit import config, logger
+    config.set_option('logger.level', 'error')
+    logger.set_log_level('error')
+    warnings.simplefilter('ignore', DeprecationWarning)
+    if args.startup_only:
+        resultados = _startup_steps(None, os.getcwd(), 600)
+    else:
+        resultados = run_benchmark(args.sizes, args.workdir, args.repeat, not args.no_memory, not args.no_pages,
+                                   startup=not args.no_startup)
+    print(f'resultados gravados em {save_results(resultados, args.out)}')
+    if args.compare:
+        print(compare_results(args.compare, args.out).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
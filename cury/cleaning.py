@@ -0,0 +1,236 @@
+# Import libraries
+import numpy as np
+import pandas as pd
+
+from cury.geo import add_distance
+
+# Colunas de texto gravadas como categóricas (dicionário de valores + códigos inteiros).
+# Delivery_person_ID e os horários se repetem muito: cada valor distinto é guardado uma vez
+CATEGORICAL_COLUMNS = ['City', 'Road_traffic_density', 'Type_of_order', 'Type_of_vehicle', 'Festival', 'Weatherconditions',
+                       'Delivery_person_ID', 'Time_Orderd', 'Time_Order_picked']
+
+# Colunas inteiras gravadas com o menor tipo que comporta os valores válidos
+INTEGER_DTYPES = {
+    'Delivery_person_Age': np.int8,
+    'Vehicle_condition': np.int8,
+    'multiple_deliveries': np.int8,
+    'Time_taken(min)': np.int16,
+}
+
+# Colunas de texto que chegam com espaços sobrando no csv
+STRIP_COLUMNS = ['Road_traffic_density', 'Type_of_order', 'Type_of_vehicle', 'City', 'Festival']
+
+# Colunas numéricas que chegam com o texto 'NaN ' no csv: ao ler só uma parte do arquivo
+# (faixa de bytes, lote de ingestão) elas são lidas sempre como texto, como acontece na
+# leitura do arquivo inteiro, mesmo quando o 'NaN ' não aparece na parte lida
+TEXT_COLUMNS = ['Delivery_person_Age', 'Delivery_person_Ratings', 'multiple_deliveries']
+
+
+def to_categorical(serie, strip=False):
+    '''
+    Função que converte uma coluna de texto em categórica. O strip, quando pedido, é feito
+    apenas sobre os valores únicos e os códigos são remapeados, sem passar por cada linha.
+    Input:
+        - serie: coluna de texto
+        - strip: remove os espaços das categorias
+    Output: Categorical com as categorias em ordem alfabética
+    '''
+    codes, uniques = pd.factorize(serie)
+    uniques = pd.Index(uniques)
+    if strip:
+        uniques = uniques.str.strip()
+    categories = uniques.unique().sort_values()
+    remap = categories.get_indexer(uniques)
+    # código -1 = valor ausente (NaN real do read_csv)
+    codes = np.where(codes >= 0, remap[codes], -1)
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def invalid_integers(serie, dtype):
+    '''
+    Função que marca os valores brutos que não podem ser gravados no tipo inteiro da
+    coluna: texto que não é um número inteiro, número não inteiro, ausente ou fora da
+    faixa do tipo. A verificação é feita só sobre os valores únicos.
+    Input: coluna bruta (texto ou número), tipo numpy de destino
+    Output: array booleano (True = valor inválido)
+    '''
+    codes, uniques = pd.factorize(serie)
+    uniques = pd.Series(uniques)
+    if uniques.dtype.kind in 'iuf':
+        valores = uniques.to_numpy(dtype=float)
+        inteiro = np.isfinite(valores) & (valores == np.floor(valores))
+    else:
+        # mesma regra do astype(int) sobre texto: só inteiros, com espaços nas pontas
+        texto = uniques.astype(str).str.strip()
+        inteiro = texto.str.fullmatch(r'[+-]?\d+').to_numpy(dtype=bool)
+        valores = pd.to_numeric(texto.where(inteiro), errors='coerce').to_numpy(dtype=float)
+    limites = np.iinfo(dtype)
+    invalido = ~(inteiro & (valores >= limites.min) & (valores <= limites.max))
+    # código -1 = valor ausente (NaN real do read_csv)
+    return np.append(invalido, True)[codes]
+
+
+def invalid_floats(serie):
+    '''
+    Função que marca os valores brutos que o astype(float) não converte: texto que não é
+    número. 'NaN' (com ou sem espaços) e valores ausentes continuam válidos e viram NaN.
+    A verificação é feita só sobre os valores únicos.
+    Input: coluna bruta (texto ou número)
+    Output: array booleano (True = valor inválido)
+    '''
+    codes, uniques = pd.factorize(serie)
+    uniques = pd.Series(uniques)
+    if uniques.dtype.kind in 'iuf':
+        return np.zeros(len(serie), dtype=bool)
+    valores = pd.to_numeric(uniques, errors='coerce')
+    invalido = (valores.isna() & (uniques.astype(str).str.strip().str.lower() != 'nan')).to_numpy(dtype=bool)
+    # código -1 = valor ausente (NaN real do read_csv)
+    return np.append(invalido, False)[codes]
+
+
+def downcast(serie, dtype):
+    '''
+    Função que converte uma coluna inteira para um tipo menor, verificando antes se
+    todos os valores cabem nele (em vez de deixar a conversão estourar em silêncio).
+    obs.: drop_rules já descarta as linhas com valores fora da faixa; o erro aqui só
+    aparece se alguma coluna de INTEGER_DTYPES ficar sem a regra correspondente.
+    Input: coluna inteira, tipo numpy de destino
+    Output: Series no tipo de destino
+    '''
+    limites = np.iinfo(dtype)
+    if len(serie) > 0 and (serie.min() < limites.min or serie.max() > limites.max):
+        raise ValueError(f'a coluna {serie.name} tem valores fora da faixa de {np.dtype(dtype).name}')
+    return serie.astype(dtype)
+
+
+def concat_orders(frames):
+    '''
+    Função que concatena data frames limpos unificando as categorias das colunas
+    categóricas (sem isso o pandas converteria as colunas para texto).
+    Input: lista de Dataframes
+    Output: Dataframe
+    '''
+    frames = [df for df in frames if df is not None]
+    for col in frames[0].columns:
+        if not isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            continue
+        categories = frames[0][col].cat.categories
+        for df in frames[1:]:
+            categories = categories.union(df[col].cat.categories)
+        frames = [df.assign(**{col: df[col].cat.set_categories(categories)}) for df in frames]
+    return pd.concat(frames)
+
+
+def drop_rules(df1, trafego, cidade):
+    '''
+    Função que avalia cada critério de remoção de linhas usado por clean_code.
+    Além dos NaN, as colunas inteiras com valor inválido (não inteiro ou fora da faixa do
+    tipo em INTEGER_DTYPES) e as avaliações que não são número removem a linha, em vez de
+    interromper a limpeza de todo o lote.
+    obs.: o filtro antigo de Festival comparava com 'NaN ' depois do strip e nunca
+    removia nada; as linhas com Festival 'NaN' continuam no resultado.
+    Input:
+        - df1: Dataframe bruto
+        - trafego, cidade: colunas Road_traffic_density e City já sem espaços
+    Output: dicionário motivo -> máscara (True = linha removida), na ordem de prioridade
+    '''
+    regras = {
+        'Delivery_person_Age NaN': np.asarray(df1['Delivery_person_Age'] == 'NaN '),
+        'multiple_deliveries NaN': np.asarray(df1['multiple_deliveries'] == 'NaN '),
+        'Road_traffic_density NaN': np.asarray(trafego == 'NaN'),
+        'City NaN': np.asarray(cidade == 'NaN'),
+        'Time_taken(min) NaN': np.asarray(df1['Time_taken(min)'] == 'NaN'),
+    }
+    for col, dtype in INTEGER_DTYPES.items():
+        serie = df1[col]
+        if col == 'Time_taken(min)':
+            serie = serie.astype(str).str.replace('(min)', '', regex=False)
+        regras[f'{col} invalid'] = invalid_integers(serie, dtype)
+    regras['Delivery_person_Ratings invalid'] = invalid_floats(df1['Delivery_person_Ratings'])
+    return regras
+
+
+def rejection_reasons(df1):
+    '''
+    Função que indica, para cada linha bruta, o motivo pelo qual clean_code a descartaria
+    (o primeiro critério que a linha não atende).
+    Input: Dataframe bruto
+    Output: Series com o motivo, ou None para as linhas aceitas
+    '''
+    trafego = to_categorical(df1['Road_traffic_density'], strip=True)
+    cidade = to_categorical(df1['City'], strip=True)
+    motivos = np.full(len(df1), None, dtype=object)
+    for motivo, mascara in reversed(list(drop_rules(df1, trafego, cidade).items())):
+        motivos[mascara] = motivo
+    return pd.Series(motivos, index=df1.index, name='reason')
+
+
+def clean_code(df1):
+    '''Esta função tem a responsabilidade de limpar o data frame
+        Tipos de limpeza:
+        1. Remoção dos dados NaN
+        2. Mudança do tipo da coluna de dados
+        3. Remoção dos espaços das variáveis de texto
+        4. Formatação da coluna de datas
+        5. Limpeza da coluna de tempo (remoção do texto da variável numérica)
+        6. Conversão das colunas inteiras para o menor tipo que comporta os valores
+
+        Todas as etapas são vetorizadas e as linhas são filtradas uma única vez,
+        com uma máscara que combina todos os critérios de remoção.
+
+        Input: Dataframe
+        Output: Dataframe
+    '''
+    # 1. Removendo os NaN (uma máscara só; trânsito e cidade são comparados já sem espaços)
+    trafego = to_categorical(df1['Road_traffic_density'], strip=True)
+    cidade = to_categorical(df1['City'], strip=True)
+    linhas_selecionadas = ~np.logical_or.reduce(list(drop_rules(df1, trafego, cidade).values()))
+    df1 = df1.loc[linhas_selecionadas, :]
+
+    colunas = {col: df1[col] for col in df1.columns}
+
+    # 2. Mudança do tipo das colunas numéricas
+    colunas['Delivery_person_Age'] = df1['Delivery_person_Age'].astype(int)
+    colunas['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(float)
+    colunas['multiple_deliveries'] = df1['multiple_deliveries'].astype(int)
+
+    # 3. Removendo os espaços do ID e gravando as colunas de texto como categóricas
+    colunas['ID'] = df1['ID'].str.strip()
+    colunas['Road_traffic_density'] = trafego[linhas_selecionadas].remove_unused_categories()
+    colunas['City'] = cidade[linhas_selecionadas].remove_unused_categories()
+    for col in CATEGORICAL_COLUMNS:
+        if col not in ('Road_traffic_density', 'City'):
+            colunas[col] = to_categorical(df1[col], strip=col in STRIP_COLUMNS)
+
+    # 4. Formatação da coluna de datas
+    colunas['Order_Date'] = pd.to_datetime(df1['Order_Date'], format='%d-%m-%Y')
+
+    # 5. Removendo o (min) do Time_Taken
+    colunas['Time_taken(min)'] = df1['Time_taken(min)'].str.replace('(min)', '', regex=False).astype(int)
+
+    # 6. Colunas inteiras no menor tipo que comporta os valores
+    for col, dtype in INTEGER_DTYPES.items():
+        colunas[col] = downcast(colunas[col], dtype)
+
+    return pd.DataFrame(colunas, index=df1.index, copy=False)
+
+
+def prepare_orders(df1):
+    '''
+    Função que aplica clean_code e calcula as colunas derivadas usadas pelas páginas
+    (distance), uma única vez na ingestão dos dados. O resultado fica ordenado por
+    Order_Date (ordenação estável), o que permite filtrar datas por busca binária.
+    Input: Dataframe bruto (lido do csv)
+    Output: Dataframe limpo
+    '''
+    return sort_orders(add_distance(clean_code(df1)))
+
+
+def sort_orders(df1):
+    '''
+    Função que ordena o data frame limpo por Order_Date, mantendo a ordem original
+    das linhas dentro de cada dia.
+    Input: Dataframe limpo
+    Output: Dataframe ordenado
+    '''
+    return df1.sort_values('Order_Date', kind='stable')
@@ -0,0 +1,45 @@
+'''
+Métricas da visão entregadores: idade, condição dos veículos e avaliações.
+
+As funções recebem o data frame já filtrado e são usadas tanto pela página quanto pela
+API de métricas (cury.metrics).
+'''
+# Import libraries
+from collections import namedtuple
+
+RATING_COLUMN = 'Delivery_person_Ratings'
+
+# max_age/min_age: maior e menor idade; best_vehicle/worst_vehicle: melhor e pior condição do veículo
+CourierOverview = namedtuple('CourierOverview', ['max_age', 'min_age', 'best_vehicle', 'worst_vehicle'])
+
+
+def courier_overview(df1):
+    '''
+    Função que calcula a maior e a menor idade dos entregadores e a melhor e a pior
+    condição dos veículos.
+    Input: Dataframe limpo (já filtrado)
+    Output: CourierOverview
+    '''
+    idade = df1['Delivery_person_Age']
+    veiculo = df1['Vehicle_condition']
+    return CourierOverview(idade.max(), idade.min(), veiculo.max(), veiculo.min())
+
+
+def rating_by_courier(df1):
+    '''
+    Função que calcula a avaliação média de cada entregador.
+    Input: Dataframe limpo (já filtrado)
+    Output: Dataframe com Delivery_person_ID e Delivery_person_Ratings
+    '''
+    return df1.loc[:, ['Delivery_person_ID', RATING_COLUMN]].groupby('Delivery_person_ID', observed=True).mean().reset_index()
+
+
+def rating_stats(df1, column, label=None):
+    '''
+    Função que calcula a média e o desvio padrão das avaliações por uma coluna (ex.: trânsito ou clima).
+    Input: Dataframe limpo (já filtrado), coluna do agrupamento, nome da coluna no resultado (padrão: column)
+    Output: Dataframe com a coluna do agrupamento, Delivery_mean e Delivery_std
+    '''
+    df_aux = df1.loc[:, [RATING_COLUMN, column]].groupby(column, observed=True).agg(['mean', 'std']).reset_index()
+    df_aux.columns = [label or column, 'Delivery_mean', 'Delivery_std']
+    return df_aux
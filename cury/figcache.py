@@ -0,0 +1,136 @@
+'''
+Memoização dos gráficos das páginas e dos resultados de dados usados por eles.
+
+A chave de cada gráfico é (versão do dataset, nome da função, filtros normalizados).
+O cache é compartilhado por todas as sessões do processo, limitado por LRU e seguro
+para uso concorrente. Os gráficos devolvidos são compartilhados entre as sessões e
+não devem ser alterados depois de criados.
+
+Os resultados de dados (resumos, rankings, tabelas ordenadas) ficam num segundo LRU,
+com a mesma chave e os próprios contadores (cached_result): eles não tiram gráficos do
+cache nem entram na taxa de acerto dos gráficos. Consultas com parâmetros livres (ex.:
+coordenadas digitadas) não devem passar por nenhum dos dois.
+'''
+# Import libraries
+import datetime
+import threading
+from collections import OrderedDict
+
+from cury.instrument import traced
+from cury.loader import DATA_PATH, data_key
+
+MAX_FIGURES = 128
+MAX_RESULTS = 64
+
+_figures = OrderedDict()
+_stats = {'hits': 0, 'misses': 0}
+_results = OrderedDict()
+_result_stats = {'hits': 0, 'misses': 0}
+_lock = threading.Lock()
+
+
+def normalize_filters(value):
+    '''
+    Função que transforma os valores dos filtros numa chave imutável e estável:
+    datas viram texto ISO e listas (ex.: multiselect) viram tuplas ordenadas,
+    já que a ordem de seleção não altera o resultado.
+    Input: valor do filtro (escalar, data, lista ou dicionário)
+    Output: valor hashable
+    '''
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize_filters(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(sorted((normalize_filters(v) for v in value), key=repr))
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def _memoize(cache, stats, maxsize, key, compute):
+    '''
+    Função que retorna o valor em cache para a chave ou o calcula com compute() e o
+    guarda, descartando as entradas menos usadas além de maxsize.
+    '''
+    with _lock:
+        if key in cache:
+            cache.move_to_end(key)
+            stats['hits'] += 1
+            return cache[key]
+        stats['misses'] += 1
+
+    valor = compute()
+    with _lock:
+        cache[key] = valor
+        cache.move_to_end(key)
+        while len(cache) > maxsize:
+            cache.popitem(last=False)
+    return valor
+
+
+def _key(func, filters, path, kwargs):
+    return (data_key(path), func.__module__, func.__qualname__, normalize_filters(filters), normalize_filters(kwargs))
+
+
+def cached_figure(builder, data, filters, path=DATA_PATH, **kwargs):
+    '''
+    Função que retorna o gráfico de builder(data, **kwargs), reaproveitando o resultado
+    quando a versão do dataset, a função e os filtros forem os mesmos.
+    Os filtros precisam determinar completamente o recorte de dados usado pelo gráfico.
+    Input:
+        - builder: função que monta o gráfico
+        - data: dados já filtrados (usados apenas quando o gráfico não está em cache)
+        - filters: valores dos filtros da página
+        - path: arquivo de origem (define a versão do dataset)
+        - kwargs: argumentos adicionais de builder (também fazem parte da chave)
+    Output: Fig
+    '''
+    return _memoize(_figures, _stats, MAX_FIGURES, _key(builder, filters, path, kwargs),
+                    lambda: traced(f'figure:{builder.__qualname__}', builder, data, **kwargs))
+
+
+def cached_result(func, data, filters, path=DATA_PATH, **kwargs):
+    '''
+    Função que retorna func(data, **kwargs) (um resultado de dados, não um gráfico),
+    reaproveitando o resultado quando a versão do dataset, a função e os filtros forem os
+    mesmos. Mesmas regras de cached_figure, num cache separado (MAX_RESULTS entradas).
+    Input:
+        - func: função que calcula o resultado
+        - data: dados ou recorte (usados apenas quando o resultado não está em cache)
+        - filters: valores dos filtros da página
+        - path: arquivo de origem (define a versão do dataset)
+        - kwargs: argumentos adicionais de func (também fazem parte da chave)
+    Output: valor retornado por func
+    '''
+    return _memoize(_results, _result_stats, MAX_RESULTS, _key(func, filters, path, kwargs),
+                    lambda: traced(f'result:{func.__qualname__}', func, data, **kwargs))
+
+
+def cache_info():
+    '''
+    Função que retorna os contadores do cache de gráficos.
+    Output: dicionário com hits, misses, size e maxsize
+    '''
+    with _lock:
+        return {'hits': _stats['hits'], 'misses': _stats['misses'], 'size': len(_figures), 'maxsize': MAX_FIGURES}
+
+
+def result_cache_info():
+    '''
+    Função que retorna os contadores do cache de resultados de dados.
+    Output: dicionário com hits, misses, size e maxsize
+    '''
+    with _lock:
+        return {'hits': _result_stats['hits'], 'misses': _result_stats['misses'], 'size': len(_results),
+                'maxsize': MAX_RESULTS}
+
+
+def clear_figures():
+    '''
+    Função que esvazia os caches de gráficos e de resultados e zera os contadores.
+    '''
+    with _lock:
+        _figures.clear()
+        _results.clear()
+        for stats in (_stats, _result_stats):
+            stats['hits'] = 0
+            stats['misses'] = 0
@@ -0,0 +1,51 @@
+# Import libraries
+import numpy as np
+
+# Mesmo raio médio usado pela biblioteca haversine
+AVG_EARTH_RADIUS_KM = 6371.0088
+
+DISTANCE_COLUMNS = ['Delivery_location_latitude', 'Delivery_location_longitude', 'Restaurant_latitude', 'Restaurant_longitude']
+
+CENTER_KEYS = ['City', 'Road_traffic_density']
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    '''
+    Função que calcula a distância haversine (em km) entre pares de pontos, de forma
+    vetorizada sobre arrays NumPy. Reproduz a fórmula da biblioteca haversine.
+    Input: arrays de latitude/longitude em graus
+    Output: array de distâncias em km
+    '''
+    lat1 = np.radians(lat1)
+    lon1 = np.radians(lon1)
+    lat2 = np.radians(lat2)
+    lon2 = np.radians(lon2)
+    lat = lat2 - lat1
+    lon = lon2 - lon1
+    d = np.sin(lat * 0.5) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(lon * 0.5) ** 2
+    return AVG_EARTH_RADIUS_KM * 2 * np.arcsin(np.sqrt(d))
+
+
+def add_distance(df1):
+    '''
+    Função que adiciona a coluna "distance" (km entre o restaurante e o local de entrega).
+    Input: Dataframe limpo
+    Output: Dataframe com a coluna distance
+    '''
+    df1['distance'] = haversine_km(
+        df1['Delivery_location_latitude'].to_numpy(),
+        df1['Delivery_location_longitude'].to_numpy(),
+        df1['Restaurant_latitude'].to_numpy(),
+        df1['Restaurant_longitude'].to_numpy()
+    )
+    return df1
+
+
+def city_centers(df1):
+    '''
+    Função que calcula a localização central (mediana dos locais de entrega) de cada cidade por densidade de tráfego.
+    Input: Dataframe limpo (já filtrado)
+    Output: Dataframe com City, Road_traffic_density, Delivery_location_latitude e Delivery_location_longitude
+    '''
+    colunas = CENTER_KEYS + ['Delivery_location_latitude', 'Delivery_location_longitude']
+    return df1.loc[:, colunas].groupby(CENTER_KEYS, observed=True).median().reset_index()
@@ -0,0 +1,123 @@
+'''
+Grade espacial pré-agregada dos pontos de entrega e dos restaurantes.
+
+As coordenadas são discretizadas numa grade de CELL_DEG graus (índices inteiros de
+latitude e longitude) e contadas por (Order_Date, Road_traffic_density, célula), como
+no cubo diário. O mapa da visão empresa é montado a partir das células filtradas, e
+não dos pedidos, então o tamanho do mapa depende da área coberta e não do volume.
+'''
+# Import libraries
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from cury.cleaning import concat_orders
+from cury.loader import DATA_PATH, load_derived
+
+# tamanho da célula em graus (~2,2 km de latitude)
+CELL_DEG = 0.02
+
+# limite de células enviadas ao mapa por camada (acima dele as células são agrupadas)
+MAX_MAP_CELLS = 5000
+
+GEO_BINS_NAME = 'geo_bins'
+
+BIN_KEYS = ['Order_Date', 'Road_traffic_density', 'ilat', 'ilon']
+
+# camada -> colunas de latitude e longitude
+POINTS = {
+    'delivery': ('Delivery_location_latitude', 'Delivery_location_longitude'),
+    'restaurant': ('Restaurant_latitude', 'Restaurant_longitude'),
+}
+
+# delivery/restaurant: Dataframes com BIN_KEYS e orders (quantidade de pedidos na célula);
+# cell: tamanho da célula em graus
+GeoBins = namedtuple('GeoBins', ['delivery', 'restaurant', 'cell'])
+
+
+def _bin_points(df1, lat, lon, cell):
+    aux = pd.DataFrame({
+        'Order_Date': df1['Order_Date'].to_numpy(),
+        'Road_traffic_density': df1['Road_traffic_density'].to_numpy(),
+        'ilat': np.floor(df1[lat].to_numpy(dtype=float) / cell).astype(np.int32),
+        'ilon': np.floor(df1[lon].to_numpy(dtype=float) / cell).astype(np.int32),
+        'orders': 1,
+    })
+    return aux.groupby(BIN_KEYS, observed=True, sort=True)['orders'].sum().reset_index()
+
+
+def build_geo_bins(df1, cell=CELL_DEG):
+    '''
+    Função que conta os pedidos por dia, trânsito e célula da grade, para os pontos de
+    entrega e para os restaurantes.
+    Input: Dataframe limpo, tamanho da célula em graus
+    Output: GeoBins
+    '''
+    return GeoBins(
+        delivery=_bin_points(df1, *POINTS['delivery'], cell),
+        restaurant=_bin_points(df1, *POINTS['restaurant'], cell),
+        cell=cell,
+    )
+
+
+def load_geo_bins(path=DATA_PATH):
+    '''
+    Função que retorna a grade da versão atual do arquivo, calculada uma única vez por processo.
+    Input: caminho do arquivo csv
+    Output: GeoBins
+    '''
+    return load_derived(GEO_BINS_NAME, build_geo_bins, path)
+
+
+def merge_geo_bins(bins, other):
+    '''
+    Função que combina duas grades com o mesmo tamanho de célula (ex.: a atual e a de
+    um novo lote de pedidos), somando as contagens das mesmas células.
+    Input: GeoBins, GeoBins
+    Output: GeoBins
+    '''
+    if bins.cell != other.cell:
+        raise ValueError('as grades precisam ter o mesmo tamanho de célula')
+
+    def somar(a, b):
+        return concat_orders([a, b]).groupby(BIN_KEYS, observed=True, sort=True)['orders'].sum().reset_index()
+
+    return GeoBins(somar(bins.delivery, other.delivery), somar(bins.restaurant, other.restaurant), bins.cell)
+
+
+def filter_geo_bins(bins, date_slider=None, traffic_options=None):
+    '''
+    Função que aplica os filtros da barra lateral (data limite e condições de trânsito) à grade.
+    Input: GeoBins, data limite (exclusiva), lista de densidades de trânsito
+    Output: GeoBins filtrada
+    '''
+    def filtrar(cells):
+        if date_slider is not None:
+            cells = cells.loc[cells['Order_Date'] < date_slider, :]
+        if traffic_options is not None:
+            cells = cells.loc[cells['Road_traffic_density'].isin(traffic_options), :]
+        return cells
+
+    return GeoBins(filtrar(bins.delivery), filtrar(bins.restaurant), bins.cell)
+
+
+def cell_totals(bins, layer, max_cells=MAX_MAP_CELLS):
+    '''
+    Função que soma os pedidos de cada célula (todas as datas e trânsitos do recorte)
+    e calcula o centro da célula. Se houver mais de max_cells células, as células são
+    agrupadas em blocos de 2x2, 4x4, ... até caberem no limite.
+    Input: GeoBins, camada ('delivery' ou 'restaurant'), limite de células (None: sem limite)
+    Output: Dataframe com lat, lon e orders
+    '''
+    cells = getattr(bins, layer)
+    df_aux = cells.groupby(['ilat', 'ilon'], sort=True)['orders'].sum().reset_index()
+    fator = 1
+    while max_cells is not None and len(df_aux) > max_cells:
+        fator *= 2
+        df_aux = df_aux.assign(ilat=df_aux['ilat'] // 2, ilon=df_aux['ilon'] // 2)
+        df_aux = df_aux.groupby(['ilat', 'ilon'], sort=True)['orders'].sum().reset_index()
+    tamanho = bins.cell * fator
+    df_aux['lat'] = (df_aux['ilat'] + 0.5) * tamanho
+    df_aux['lon'] = (df_aux['ilon'] + 0.5) * tamanho
+    return df_aux.loc[:, ['lat', 'lon', 'orders']]
@@ -0,0 +1,103 @@
+'''
+Índice de posições para os filtros da barra lateral.
+
+O dataset limpo fica ordenado por Order_Date, então o filtro de data limite vira um
+corte (slice) encontrado por busca binária. Para as colunas categóricas filtradas nas
+páginas (trânsito e clima) o índice guarda as posições de cada categoria, em ordem
+crescente; os filtros são combinados sobre essas posições, e só o resultado é copiado.
+'''
+# Import libraries
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from cury.loader import DATA_PATH, load_derived
+
+INDEX_NAME = 'order_index'
+
+INDEXED_COLUMNS = ['Road_traffic_density', 'Weatherconditions']
+
+# days: dias distintos (ordenados); day_starts: posição da primeira linha de cada dia;
+# size: quantidade de linhas; categories: coluna -> {categoria: posições}
+OrderIndex = namedtuple('OrderIndex', ['days', 'day_starts', 'size', 'categories'])
+
+
+def build_index(df1):
+    '''
+    Função que monta o índice de posições de um data frame limpo ordenado por Order_Date.
+    Input: Dataframe limpo (ordenado por data)
+    Output: OrderIndex
+    '''
+    datas = df1['Order_Date'].to_numpy()
+    if len(datas) > 1 and (datas[1:] < datas[:-1]).any():
+        raise ValueError('o data frame precisa estar ordenado por Order_Date')
+    days, day_starts = np.unique(datas, return_index=True)
+
+    categories = {}
+    for col in INDEXED_COLUMNS:
+        codes = df1[col].cat.codes.to_numpy()
+        categories[col] = {cat: np.flatnonzero(codes == i) for i, cat in enumerate(df1[col].cat.categories)}
+
+    return OrderIndex(days, day_starts, len(df1), categories)
+
+
+def load_index(path=DATA_PATH):
+    '''
+    Função que retorna o índice da versão atual do arquivo, calculado uma única vez por processo.
+    Input: caminho do arquivo csv
+    Output: OrderIndex
+    '''
+    return load_derived(INDEX_NAME, build_index, path)
+
+
+def date_cut(index, date_slider):
+    '''
+    Função que encontra, por busca binária nos dias, a posição da primeira linha com
+    Order_Date >= date_slider (as linhas antes dela formam o filtro "data < limite").
+    Input: OrderIndex, data limite
+    Output: int
+    '''
+    limite = pd.Timestamp(date_slider).to_datetime64().astype(index.days.dtype)
+    dia = np.searchsorted(index.days, limite, side='left')
+    return int(index.day_starts[dia]) if dia < len(index.days) else index.size
+
+
+def select_positions(index, date_slider=None, filters=None):
+    '''
+    Função que combina o filtro de data com os filtros de categoria usando só as posições.
+    Input:
+        - index: OrderIndex
+        - date_slider: data limite (exclusiva) ou None
+        - filters: dicionário coluna -> lista de valores aceitos
+    Output: array de posições (ordenado) ou slice, quando só há o filtro de data
+    '''
+    corte = index.size if date_slider is None else date_cut(index, date_slider)
+    posicoes = None
+    for col, valores in (filters or {}).items():
+        por_categoria = index.categories[col]
+        partes = [por_categoria[v] for v in valores if v in por_categoria]
+        selecionadas = np.sort(np.concatenate(partes)) if partes else np.empty(0, dtype=np.int64)
+        # as posições de cada categoria são crescentes: o corte de data é um prefixo
+        selecionadas = selecionadas[:np.searchsorted(selecionadas, corte)]
+        if posicoes is None:
+            posicoes = selecionadas
+        else:
+            posicoes = np.intersect1d(posicoes, selecionadas, assume_unique=True)
+    if posicoes is None:
+        return slice(0, corte)
+    return posicoes
+
+
+def filter_orders(df1, index, date_slider=None, filters=None):
+    '''
+    Função que aplica os filtros da barra lateral ao data frame limpo.
+    Equivale a df1[df1['Order_Date'] < date_slider] seguido de isin para cada coluna,
+    mas o custo cresce com o tamanho do resultado e não com o tamanho do dataset.
+    Input: Dataframe limpo, OrderIndex, data limite, dicionário coluna -> valores
+    Output: Dataframe filtrado
+    '''
+    posicoes = select_positions(index, date_slider, filters)
+    if isinstance(posicoes, slice):
+        return df1.iloc[posicoes]
+    return df1.take(posicoes)
@@ -0,0 +1,172 @@
+'''
+Ingestão incremental de novos lotes de pedidos.
+
+Somente as linhas do lote passam por clean_code; o histórico já limpo é reaproveitado
+do cache colunar. As linhas aceitas são anexadas ao csv (que continua sendo o histórico
+completo), ao cache colunar e aos agregados em memória. O csv recebe as linhas exatamente
+como estão no lote e o cache colunar só as linhas novas (um arquivo delta, ver cury.store),
+então o custo em disco de cada ingestão depende do tamanho do lote, e não do histórico. O
+resultado é o mesmo de refazer o cache a partir do csv completo.
+
+Uso:
+    python -m cury.ingest lote.csv [--data train.csv] [--rejected rejeitados.csv]
+'''
+# Import libraries
+import argparse
+import io
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from cury import loader, shared, store
+from cury.cleaning import (CATEGORICAL_COLUMNS, TEXT_COLUMNS, concat_orders, prepare_orders, rejection_reasons,
+                           sort_orders)
+from cury.geobins import GEO_BINS_NAME, build_geo_bins, merge_geo_bins
+from cury.rollup import CUBE_NAME, build_cube, merge_cube
+from cury.sketch import SKETCHES_NAME, build_sketches, merge_sketches
+
+DUPLICATE_REASON = 'duplicate ID'
+
+# accepted/rejected: quantidade de linhas; reasons: motivo -> quantidade;
+# rejected_rows: Dataframe com a linha do lote, o ID e o motivo de cada linha descartada
+IngestReport = namedtuple('IngestReport', ['accepted', 'rejected', 'reasons', 'rejected_rows'])
+
+
+def aggregate_updates(novos):
+    '''
+    Função que monta as funções de atualização incremental dos agregados em cache.
+    Input: Dataframe limpo com as linhas aceitas do lote
+    Output: dicionário nome -> função(valor antigo) -> valor novo
+    '''
+    return {
+        CUBE_NAME: lambda cube: merge_cube(cube, build_cube(novos)),
+        GEO_BINS_NAME: lambda bins: merge_geo_bins(bins, build_geo_bins(novos, bins.cell)),
+        SKETCHES_NAME: lambda sketches: merge_sketches(sketches, build_sketches(novos)),
+    }
+
+
+def batch_lines(conteudo):
+    '''
+    Função que separa as linhas de dados de um lote (sem o cabeçalho e sem as linhas em
+    branco, que o read_csv também ignora), exatamente como estão no arquivo.
+    obs.: assume, como cury.parallel, que nenhum campo tem quebra de linha dentro de aspas.
+    Input: conteúdo do csv do lote em bytes
+    Output: lista de linhas em bytes, cada uma com o seu fim de linha
+    '''
+    linhas = [linha for linha in conteudo.splitlines(keepends=True)[1:] if linha.strip(b'\r\n')]
+    if linhas and not linhas[-1].endswith((b'\n', b'\r')):
+        linhas[-1] += b'\n'
+    return linhas
+
+
+def _append_csv(path, linhas):
+    '''
+    Função que anexa as linhas brutas aceitas ao fim do csv, sem alteração, numa única
+    escrita: o restante do arquivo não é lido nem copiado.
+    Input: caminho do csv, lista de linhas em bytes (batch_lines)
+    Output: bytes anexados
+    '''
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        dados = b''.join(linhas)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) not in (b'\n', b'\r'):
+                dados = b'\n' + dados
+        f.seek(0, os.SEEK_END)
+        f.write(dados)
+    return dados
+
+
+def ingest_batch(batch_path, path=loader.DATA_PATH):
+    '''
+    Função que ingere um novo lote de pedidos:
+        1. limpa somente as linhas do lote, com as regras de clean_code
+        2. descarta IDs já existentes no histórico ou repetidos dentro do lote
+        3. anexa as linhas aceitas ao csv, ao cache colunar e aos agregados em memória
+    Input:
+        - batch_path: csv do lote, com as mesmas colunas do arquivo principal
+        - path: csv com o histórico
+    Output: IngestReport
+    '''
+    historico = loader.load_orders(path)
+    with open(batch_path, 'rb') as f:
+        conteudo = f.read()
+    colunas = list(pd.read_csv(path, nrows=0).columns)
+    if list(pd.read_csv(io.BytesIO(conteudo), nrows=0).columns) != colunas:
+        raise ValueError(f'as colunas do lote {batch_path} não correspondem às de {path}')
+    bruto = pd.read_csv(io.BytesIO(conteudo), dtype={col: object for col in TEXT_COLUMNS if col in colunas})
+    linhas = batch_lines(conteudo)
+    if len(linhas) != len(bruto):
+        raise ValueError(f'o lote {batch_path} tem quebras de linha dentro de campos')
+
+    # 1. limpeza do lote (as linhas descartadas recebem o motivo da regra que falhou)
+    motivos = rejection_reasons(bruto)
+    limpos = prepare_orders(bruto)
+
+    # 2. de-duplicação por ID
+    duplicados = limpos['ID'].isin(historico['ID']) | limpos['ID'].duplicated()
+    motivos.loc[limpos.index[duplicados.to_numpy()]] = DUPLICATE_REASON
+    novos = limpos.loc[~duplicados.to_numpy(), :]
+    # categorias só das linhas aceitas, como no build completo
+    novos = novos.assign(**{col: novos[col].cat.remove_unused_categories() for col in CATEGORICAL_COLUMNS})
+
+    # 3. anexando ao csv, ao cache colunar e aos agregados
+    if len(novos) > 0:
+        # cache colunar da versão atual do csv (antes do anexo) e linhas de dados já gravadas
+        cadeia = store.fresh_chain(path) if store.pa is not None else None
+        inicio = store.metadata_rows(cadeia[-1][1]) if cadeia else store.count_rows(path)
+
+        # as linhas aceitas são anexadas na ordem do lote; o índice de cada uma é a sua
+        # posição no csv, como na leitura do arquivo completo
+        aceitas = np.sort(novos.index.to_numpy())
+        dados = _append_csv(path, [linhas[i] for i in aceitas])
+        novos = novos.set_axis(pd.Index(inicio + np.searchsorted(aceitas, novos.index.to_numpy())))
+        df1 = sort_orders(concat_orders([historico, novos]))
+        if cadeia and len(cadeia) <= store.MAX_DELTAS:
+            store.append_store(path, novos, dados, cadeia[-1][1])
+        elif store.pa is not None:
+            # sem cache atualizado (ou com deltas demais): regrava o cache completo
+            store.build_store(path, df1=df1)
+        if shared.enabled():
+            # os outros processos passam a anexar à nova versão na próxima execução
+            shared.publish(path, df1=df1)
+        loader.publish_orders(df1, path, updates=aggregate_updates(novos))
+
+    rejeitados = motivos.dropna()
+    rejected_rows = pd.DataFrame({
+        'row': rejeitados.index,
+        'ID': bruto.loc[rejeitados.index, 'ID'].str.strip().to_numpy(),
+        'reason': rejeitados.to_numpy(),
+    })
+    return IngestReport(
+        accepted=len(novos),
+        rejected=len(rejected_rows),
+        reasons=rejeitados.value_counts().to_dict(),
+        rejected_rows=rejected_rows,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingere novos lotes de pedidos no dataset limpo.')
+    parser.add_argument('batches', nargs='+', help='arquivos csv dos lotes, na ordem de chegada')
+    parser.add_argument('--data', default=loader.DATA_PATH, help='csv com o histórico (padrão: train.csv)')
+    parser.add_argument('--rejected', default=None, help='grava as linhas descartadas neste csv')
+    args = parser.parse_args()
+
+    rejeitados = []
+    for batch_path in args.batches:
+        report = ingest_batch(batch_path, args.data)
+        print(f'{batch_path}: {report.accepted} linhas aceitas, {report.rejected} descartadas')
+        for motivo, quantidade in report.reasons.items():
+            print(f'    {motivo}: {quantidade}')
+        rejeitados.append(report.rejected_rows.assign(batch=batch_path))
+
+    if args.rejected:
+        pd.concat(rejeitados).to_csv(args.rejected, index=False)
+
+
+if __name__ == '__main__':
+    main()
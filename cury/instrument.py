@@ -0,0 +1,202 @@
+'''
+Instrumentação das etapas das páginas: tempo, linhas de entrada e saída e memória alocada.
+
+Fica desligada por padrão. A variável de ambiente CURY_INSTRUMENT liga a coleta e recebe
+uma lista de opções separadas por vírgula:
+    log     grava um registro json por execução da página no logger 'cury.metrics'
+    panel   mostra a tabela das etapas na barra lateral
+    memory  mede a memória alocada em cada etapa (tracemalloc; tem custo)
+ex.: CURY_INSTRUMENT=panel,memory streamlit run Home.py
+Com CURY_METRICS_FILE=metricas.jsonl os registros também são anexados ao arquivo.
+Desligada, cada ponto instrumentado custa apenas a verificação de uma variável global.
+'''
+# Import libraries
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import namedtuple
+
+import pandas as pd
+
+# seconds: tempo de parede; rows_in/rows_out: linhas de entrada e do resultado (quando houver);
+# bytes: memória alocada pela etapa (líquida), só com a opção memory
+StageRecord = namedtuple('StageRecord', ['name', 'seconds', 'rows_in', 'rows_out', 'bytes'])
+
+logger = logging.getLogger('cury.metrics')
+
+_options = frozenset()
+_enabled = False
+_metrics_file = None
+_file_lock = threading.Lock()
+# cada sessão do Streamlit executa a página na sua própria thread
+_local = threading.local()
+
+
+def configure(options=None, metrics_file=None):
+    '''
+    Função que liga ou desliga a instrumentação.
+    Input:
+        - options: opções ('log', 'panel', 'memory') em lista ou texto separado por vírgula;
+          None lê a variável CURY_INSTRUMENT, vazio desliga
+        - metrics_file: arquivo jsonl para os registros; None lê a variável CURY_METRICS_FILE
+    '''
+    global _options, _enabled, _metrics_file
+    if options is None:
+        options = os.environ.get('CURY_INSTRUMENT', '')
+    if isinstance(options, str):
+        options = [o.strip() for o in options.split(',')]
+    _options = frozenset(o for o in options if o and o not in ('0', 'off'))
+    _metrics_file = metrics_file if metrics_file is not None else os.environ.get('CURY_METRICS_FILE') or None
+    _enabled = bool(_options) or _metrics_file is not None
+    if 'log' in _options and not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
+        logger.setLevel(logging.INFO)
+    if 'memory' in _options and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def enabled():
+    '''
+    Função que indica se a instrumentação está ligada.
+    Output: bool
+    '''
+    return _enabled
+
+
+class _Stage:
+    '''
+    Etapa em andamento; rows_out pode ser preenchido dentro do bloco with.
+    '''
+    __slots__ = ('name', 'rows_in', 'rows_out', '_inicio', '_memoria')
+
+    def __init__(self, name, rows_in):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+
+    def __enter__(self):
+        self._memoria = tracemalloc.get_traced_memory()[0] if 'memory' in _options else None
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        segundos = time.perf_counter() - self._inicio
+        alocado = None
+        if self._memoria is not None:
+            alocado = tracemalloc.get_traced_memory()[0] - self._memoria
+        run = getattr(_local, 'run', None)
+        if run is not None:
+            run['stages'].append(StageRecord(self.name, segundos, self.rows_in, self.rows_out, alocado))
+        return False
+
+
+class _NullStage:
+    '''
+    Etapa usada com a instrumentação desligada: não mede nada.
+    '''
+    __slots__ = ()
+    rows_out = property(lambda self: None, lambda self, value: None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name, rows_in=None):
+    '''
+    Função que mede um bloco de código da página.
+    Uso:
+        with stage('agregação', rows_in=len(df1)) as s:
+            df_aux = ...
+            s.rows_out = len(df_aux)
+    Input: nome da etapa, linhas de entrada
+    Output: context manager
+    '''
+    if not _enabled:
+        return _NULL_STAGE
+    return _Stage(name, rows_in)
+
+
+def _rows(valor):
+    return len(valor) if isinstance(valor, (pd.DataFrame, pd.Series)) else None
+
+
+def traced(name, func, *args, **kwargs):
+    '''
+    Função que executa func(*args, **kwargs) como uma etapa medida. As linhas de entrada
+    e de saída são as do primeiro argumento e do resultado, quando forem data frames.
+    Input: nome da etapa, função e seus argumentos
+    Output: resultado de func
+    '''
+    if not _enabled:
+        return func(*args, **kwargs)
+    with _Stage(name, _rows(args[0]) if args else None) as s:
+        resultado = func(*args, **kwargs)
+        s.rows_out = _rows(resultado)
+    return resultado
+
+
+def start_run(page):
+    '''
+    Função que inicia o registro de uma execução (rerun) da página.
+    Input: nome da página
+    '''
+    if not _enabled:
+        return
+    _local.run = {'page': page, 'started': time.time(), 'inicio': time.perf_counter(), 'stages': []}
+
+
+def finish_run():
+    '''
+    Função que encerra o registro da execução da página: grava o log e o arquivo de
+    métricas e, com a opção panel, mostra as etapas na barra lateral.
+    Output: dicionário com a página, o tempo total e as etapas (ou None, se desligada)
+    '''
+    run = getattr(_local, 'run', None)
+    if not _enabled or run is None:
+        return None
+    _local.run = None
+    registro = {
+        'page': run['page'],
+        'started': run['started'],
+        'seconds': time.perf_counter() - run['inicio'],
+        'stages': [s._asdict() for s in run['stages']],
+    }
+
+    if 'log' in _options:
+        logger.info(json.dumps(registro))
+    if _metrics_file is not None:
+        with _file_lock, open(_metrics_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro) + '\n')
+    if 'panel' in _options:
+        _show_panel(registro)
+    return registro
+
+
+def _show_panel(registro):
+    '''
+    Função que mostra as etapas da execução e os contadores dos caches de gráficos e de
+    resultados num expander da barra lateral.
+    '''
+    import streamlit as st
+
+    from cury.figcache import cache_info, result_cache_info
+
+    df_aux = pd.DataFrame(registro['stages'], columns=StageRecord._fields)
+    df_aux = df_aux.astype({'rows_in': 'Int64', 'rows_out': 'Int64', 'bytes': 'Int64'})
+    df_aux['ms'] = (df_aux['seconds'] * 1000).round(2)
+    with st.sidebar.expander(f"Debug: {registro['seconds'] * 1000:.0f} ms nesta execução"):
+        st.dataframe(df_aux.loc[:, ['name', 'ms', 'rows_in', 'rows_out', 'bytes']], hide_index=True)
+        caches = pd.DataFrame([cache_info(), result_cache_info()], index=['figures', 'results'])
+        st.dataframe(caches.loc[:, ['hits', 'misses', 'size', 'maxsize']])
+
+
+configure()
@@ -0,0 +1,156 @@
+# Import libraries
+import os
+import threading
+
+import pandas as pd
+
+from cury import shared, store
+from cury.cleaning import prepare_orders
+from cury.instrument import traced
+
+# Copy-on-Write garante que nenhuma página altere o data frame compartilhado
+# (já é o padrão a partir do pandas 3.0)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+DATA_PATH = 'train.csv'
+
+# Cache por processo: caminho absoluto -> (chave do arquivo, data frame limpo)
+_cache = {}
+# Estruturas derivadas: (nome, caminho absoluto) -> (chave do arquivo, valor)
+_derived = {}
+# Uma trava por estrutura derivada em construção: estruturas diferentes são montadas em
+# paralelo e cada uma apenas uma vez, mesmo com várias sessões pedindo ao mesmo tempo
+_building = {}
+_lock = threading.RLock()
+
+
+def file_key(path=DATA_PATH):
+    '''
+    Função que identifica a versão do arquivo de origem pelo caminho, data de modificação e tamanho.
+    Input: caminho do arquivo
+    Output: tupla (caminho absoluto, mtime em ns, tamanho em bytes)
+    '''
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+def data_key(path=DATA_PATH):
+    '''
+    Função que identifica a versão dos dados usada nos caches: no modo compartilhado
+    (cury.shared), a versão do snapshot publicado; caso contrário, a versão do arquivo.
+    Input: caminho do arquivo
+    Output: tupla (caminho absoluto, ...)
+    '''
+    if shared.enabled():
+        version = shared.current_version(path)
+        if version is not None:
+            return (os.path.abspath(path), 'shared', version)
+    return file_key(path)
+
+
+def _read_orders(path, version=None):
+    '''
+    Função que anexa ao snapshot compartilhado, quando houver versão publicada; senão abre
+    o cache colunar (memory-map) quando ele está atualizado e, caso contrário, lê e limpa
+    o csv e regrava o cache para o próximo cold start.
+    Input: caminho absoluto do csv, versão do snapshot compartilhado
+    Output: Dataframe limpo
+    '''
+    if version is not None:
+        return traced('attach_shared', shared.attach, path, version)
+
+    df1 = traced('read_store', store.read_store, path)
+    if df1 is not None:
+        return df1
+
+    df1 = traced('prepare_orders', prepare_orders, traced('read_csv', pd.read_csv, path))
+    if store.pa is not None:
+        try:
+            store.build_store(path, df1=df1)
+        except OSError:
+            # diretório somente leitura: segue sem cache em disco
+            pass
+    return df1
+
+
+def load_orders(path=DATA_PATH):
+    '''
+    Função que lê e limpa o arquivo de pedidos uma única vez por processo
+    (ou abre o cache colunar gerado por cury.store, se estiver atualizado).
+    O resultado fica em cache e só é recarregado quando o arquivo muda (mtime ou tamanho).
+    Todas as páginas recebem o mesmo data frame limpo; com Copy-on-Write qualquer
+    alteração feita pela página fica restrita à cópia dela. No modo compartilhado o
+    data frame é o snapshot publicado por cury.shared, recarregado quando a versão muda.
+    Input: caminho do arquivo csv
+    Output: Dataframe limpo
+    '''
+    key = data_key(path)
+    with _lock:
+        cached = _cache.get(key[0])
+        if cached is None or cached[0] != key:
+            df1 = _read_orders(key[0], key[2] if key[1] == 'shared' else None)
+            cached = (key, df1)
+            _cache[key[0]] = cached
+    return cached[1].copy(deep=False)
+
+
+def load_derived(name, builder, path=DATA_PATH, from_path=False):
+    '''
+    Função que calcula uma estrutura derivada do data frame limpo (ex.: agregados)
+    uma única vez por versão do arquivo de origem e a compartilha entre as páginas.
+    Input:
+        - name: nome da estrutura (chave do cache)
+        - builder: função que recebe o Dataframe limpo e retorna a estrutura
+        - path: caminho do arquivo csv
+        - from_path: builder recebe o caminho do csv em vez do Dataframe (ex.: estruturas
+          montadas por consultas no DuckDB, sem carregar os pedidos)
+    Output: estrutura retornada por builder
+    '''
+    key = data_key(path)
+    with _lock:
+        cached = _derived.get((name, key[0]))
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        trava = _building.setdefault((name, key[0]), threading.Lock())
+    with trava:
+        with _lock:
+            cached = _derived.get((name, key[0]))
+        if cached is None or cached[0] != key:
+            cached = (key, builder(path if from_path else load_orders(path)))
+            with _lock:
+                _derived[(name, key[0])] = cached
+    return cached[1]
+
+
+def publish_orders(df1, path=DATA_PATH, updates=None):
+    '''
+    Função que substitui o data frame em cache pela versão atual do arquivo (usada após
+    uma ingestão incremental, para não reler o arquivo). As estruturas derivadas com
+    função de atualização em updates são atualizadas; as demais serão recalculadas.
+    Input:
+        - df1: Dataframe limpo correspondente ao arquivo atual
+        - path: caminho do arquivo csv
+        - updates: dicionário nome -> função(valor antigo) -> valor novo
+    '''
+    updates = updates or {}
+    key = data_key(path)
+    with _lock:
+        _cache[key[0]] = (key, df1)
+        for (name, p), (_, value) in list(_derived.items()):
+            if p != key[0]:
+                continue
+            if name in updates:
+                _derived[(name, p)] = (key, updates[name](value))
+            else:
+                del _derived[(name, p)]
+
+
+def clear_cache():
+    '''
+    Função que descarta os data frames e estruturas em cache, forçando a releitura na próxima chamada.
+    '''
+    with _lock:
+        _cache.clear()
+        _derived.clear()
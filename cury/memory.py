@@ -0,0 +1,20 @@
+# Import libraries
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    '''
+    Função que retorna o pico de memória residente (RSS) do processo, em MB.
+    Input: -
+    Output: float, ou None quando a plataforma não informa o pico (Windows)
+    '''
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # o Linux informa em KB e o macOS em bytes
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
@@ -0,0 +1,215 @@
+'''
+API de métricas do Growth Dashboard, sem a interface do Streamlit.
+
+Uma função por KPI do README. Todas aceitam os mesmos filtros das páginas e alguns a
+mais, e retornam escalares, namedtuples ou Dataframes pequenos, sem montar gráficos:
+    - date: data limite (exclusiva), como o slider das páginas
+    - traffic, weather, city: listas de valores aceitos de Road_traffic_density,
+      Weatherconditions e City (None = todos)
+    - path: arquivo de origem
+
+Os números são os mesmos das páginas, calculados sobre as mesmas estruturas derivadas
+(índice, cubo diário, sketches e resumo do tempo), que ficam em cache por versão dos
+dados, e pelo mesmo backend de cálculo (cury.backend: pandas ou duckdb). KPIS lista as
+funções pelo nome, usado pelo servidor HTTP (cury.server).
+
+Uso:
+    from cury import metrics
+    metrics.orders_per_week(date=datetime.datetime(2022, 4, 1), traffic=['Low', 'Jam'])
+'''
+# Import libraries
+from cury import backend, sketch
+from cury.loader import DATA_PATH
+from cury.rollup import cube_count
+from cury.summary import mean_distance as _mean_distance
+from cury.timeseries import rolling_series, weekly_series
+
+
+def _filters(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    return backend.Filters(date, traffic, weather, city, path)
+
+
+def _cube(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    '''
+    Função que retorna o cubo diário do recorte (ver backend.filtered_cube).
+    Output: DailyCube
+    '''
+    return backend.filtered_cube(_filters(date, traffic, weather, city, path))
+
+
+def _summary(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    return backend.time_summary(_filters(date, traffic, weather, city, path))
+
+
+# =========================================
+# Visão empresa
+# =========================================
+def orders_per_day(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    '''
+    Função que conta os pedidos por dia.
+    Output: Dataframe com Order_Date e orders
+    '''
+    df_aux = cube_count(_cube(date, traffic, weather, city, path), ['Order_Date'])
+    return df_aux.rename(columns={'ID': 'orders'})
+
+
+def orders_per_week(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    '''
+    Função que conta os pedidos por semana (de domingo a sábado).
+    Output: Dataframe com week (domingo que inicia a semana), week_of_year e orders
+    '''
+    df_aux = weekly_series(_cube(date, traffic, weather, city, path))
+    return df_aux.loc[:, ['week', 'week_of_year', 'orders']]
+
+
+def orders_by_traffic(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    '''
+    Função que calcula a quantidade e a proporção dos pedidos por densidade de tráfego.
+    Output: Dataframe com Road_traffic_density, orders e share
+    '''
+    df_aux = cube_count(_cube(date, traffic, weather, city, path), ['Road_traffic_density'])
+    df_aux = df_aux.rename(columns={'ID': 'orders'})
+    df_aux['share'] = df_aux['orders'] / df_aux['orders'].sum()
+    return df_aux
+
+
+def orders_by_city_traffic(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    '''
+    Função que conta os pedidos por cidade e densidade de tráfego.
+    Output: Dataframe com City, Road_traffic_density e orders
+    '''
+    df_aux = cube_count(_cube(date, traffic, weather, city, path), ['City', 'Road_traffic_density'])
+    return df_aux.rename(columns={'ID': 'orders'})
+
+
+def orders_per_courier_by_week(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    '''
+    Função que calcula a quantidade de pedidos por entregador em cada semana.
+    Output: Dataframe com week, week_of_year, orders, couriers e orders_per_courier
+    '''
+    df_aux = weekly_series(_cube(date, traffic, weather, city, path))
+    return df_aux.loc[:, ['week', 'week_of_year', 'orders', 'couriers', 'orders_per_courier']]
+
+
+def rolling_orders(date=None, traffic=None, weather=None, city=None, path=DATA_PATH, window=7):
+    '''
+    Função que calcula pedidos, entregadores, pedidos por entregador e tempo de entrega
+    em janela móvel de window dias.
+    Output: Dataframe com Order_Date, orders, couriers, orders_per_courier, avg_time e std_time
+    '''
+    return rolling_series(_cube(date, traffic, weather, city, path), int(window))
+
+
+def city_centers(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    '''
+    Função que calcula a localização central de cada cidade por densidade de tráfego.
+    Output: Dataframe com City, Road_traffic_density, Delivery_location_latitude e Delivery_location_longitude
+    '''
+    return backend.city_centers(_filters(date, traffic, weather, city, path))
+
+
+# =========================================
+# Visão entregadores
+# =========================================
+def courier_overview(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    '''
+    Função que retorna a maior e a menor idade dos entregadores e a melhor e a pior condição dos veículos.
+    Output: CourierOverview
+    '''
+    return backend.courier_overview(_filters(date, traffic, weather, city, path))
+
+
+def rating_by_courier(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    '''
+    Função que calcula a avaliação média de cada entregador.
+    Output: Dataframe com Delivery_person_ID e Delivery_person_Ratings
+    '''
+    return backend.rating_by_courier(_filters(date, traffic, weather, city, path))
+
+
+def rating_by_traffic(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    '''
+    Função que calcula a média e o desvio padrão das avaliações por densidade de tráfego.
+    Output: Dataframe com Road_traffic_density, Delivery_mean e Delivery_std
+    '''
+    return backend.rating_stats(_filters(date, traffic, weather, city, path), 'Road_traffic_density')
+
+
+def rating_by_weather(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    '''
+    Função que calcula a média e o desvio padrão das avaliações por condição climática.
+    Output: Dataframe com Weatherconditions, Delivery_mean e Delivery_std
+    '''
+    return backend.rating_stats(_filters(date, traffic, weather, city, path), 'Weatherconditions')
+
+
+def courier_ranking(date=None, traffic=None, weather=None, city=None, path=DATA_PATH, k=10, stat='mean'):
+    '''
+    Função que retorna os k entregadores mais rápidos e mais lentos de cada cidade.
+    Output: Ranking (fastest, slowest)
+    '''
+    return backend.rank_couriers(_filters(date, traffic, weather, city, path), k=int(k), stat=stat)
+
+
+# =========================================
+# Visão restaurantes
+# =========================================
+def distinct_couriers(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    '''
+    Função que conta os entregadores únicos. Com filtros só de data e trânsito usa a mesma
+    estimativa da página (sketches diários); com filtros de clima ou cidade, que os
+    sketches não guardam, a contagem é exata.
+    Output: int
+    '''
+    if weather is None and city is None:
+        return sketch.distinct_couriers(sketch.filter_sketches(backend.load_sketches(path), date, backend.filter_values(traffic)))
+    return backend.count_couriers(_filters(date, traffic, weather, city, path))
+
+
+def mean_distance(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    '''
+    Função que calcula a distância média entre os restaurantes e os locais de entrega, em km.
+    Output: float arredondado em 2 casas, ou None quando não há pedidos no recorte
+    '''
+    return _mean_distance(_summary(date, traffic, weather, city, path))
+
+
+def time_by_city(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    '''
+    Função que calcula o tempo médio e o desvio padrão de entrega por cidade.
+    Output: Dataframe com City, avg_time, std_time e n
+    '''
+    return _summary(date, traffic, weather, city, path).city
+
+
+def time_by_city_order(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    '''
+    Função que calcula o tempo médio e o desvio padrão de entrega por cidade e tipo de pedido.
+    Output: Dataframe com City, Type_of_order, avg_time, std_time e n
+    '''
+    return _summary(date, traffic, weather, city, path).city_order
+
+
+def time_by_city_traffic(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    '''
+    Função que calcula o tempo médio e o desvio padrão de entrega por cidade e densidade de tráfego.
+    Output: Dataframe com City, Road_traffic_density, avg_time, std_time e n
+    '''
+    return _summary(date, traffic, weather, city, path).city_traffic
+
+
+def festival_time(date=None, traffic=None, weather=None, city=None, path=DATA_PATH):
+    '''
+    Função que calcula o tempo médio e o desvio padrão de entrega com e sem festival.
+    Output: Dataframe com Festival, avg_time, std_time e n
+    '''
+    return _summary(date, traffic, weather, city, path).festival
+
+
+# nome -> função de cada KPI (na ordem do README)
+KPIS = {func.__name__: func for func in [
+    orders_per_day, orders_per_week, orders_by_traffic, orders_by_city_traffic, orders_per_courier_by_week,
+    rolling_orders, city_centers,
+    courier_overview, rating_by_courier, rating_by_traffic, rating_by_weather, courier_ranking,
+    distinct_couriers, mean_distance, time_by_city, time_by_city_order, time_by_city_traffic, festival_time,
+]}
@@ -0,0 +1,118 @@
+'''
+Ranking dos entregadores mais rápidos e mais lentos por cidade.
+
+Um único groupby calcula a estatística de cada (cidade, entregador); para cada cidade os
+k primeiros em cada direção são escolhidos por seleção parcial (np.partition), ordenando
+apenas os candidatos. Os empates são desfeitos pelo ID do entregador, como numa
+ordenação estável completa.
+'''
+# Import libraries
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+RANK_STATS = ['mean', 'median', 'trimmed']
+
+# fastest/slowest: Dataframes com City, Delivery_person_ID e a estatística do tempo,
+# com os k entregadores de cada cidade em sequência (cidades em ordem alfabética)
+Ranking = namedtuple('Ranking', ['fastest', 'slowest'])
+
+
+def _trimmed_mean(df1, keys, value, trim):
+    '''
+    Função que calcula a média aparada de value por grupo: em cada grupo são descartados
+    floor(n * trim) valores em cada ponta (como scipy.stats.trim_mean).
+    Output: Series indexada pelas chaves (ordenadas)
+    '''
+    grupos = df1.groupby(keys, observed=True, sort=True)[value]
+    codes = grupos.ngroup().to_numpy()
+    valores = df1[value].to_numpy(dtype=float)
+    ordem = np.lexsort((valores, codes))
+    codes, valores = codes[ordem], valores[ordem]
+
+    contagem = np.bincount(codes)
+    inicio = np.concatenate([[0], np.cumsum(contagem)[:-1]])
+    posicao = np.arange(len(codes)) - inicio[codes]
+    corte = np.floor(contagem * trim).astype(int)[codes]
+    manter = (posicao >= corte) & (posicao < contagem[codes] - corte)
+
+    soma = np.bincount(codes[manter], weights=valores[manter], minlength=len(contagem))
+    n = np.bincount(codes[manter], minlength=len(contagem))
+    return pd.Series(soma / n, index=grupos.size().index, name=value)
+
+
+def courier_stats(df1, stat='mean', trim=0.1, by='City', value='Time_taken(min)'):
+    '''
+    Função que calcula a estatística do tempo de entrega de cada entregador por cidade.
+    Input:
+        - df1: Dataframe limpo
+        - stat: 'mean', 'median' ou 'trimmed' (média aparada)
+        - trim: fração descartada em cada ponta na média aparada
+        - by: coluna da cidade
+        - value: coluna do tempo
+    Output: Series indexada por (cidade, entregador), ordenada pelas chaves
+    '''
+    keys = [by, 'Delivery_person_ID']
+    if stat == 'mean':
+        return df1.groupby(keys, observed=True, sort=True)[value].mean()
+    if stat == 'median':
+        return df1.groupby(keys, observed=True, sort=True)[value].median()
+    if stat == 'trimmed':
+        return _trimmed_mean(df1, keys, value, trim)
+    raise ValueError(f'estatística desconhecida: {stat!r} (use uma de {RANK_STATS})')
+
+
+def _top_k(valores, k):
+    '''
+    Função que retorna as posições dos k menores valores, em ordem crescente e, nos
+    empates, na ordem das posições. Só os candidatos até o k-ésimo valor são ordenados.
+    '''
+    if len(valores) > k:
+        limite = np.partition(valores, k - 1)[k - 1]
+        candidatos = np.flatnonzero(valores <= limite)
+    else:
+        candidatos = np.arange(len(valores))
+    return candidatos[np.argsort(valores[candidatos], kind='stable')][:k]
+
+
+def rank_couriers(df1, k=10, stat='mean', trim=0.1, by='City', value='Time_taken(min)'):
+    '''
+    Função que encontra os k entregadores mais rápidos e os k mais lentos de cada cidade
+    presente nos dados, numa única agregação.
+    Input:
+        - df1: Dataframe limpo
+        - k: quantidade de entregadores por cidade
+        - stat, trim: estatística usada no ranking (ver courier_stats)
+        - by: coluna da cidade
+        - value: coluna do tempo
+    Output: Ranking
+    '''
+    return rank_stats(courier_stats(df1, stat, trim, by, value), k)
+
+
+def rank_stats(serie, k=10):
+    '''
+    Função que escolhe os k menores e os k maiores valores de cada cidade a partir da
+    estatística por (cidade, entregador), como a de courier_stats.
+    Input: Series indexada por (cidade, entregador), ordenada pelas chaves; k
+    Output: Ranking
+    '''
+    serie = serie.dropna()
+    cidades = serie.index.get_level_values(0)
+    valores = serie.to_numpy(dtype=float)
+    # as chaves estão ordenadas: cada cidade ocupa uma faixa contínua
+    _, inicios = np.unique(pd.factorize(cidades)[0], return_index=True)
+    fins = np.append(inicios[1:], len(valores))
+
+    rapidos, lentos = [], []
+    for inicio, fim in zip(inicios, fins):
+        faixa = valores[inicio:fim]
+        rapidos.append(inicio + _top_k(faixa, k))
+        lentos.append(inicio + _top_k(-faixa, k))
+
+    def montar(posicoes):
+        posicoes = np.concatenate(posicoes) if posicoes else np.empty(0, dtype=int)
+        return serie.iloc[posicoes].reset_index()
+
+    return Ranking(montar(rapidos), montar(lentos))
@@ -0,0 +1,127 @@
+'''
+Cubo diário pré-agregado dos pedidos.
+
+Cada célula do cubo é uma combinação (Order_Date, City, Road_traffic_density,
+Weatherconditions, Festival, Type_of_order) com contagens, somas e somas dos quadrados
+das medidas. Os gráficos consultam o cubo em vez das linhas de pedidos, então o custo
+depende do número de dias e categorias, e não do volume de pedidos.
+'''
+# Import libraries
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from cury.cleaning import concat_orders
+from cury.loader import DATA_PATH, load_derived
+
+CUBE_KEYS = ['Order_Date', 'City', 'Road_traffic_density', 'Weatherconditions', 'Festival', 'Type_of_order']
+
+# medida -> coluna do data frame limpo
+MEASURES = {
+    'time': 'Time_taken(min)',
+    'rating': 'Delivery_person_Ratings',
+    'distance': 'distance',
+}
+
+# nome do cubo no cache de estruturas derivadas do loader
+CUBE_NAME = 'daily_cube'
+
+# cells: uma linha por célula do cubo
+# couriers: entregadores distintos por dia e trânsito (hash de 64 bits do entregador)
+DailyCube = namedtuple('DailyCube', ['cells', 'couriers'])
+
+
+def build_cube(df1):
+    '''
+    Função que agrega o data frame limpo no cubo diário.
+    Para cada medida guarda n (valores não nulos), soma e soma dos quadrados, o que
+    permite recompor média e desvio padrão de qualquer recorte.
+    Input: Dataframe limpo
+    Output: DailyCube
+    '''
+    aux = df1.loc[:, CUBE_KEYS]
+    aux['orders'] = 1
+    for name, col in MEASURES.items():
+        valores = df1[col].astype(float)
+        aux[f'{name}_n'] = valores.notna().astype(int)
+        aux[f'{name}_sum'] = valores.fillna(0)
+        aux[f'{name}_sq'] = valores.fillna(0) ** 2
+    cells = aux.groupby(CUBE_KEYS, observed=True, sort=True).sum().reset_index()
+
+    # "sketch" exato por dia e trânsito: conjunto de hashes dos entregadores, mesclável por
+    # união (o hash é estável, então cubos de lotes diferentes podem ser combinados)
+    couriers = pd.DataFrame({
+        'Order_Date': df1['Order_Date'].to_numpy(),
+        'Road_traffic_density': df1['Road_traffic_density'].to_numpy(),
+        'courier': pd.util.hash_pandas_object(df1['Delivery_person_ID'], index=False).to_numpy(),
+    }).drop_duplicates(ignore_index=True)
+
+    return DailyCube(cells, couriers)
+
+
+def load_cube(path=DATA_PATH):
+    '''
+    Função que retorna o cubo diário da versão atual do arquivo, calculado uma única vez por processo.
+    Input: caminho do arquivo csv
+    Output: DailyCube
+    '''
+    return load_derived(CUBE_NAME, build_cube, path)
+
+
+def merge_cube(cube, other):
+    '''
+    Função que combina dois cubos (ex.: o cubo atual e o de um novo lote de pedidos),
+    somando as células com as mesmas chaves e unindo os conjuntos de entregadores.
+    Input: DailyCube, DailyCube
+    Output: DailyCube
+    '''
+    cells = concat_orders([cube.cells, other.cells])
+    cells = cells.groupby(CUBE_KEYS, observed=True, sort=True).sum().reset_index()
+    couriers = concat_orders([cube.couriers, other.couriers]).drop_duplicates(ignore_index=True)
+    return DailyCube(cells, couriers)
+
+
+def filter_cube(cube, date_slider=None, traffic_options=None):
+    '''
+    Função que aplica os filtros da barra lateral (data limite e condições de trânsito) ao cubo.
+    Input: DailyCube, data limite (exclusiva), lista de densidades de trânsito
+    Output: DailyCube filtrado
+    '''
+    cells, couriers = cube
+    if date_slider is not None:
+        cells = cells.loc[cells['Order_Date'] < date_slider, :]
+        couriers = couriers.loc[couriers['Order_Date'] < date_slider, :]
+    if traffic_options is not None:
+        cells = cells.loc[cells['Road_traffic_density'].isin(traffic_options), :]
+        couriers = couriers.loc[couriers['Road_traffic_density'].isin(traffic_options), :]
+    return DailyCube(cells, couriers)
+
+
+def cube_count(cube, keys):
+    '''
+    Função que conta os pedidos por um subconjunto das chaves do cubo.
+    Input: DailyCube, lista de chaves
+    Output: Dataframe com as chaves e a coluna ID (quantidade de pedidos)
+    '''
+    df_aux = cube.cells.groupby(keys, observed=True, sort=True)['orders'].sum().reset_index()
+    return df_aux.rename(columns={'orders': 'ID'})
+
+
+def cube_mean_std(cube, keys, measure):
+    '''
+    Função que calcula a média e o desvio padrão amostral de uma medida por um
+    subconjunto das chaves, a partir das somas e somas dos quadrados do cubo.
+    Input: DailyCube, lista de chaves, medida ('time', 'rating' ou 'distance')
+    Output: Dataframe com as chaves e as colunas avg, std e n
+    '''
+    cols = [f'{measure}_n', f'{measure}_sum', f'{measure}_sq']
+    df_aux = cube.cells.groupby(keys, observed=True, sort=True)[cols].sum().reset_index()
+    n, soma, quadrados = (df_aux[c].to_numpy(dtype=float) for c in cols)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = soma / n
+        variancia = np.clip(quadrados - soma * media, 0, None) / (n - 1)
+    df_aux['avg'] = media
+    df_aux['std'] = np.where(n > 1, np.sqrt(variancia), np.nan)
+    df_aux['n'] = n.astype(int)
+    return df_aux.loc[:, keys + ['avg', 'std', 'n']]
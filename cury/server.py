@@ -0,0 +1,214 @@
+'''
+Servidor HTTP/JSON local com os KPIs de cury.metrics, para outros serviços consultarem
+as métricas sem renderizar o dashboard.
+
+Rotas:
+    GET /metrics                  -> nomes dos KPIs e seus parâmetros
+    GET /metrics/<kpi>?filtros    -> resultado do KPI em JSON
+
+Filtros na query string: date=AAAA-MM-DD (data limite, exclusiva); traffic, weather e
+city com valores separados por vírgula (ou repetidos); e os parâmetros próprios do KPI
+(ex.: k e stat em courier_ranking, window em rolling_orders). Dataframes viram listas de
+registros, namedtuples viram objetos e datas viram texto ISO.
+
+Os KPIs são calculados pelo backend em uso (cury.backend; CURY_BACKEND=duckdb consulta o
+Parquet sem carregar os pedidos na memória do servidor).
+
+As respostas ficam num cache LRU por (versão dos dados, KPI, parâmetros normalizados):
+uma nova versão dos dados (ingestão ou csv novo) muda a chave, então não há resposta
+velha. O cabeçalho X-Cache informa hit ou miss.
+
+Uso:
+    python -m cury.server --port 8502                   # train.csv do diretório atual
+    curl 'http://127.0.0.1:8502/metrics/orders_per_week?traffic=Low,Jam&date=2022-04-01'
+'''
+# Import libraries
+import argparse
+import datetime
+import inspect
+import json
+import logging
+import math
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from cury.backend import prepare
+from cury.figcache import normalize_filters
+from cury.loader import DATA_PATH, data_key
+from cury.metrics import KPIS
+
+logger = logging.getLogger('cury.server')
+
+MAX_RESPONSES = 256
+
+# filtros com vários valores (separados por vírgula ou repetidos na query string)
+LIST_PARAMS = ['traffic', 'weather', 'city']
+
+_responses = OrderedDict()
+_stats = {'hits': 0, 'misses': 0}
+_lock = threading.Lock()
+
+
+def to_json(valor):
+    '''
+    Função que converte o resultado de um KPI em tipos serializáveis em JSON.
+    Input: escalar, namedtuple, Dataframe ou Series
+    Output: valor serializável (NaN vira None)
+    '''
+    if isinstance(valor, pd.DataFrame):
+        return json.loads(valor.to_json(orient='records', date_format='iso'))
+    if isinstance(valor, pd.Series):
+        return json.loads(valor.to_json(orient='values', date_format='iso'))
+    if isinstance(valor, tuple) and hasattr(valor, '_fields'):
+        return {campo: to_json(v) for campo, v in zip(valor._fields, valor)}
+    if isinstance(valor, (pd.Timestamp, datetime.date)):
+        return valor.isoformat()
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    return valor
+
+
+def parse_params(func, query):
+    '''
+    Função que converte a query string nos argumentos do KPI.
+    Input: função do KPI, dicionário parâmetro -> lista de valores (parse_qs)
+    Output: dicionário de argumentos
+    Lança ValueError quando há parâmetro desconhecido ou valor inválido (os parâmetros
+    inteiros, como k e window, são quantidades e precisam ser pelo menos 1).
+    '''
+    aceitos = inspect.signature(func).parameters
+    args = {}
+    for nome, valores in query.items():
+        if nome not in aceitos or nome == 'path':
+            raise ValueError(f'parâmetro desconhecido: {nome}')
+        if nome in LIST_PARAMS:
+            args[nome] = [v for valor in valores for v in valor.split(',') if v]
+        elif nome == 'date':
+            args[nome] = datetime.datetime.fromisoformat(valores[-1])
+        elif isinstance(aceitos[nome].default, int):
+            args[nome] = int(valores[-1])
+            if args[nome] < 1:
+                raise ValueError(f'{nome} precisa ser pelo menos 1: {valores[-1]}')
+        else:
+            args[nome] = valores[-1]
+    return args
+
+
+def _params_json(args):
+    return {nome: valor.isoformat() if isinstance(valor, datetime.date) else valor for nome, valor in args.items()}
+
+
+def query_kpi(name, args, path=DATA_PATH):
+    '''
+    Função que calcula o KPI (ou reaproveita a resposta em cache) e retorna o JSON.
+    Input: nome do KPI, argumentos, caminho do arquivo csv
+    Output: tupla (texto JSON, True quando veio do cache)
+    '''
+    key = (data_key(path), name, normalize_filters(args))
+    with _lock:
+        if key in _responses:
+            _responses.move_to_end(key)
+            _stats['hits'] += 1
+            return _responses[key], True
+        _stats['misses'] += 1
+
+    corpo = json.dumps({'kpi': name, 'params': _params_json(args), 'result': to_json(KPIS[name](path=path, **args))})
+    with _lock:
+        _responses[key] = corpo
+        _responses.move_to_end(key)
+        while len(_responses) > MAX_RESPONSES:
+            _responses.popitem(last=False)
+    return corpo, False
+
+
+def cache_info():
+    '''
+    Função que retorna os contadores do cache de respostas.
+    Output: dicionário com hits, misses, size e maxsize
+    '''
+    with _lock:
+        return {'hits': _stats['hits'], 'misses': _stats['misses'], 'size': len(_responses), 'maxsize': MAX_RESPONSES}
+
+
+def _catalog():
+    return {nome: [p for p in inspect.signature(func).parameters if p != 'path'] for nome, func in KPIS.items()}
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    '''
+    Rotas GET /metrics e /metrics/<kpi>; o arquivo de dados fica em server.path.
+    '''
+
+    def _send(self, status, corpo, cache=None):
+        dados = corpo.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(dados)))
+        if cache is not None:
+            self.send_header('X-Cache', 'hit' if cache else 'miss')
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        partes = [p for p in url.path.split('/') if p]
+        if partes == ['metrics']:
+            return self._send(200, json.dumps({'kpis': _catalog()}))
+        if len(partes) != 2 or partes[0] != 'metrics' or partes[1] not in KPIS:
+            return self._send(404, json.dumps({'error': f'rota desconhecida: {url.path}'}))
+        try:
+            args = parse_params(KPIS[partes[1]], parse_qs(url.query))
+            corpo, hit = query_kpi(partes[1], args, self.server.path)
+        except ValueError as erro:
+            # parâmetro inválido (ex.: data fora do formato ISO ou estatística desconhecida)
+            return self._send(400, json.dumps({'error': str(erro)}))
+        except Exception as erro:
+            # falha no cálculo do KPI: responde em JSON em vez de derrubar a conexão sem resposta
+            logger.exception('erro ao calcular %s', self.path)
+            return self._send(500, json.dumps({'error': f'{type(erro).__name__}: {erro}'}))
+        self._send(200, corpo, hit)
+
+    def log_message(self, format, *args):
+        # sem log por requisição no stderr (o servidor atende muitas consultas curtas)
+        pass
+
+
+def make_server(host='127.0.0.1', port=8502, path=DATA_PATH):
+    '''
+    Função que cria o servidor (uma thread por requisição), sem iniciá-lo.
+    Input: endereço, porta (0 = porta livre), caminho do arquivo csv
+    Output: ThreadingHTTPServer
+    '''
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.path = path
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor HTTP/JSON com os KPIs do dashboard.')
+    parser.add_argument('csv', nargs='?', default=DATA_PATH, help='arquivo de pedidos')
+    parser.add_argument('--host', default='127.0.0.1', help='endereço (padrão: só local)')
+    parser.add_argument('--port', type=int, default=8502, help='porta')
+    args = parser.parse_args()
+
+    # prepara os dados do backend (data frame em memória ou Parquet) antes da primeira requisição
+    prepare(args.csv)
+    server = make_server(args.host, args.port, args.csv)
+    print(f'métricas em http://{args.host}:{server.server_address[1]}/metrics')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+'''
+Dataset limpo compartilhado entre os processos do Streamlit, via memory-map somente leitura.
+
+Um processo publicador grava o data frame limpo num snapshot Arrow IPC (um único record
+batch, sem compressão e sem bitmaps de nulos) e aponta para ele num arquivo de versão.
+Cada página, em cada processo, anexa ao snapshot: as colunas são views dos buffers do
+arquivo mapeado (os códigos das categóricas e os valores numéricos também), então o
+sistema operacional mantém uma única cópia dos dados na memória para todos os processos.
+A exceção são as colunas de texto (ID): no pandas 2 elas viram arrays de objetos Python,
+copiados em cada processo; no pandas 3 o dtype str já é um array Arrow sobre o arquivo.
+As views são somente leitura; com Copy-on-Write as páginas que alteram colunas recebem cópias.
+
+Troca de versão: o snapshot novo é gravado por completo e só então o arquivo de versão é
+substituído atomicamente (os.replace). Os processos percebem a nova versão na próxima
+execução da página; quem ainda usa a versão anterior continua com o mapeamento válido.
+
+Uso:
+    python -m cury.shared train.csv --dir /dev/shm/cury             # publica uma vez
+    python -m cury.shared train.csv --dir /dev/shm/cury --watch 30  # republica quando o csv mudar
+    CURY_SHARED_DIR=/dev/shm/cury streamlit run Home.py             # as páginas anexam ao snapshot
+'''
+# Import libraries
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+from cury import store
+from cury.cleaning import prepare_orders
+
+try:
+    import pyarrow as pa
+except ImportError:  # sem pyarrow o modo compartilhado fica indisponível
+    pa = None
+
+# snapshots de versões anteriores mantidos no diretório (além do atual)
+KEEP_SNAPSHOTS = 1
+
+_META_COLUMNS = b'cury.columns'
+_INDEX_COLUMN = '__index__'
+
+_directory = None
+# caminho do arquivo de versão -> ((mtime, tamanho), versão): evita reler o json a cada execução
+_versions = {}
+_lock = threading.Lock()
+
+
+def configure(directory=None):
+    '''
+    Função que liga ou desliga o modo compartilhado.
+    Input: diretório dos snapshots; None lê a variável CURY_SHARED_DIR, vazio desliga
+    '''
+    global _directory
+    if directory is None:
+        directory = os.environ.get('CURY_SHARED_DIR', '')
+    _directory = directory or None
+    _versions.clear()
+
+
+def enabled():
+    '''
+    Função que indica se as páginas devem anexar ao dataset compartilhado.
+    Output: bool
+    '''
+    return _directory is not None and pa is not None
+
+
+def _dataset_name(csv_path):
+    '''
+    Função que retorna o nome dos arquivos de um csv no diretório dos snapshots: o nome do
+    csv e o hash do caminho absoluto, para que csv de mesmo nome em diretórios diferentes
+    não dividam o arquivo de versão nem os snapshots.
+    '''
+    nome = os.path.splitext(os.path.basename(csv_path))[0]
+    caminho = hashlib.sha256(os.path.abspath(csv_path).encode('utf-8')).hexdigest()[:12]
+    return f'{nome}-{caminho}'
+
+
+def _pointer_path(csv_path, directory):
+    return os.path.join(directory, f'{_dataset_name(csv_path)}.json')
+
+
+def _snapshot_path(csv_path, version, directory):
+    return os.path.join(directory, f'{_dataset_name(csv_path)}-{version}.arrow')
+
+
+def _to_table(df1):
+    '''
+    Função que converte o data frame limpo numa tabela Arrow cujas colunas podem ser
+    lidas sem cópia: categóricas viram seus códigos (as categorias vão nos metadados),
+    numéricas e datas mantêm o tipo numpy (NaN continua NaN, sem bitmap de nulos).
+    '''
+    arrays, colunas = {}, []
+    for col in df1.columns:
+        serie = df1[col]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            arrays[col] = pa.array(serie.cat.codes.to_numpy())
+            colunas.append({'name': col, 'kind': 'category', 'categories': serie.cat.categories.tolist()})
+        elif serie.dtype.kind in 'biufM':
+            arrays[col] = pa.array(serie.to_numpy(), from_pandas=False)
+            colunas.append({'name': col, 'kind': 'numpy'})
+        else:
+            arrays[col] = pa.array(serie.to_numpy(), type=pa.large_string())
+            colunas.append({'name': col, 'kind': 'string'})
+    arrays[_INDEX_COLUMN] = pa.array(df1.index.to_numpy())
+    table = pa.table(arrays)
+    return table.replace_schema_metadata({_META_COLUMNS: json.dumps(colunas).encode()})
+
+
+def _from_table(table):
+    '''
+    Função que monta o data frame limpo sobre os buffers da tabela. Categóricas, numéricas
+    e datas não são copiadas. Colunas de texto só são compartilhadas quando o pandas usa
+    strings Arrow (pandas 3 com pyarrow); no pandas 2 cada processo tem a sua cópia delas.
+    '''
+    colunas = json.loads(table.schema.metadata[_META_COLUMNS])
+    index = pd.Index(table.column(_INDEX_COLUMN).chunk(0).to_numpy(zero_copy_only=True))
+    series = {}
+    for col in colunas:
+        valores = table.column(col['name']).chunk(0)
+        if col['kind'] == 'category':
+            valores = pd.Categorical.from_codes(valores.to_numpy(zero_copy_only=True),
+                                                dtype=pd.CategoricalDtype(col['categories']), validate=False)
+        elif col['kind'] == 'numpy':
+            valores = valores.to_numpy(zero_copy_only=True)
+        else:
+            valores = valores.to_pandas().array
+        series[col['name']] = pd.Series(valores, index=index, copy=False)
+    return pd.DataFrame(series, copy=False)
+
+
+def publish(csv_path, directory=None, df1=None):
+    '''
+    Função que publica o data frame limpo do csv como snapshot compartilhado. A versão é
+    o hash do csv e a versão do schema: republicar o mesmo conteúdo não grava nada.
+    Input:
+        - csv_path: caminho do csv de origem
+        - directory: diretório dos snapshots (padrão: o configurado)
+        - df1: data frame já limpo, para evitar reprocessar o csv
+    Output: versão publicada
+    '''
+    if pa is None:
+        raise ImportError('pyarrow é necessário para o modo compartilhado')
+    directory = directory or _directory
+    if directory is None:
+        raise ValueError('informe o diretório dos snapshots (ou defina CURY_SHARED_DIR)')
+    os.makedirs(directory, exist_ok=True)
+    stat = os.stat(csv_path)
+    version = f'v{store.SCHEMA_VERSION}-{store.source_hash(csv_path)[:16]}'
+    pointer = _pointer_path(csv_path, directory)
+    destino = _snapshot_path(csv_path, version, directory)
+
+    if not os.path.exists(destino):
+        if df1 is None:
+            df1 = store.read_store(csv_path)
+        if df1 is None:
+            df1 = prepare_orders(pd.read_csv(csv_path))
+        table = _to_table(df1)
+        tmp = f'{destino}.{os.getpid()}.tmp'
+        with pa.OSFile(tmp, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=max(len(table), 1))
+        os.replace(tmp, destino)
+
+    registro = {
+        'version': version,
+        'file': os.path.basename(destino),
+        'source': os.path.abspath(csv_path),
+        'source_mtime_ns': stat.st_mtime_ns,
+        'source_size': stat.st_size,
+        'published': time.time(),
+    }
+    tmp = f'{pointer}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(registro, f)
+    os.replace(tmp, pointer)
+    _remove_old_snapshots(csv_path, destino, directory)
+    return version
+
+
+def _remove_old_snapshots(csv_path, atual, directory):
+    '''
+    Função que apaga os snapshots antigos, mantendo o atual e os KEEP_SNAPSHOTS mais recentes.
+    Os processos que ainda mapeiam um arquivo apagado continuam lendo normalmente.
+    '''
+    nome = _dataset_name(csv_path)
+    antigos = [os.path.join(directory, f) for f in os.listdir(directory)
+               if f.startswith(f'{nome}-v') and f.endswith('.arrow')]
+    antigos = sorted((p for p in antigos if p != atual), key=os.path.getmtime, reverse=True)
+    for caminho in antigos[KEEP_SNAPSHOTS:]:
+        try:
+            os.remove(caminho)
+        except OSError:
+            # Windows: arquivo ainda mapeado por algum processo
+            pass
+
+
+def current_version(csv_path, directory=None):
+    '''
+    Função que retorna a versão publicada para o csv. O arquivo de versão só é relido
+    quando muda (mtime ou tamanho).
+    Input: caminho do csv, diretório dos snapshots
+    Output: versão, ou None se nada foi publicado
+    '''
+    pointer = _pointer_path(csv_path, directory or _directory)
+    try:
+        stat = os.stat(pointer)
+    except FileNotFoundError:
+        return None
+    chave = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _versions.get(pointer)
+        if cached is None or cached[0] != chave:
+            with open(pointer, encoding='utf-8') as f:
+                cached = (chave, json.load(f)['version'])
+            _versions[pointer] = cached
+    return cached[1]
+
+
+def attach(csv_path, version, directory=None):
+    '''
+    Função que anexa ao snapshot de uma versão publicada (memory-map somente leitura).
+    Input: caminho do csv, versão, diretório dos snapshots
+    Output: Dataframe limpo cujas colunas apontam para o arquivo mapeado
+    '''
+    source = pa.memory_map(_snapshot_path(csv_path, version, directory or _directory), 'r')
+    table = pa.ipc.open_file(source).read_all()
+    return _from_table(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Publica o dataset limpo para os processos do Streamlit.')
+    parser.add_argument('csv_path', nargs='?', default='train.csv')
+    parser.add_argument('--dir', default=None, help='diretório dos snapshots (padrão: CURY_SHARED_DIR)')
+    parser.add_argument('--watch', type=float, default=None,
+                        help='verifica o csv a cada tantos segundos e republica quando ele mudar')
+    args = parser.parse_args()
+
+    ultima = None
+    while True:
+        stat = os.stat(args.csv_path)
+        if (stat.st_mtime_ns, stat.st_size) != ultima:
+            version = publish(args.csv_path, args.dir)
+            ultima = (stat.st_mtime_ns, stat.st_size)
+            print(f'{args.csv_path} publicado na versão {version}', flush=True)
+        if args.watch is None:
+            break
+        time.sleep(args.watch)
+
+
+configure()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+'''
+Sketches mescláveis por dia e categoria: entregadores distintos e percentis do tempo.
+
+Entregadores distintos: HyperLogLog com 2**HLL_PRECISION registradores, guardado em forma
+esparsa (só os registradores ocupados) por (Order_Date, Road_traffic_density). Mesclar
+dois sketches é tomar o máximo de cada registrador.
+
+Percentis do tempo de entrega: histograma em escala logarítmica (como o DDSketch), com
+erro relativo de no máximo QUANTILE_ACCURACY, guardado por (Order_Date, City,
+Road_traffic_density, Festival). Mesclar é somar as contagens de cada faixa.
+
+Qualquer recorte de datas e categorias é respondido mesclando as linhas do recorte, sem
+voltar aos pedidos; o tamanho dos sketches não cresce com o volume de pedidos.
+'''
+# Import libraries
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from cury.cleaning import concat_orders
+from cury.loader import DATA_PATH, load_derived
+
+SKETCHES_NAME = 'daily_sketches'
+
+# registradores do HyperLogLog: 2**14 (erro padrão ~0,8%; quase exato em poucos milhares)
+HLL_PRECISION = 14
+
+# erro relativo máximo dos percentis
+QUANTILE_ACCURACY = 0.01
+
+QUANTILES = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99}
+
+COURIER_KEYS = ['Order_Date', 'Road_traffic_density']
+TIME_KEYS = ['Order_Date', 'City', 'Road_traffic_density', 'Festival']
+
+TIME_COLUMN = 'Time_taken(min)'
+
+# faixa usada para valores <= 0 (estimados como 0)
+_ZERO_BUCKET = np.iinfo(np.int32).min
+
+_GAMMA = (1 + QUANTILE_ACCURACY) / (1 - QUANTILE_ACCURACY)
+
+# couriers: Dataframe com COURIER_KEYS, register e rank (registradores ocupados do HyperLogLog);
+# times: Dataframe com TIME_KEYS, bucket e count (histograma logarítmico do tempo)
+DailySketches = namedtuple('DailySketches', ['couriers', 'times'])
+
+
+def _registers(ids, precision=HLL_PRECISION):
+    '''
+    Função que calcula o registrador e o posto (posição do primeiro bit 1, a partir de 1)
+    do hash de 64 bits de cada entregador.
+    Output: tupla (registradores, postos)
+    '''
+    hashes = pd.util.hash_pandas_object(ids, index=False).to_numpy()
+    bits = 64 - precision
+    register = (hashes >> np.uint64(bits)).astype(np.int32)
+    resto = hashes & np.uint64((1 << bits) - 1)
+    # resto < 2**50: a conversão para float é exata e frexp devolve o número de bits
+    tamanho = np.frexp(resto.astype(float))[1]
+    return register, (bits - tamanho + 1).astype(np.uint8)
+
+
+def _buckets(valores):
+    '''
+    Função que retorna a faixa logarítmica de cada valor: ceil(log_gamma(valor)).
+    '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        faixas = np.ceil(np.log(valores) / np.log(_GAMMA))
+    return np.where(valores > 0, faixas, _ZERO_BUCKET).astype(np.int32)
+
+
+def _bucket_value(faixas):
+    '''
+    Função que retorna o valor representativo de cada faixa (erro relativo <= QUANTILE_ACCURACY).
+    '''
+    faixas = np.asarray(faixas)
+    valores = 2 * _GAMMA ** faixas.astype(float) / (_GAMMA + 1)
+    return np.where(faixas == _ZERO_BUCKET, 0.0, valores)
+
+
+def build_sketches(df1):
+    '''
+    Função que monta os sketches diários de entregadores distintos e do tempo de entrega.
+    Input: Dataframe limpo
+    Output: DailySketches
+    '''
+    tempo = df1[TIME_COLUMN].to_numpy(dtype=float)
+    validos = ~np.isnan(tempo)
+    times = df1.loc[validos, TIME_KEYS]
+    times[TIME_COLUMN] = tempo[validos]
+    times['count'] = 1
+    return sketches_from_counts(df1.loc[:, COURIER_KEYS + ['Delivery_person_ID']], times)
+
+
+def sketches_from_counts(couriers, times):
+    '''
+    Função que monta os sketches diários a partir de linhas já reduzidas: os entregadores de
+    cada dia e trânsito (com ou sem repetições) e a quantidade de pedidos de cada tempo de
+    entrega por TIME_KEYS (ex.: o resultado de um GROUP BY em cury.backend).
+    Input: Dataframe com COURIER_KEYS e Delivery_person_ID; Dataframe com TIME_KEYS, o tempo (sem nulos) e count
+    Output: DailySketches
+    '''
+    register, rank = _registers(couriers['Delivery_person_ID'])
+    aux = pd.DataFrame({
+        'Order_Date': couriers['Order_Date'].to_numpy(),
+        'Road_traffic_density': couriers['Road_traffic_density'].to_numpy(),
+        'register': register,
+        'rank': rank,
+    })
+    aux = aux.groupby(COURIER_KEYS + ['register'], observed=True, sort=True)['rank'].max().reset_index()
+
+    tempos = times.loc[:, TIME_KEYS]
+    tempos['bucket'] = _buckets(times[TIME_COLUMN].to_numpy(dtype=float))
+    tempos['count'] = times['count'].to_numpy()
+    tempos = tempos.groupby(TIME_KEYS + ['bucket'], observed=True, sort=True)['count'].sum().reset_index()
+
+    return DailySketches(aux, tempos)
+
+
+def load_sketches(path=DATA_PATH):
+    '''
+    Função que retorna os sketches da versão atual do arquivo, calculados uma única vez por processo.
+    Input: caminho do arquivo csv
+    Output: DailySketches
+    '''
+    return load_derived(SKETCHES_NAME, build_sketches, path)
+
+
+def merge_sketches(sketches, other):
+    '''
+    Função que combina dois conjuntos de sketches (ex.: os atuais e os de um novo lote),
+    com o máximo de cada registrador e a soma das contagens de cada faixa.
+    Input: DailySketches, DailySketches
+    Output: DailySketches
+    '''
+    couriers = concat_orders([sketches.couriers, other.couriers])
+    couriers = couriers.groupby(COURIER_KEYS + ['register'], observed=True, sort=True)['rank'].max().reset_index()
+    times = concat_orders([sketches.times, other.times])
+    times = times.groupby(TIME_KEYS + ['bucket'], observed=True, sort=True)['count'].sum().reset_index()
+    return DailySketches(couriers, times)
+
+
+def filter_sketches(sketches, date_slider=None, traffic_options=None):
+    '''
+    Função que aplica os filtros da barra lateral (data limite e condições de trânsito) aos sketches.
+    Input: DailySketches, data limite (exclusiva), lista de densidades de trânsito
+    Output: DailySketches filtrados
+    '''
+    def filtrar(linhas):
+        if date_slider is not None:
+            linhas = linhas.loc[linhas['Order_Date'] < date_slider, :]
+        if traffic_options is not None:
+            linhas = linhas.loc[linhas['Road_traffic_density'].isin(traffic_options), :]
+        return linhas
+
+    return DailySketches(filtrar(sketches.couriers), filtrar(sketches.times))
+
+
+def hll_estimate(registers):
+    '''
+    Função que estima a quantidade de elementos distintos de cada linha de registradores
+    (com a correção por contagem linear para poucos elementos).
+    Input: array 2d de postos (uma linha por grupo, 2**HLL_PRECISION colunas)
+    Output: array de estimativas
+    '''
+    m = registers.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimativa = alpha * m * m / np.exp2(-registers.astype(float)).sum(axis=1)
+    vazios = (registers == 0).sum(axis=1)
+    with np.errstate(divide='ignore'):
+        linear = m * np.log(m / vazios)
+    return np.where((estimativa <= 2.5 * m) & (vazios > 0), linear, estimativa)
+
+
+def _grouped(linhas, keys, coluna, valor, funcao):
+    '''
+    Função que agrega linhas dos sketches pelas chaves pedidas (ou tudo num só grupo).
+    Output: tupla (Dataframe agregado, códigos dos grupos, Dataframe com as chaves de cada grupo)
+    '''
+    chaves = keys or ['_grupo']
+    if not keys:
+        linhas = linhas.assign(_grupo=0)
+    df_aux = linhas.groupby(chaves + [coluna], observed=True, sort=True)[valor].agg(funcao).reset_index()
+    grupos = df_aux.groupby(chaves, observed=True, sort=True)
+    return df_aux, grupos.ngroup().to_numpy(), grupos.size().reset_index().loc[:, keys]
+
+
+def distinct_couriers(sketches, keys=()):
+    '''
+    Função que estima os entregadores distintos por um subconjunto das chaves
+    (Order_Date, Road_traffic_density), mesclando os registradores do recorte.
+    Input: DailySketches, lista de chaves (vazia: todo o recorte)
+    Output: int, sem chaves, ou Dataframe com as chaves e a coluna Delivery_person_ID
+    '''
+    keys = list(keys)
+    if len(sketches.couriers) == 0:
+        return 0 if not keys else pd.DataFrame(columns=keys + ['Delivery_person_ID'])
+    df_aux, codes, chaves = _grouped(sketches.couriers, keys, 'register', 'rank', 'max')
+    registers = np.zeros((len(chaves), 2 ** HLL_PRECISION), dtype=np.uint8)
+    registers[codes, df_aux['register'].to_numpy()] = df_aux['rank'].to_numpy()
+    estimativa = np.round(hll_estimate(registers)).astype(int)
+    if not keys:
+        return int(estimativa[0])
+    chaves['Delivery_person_ID'] = estimativa
+    return chaves
+
+
+def time_quantiles(sketches, keys=(), quantiles=QUANTILES):
+    '''
+    Função que calcula percentis do tempo de entrega por um subconjunto de TIME_KEYS,
+    somando os histogramas do recorte.
+    Input: DailySketches, lista de chaves (vazia: todo o recorte), dicionário nome -> quantil
+    Output: Dataframe com as chaves, uma coluna por percentil e n
+    '''
+    keys = list(keys)
+    if len(sketches.times) == 0:
+        return pd.DataFrame(columns=keys + list(quantiles) + ['n'])
+    df_aux, codes, chaves = _grouped(sketches.times, keys, 'bucket', 'count', 'sum')
+    contagem = df_aux['count'].to_numpy()
+    acumulado = np.cumsum(contagem)
+    n = np.bincount(codes, weights=contagem).astype(int)
+    # contagem acumulada antes do início de cada grupo (as faixas estão ordenadas dentro do grupo)
+    antes = np.concatenate([[0], np.cumsum(n)[:-1]])
+    for nome, q in quantiles.items():
+        # posição (a partir de 0) do elemento de ordem q * (n - 1) em cada grupo
+        alvo = antes + np.floor(q * (n - 1))
+        linha = np.searchsorted(acumulado, alvo, side='right')
+        chaves[nome] = _bucket_value(df_aux['bucket'].to_numpy()[linha])
+    chaves['n'] = n
+    return chaves
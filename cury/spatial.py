@@ -0,0 +1,187 @@
+'''
+Índice espacial em grade para consultas por raio e de vizinhos mais próximos.
+
+Os pontos são ordenados pelo código da célula (linha de latitude x coluna de longitude)
+de uma grade de INDEX_CELL_DEG graus. Uma consulta por raio percorre só as células que
+cobrem o retângulo envolvente do círculo (uma busca binária por linha de latitude) e
+confirma os candidatos com a distância haversine, então o custo depende da quantidade
+de pontos próximos e não do total de pedidos.
+'''
+# Import libraries
+from collections import namedtuple
+
+import numpy as np
+
+from cury.geo import AVG_EARTH_RADIUS_KM, haversine_km
+from cury.loader import DATA_PATH, load_derived
+
+# tamanho da célula em graus (~5,5 km de latitude)
+INDEX_CELL_DEG = 0.05
+
+GEO_INDEX_NAME = 'geo_index'
+
+# cell: tamanho da célula; codes: código da célula de cada ponto (ordenado);
+# positions: posição do ponto no data frame de origem; lat/lon: coordenadas na mesma ordem
+SpatialIndex = namedtuple('SpatialIndex', ['cell', 'codes', 'positions', 'lat', 'lon'])
+
+# restaurants: Dataframe com lat, lon e orders (um restaurante por par de coordenadas);
+# restaurant_index: índice sobre restaurants; delivery_index: índice sobre os pedidos
+GeoIndex = namedtuple('GeoIndex', ['restaurants', 'restaurant_index', 'delivery_index'])
+
+
+def _columns(cell):
+    return int(np.ceil(360 / cell))
+
+
+def _cell_codes(lat, lon, cell):
+    colunas = _columns(cell)
+    ilat = np.floor((lat + 90) / cell).astype(np.int64)
+    ilon = np.floor((lon + 180) / cell).astype(np.int64) % colunas
+    return ilat * colunas + ilon
+
+
+def build_spatial_index(lat, lon, cell=INDEX_CELL_DEG):
+    '''
+    Função que monta o índice em grade sobre um conjunto de pontos (os pontos sem
+    coordenada válida ficam de fora).
+    Input: arrays de latitude e longitude em graus, tamanho da célula em graus
+    Output: SpatialIndex
+    '''
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    validos = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon) & (np.abs(lat) <= 90))
+    codes = _cell_codes(lat[validos], lon[validos], cell)
+    ordem = np.argsort(codes, kind='stable')
+    posicoes = validos[ordem]
+    return SpatialIndex(cell, codes[ordem], posicoes, lat[posicoes], lon[posicoes])
+
+
+def _lon_ranges(lon, dlon, cell):
+    '''
+    Função que retorna as faixas de colunas da grade que cobrem [lon - dlon, lon + dlon],
+    dividindo a faixa quando ela atravessa o antimeridiano.
+    '''
+    colunas = _columns(cell)
+    if dlon is None:
+        return [(0, colunas - 1)]
+    inicio = int(np.floor((lon - dlon + 180) / cell))
+    fim = int(np.floor((lon + dlon + 180) / cell))
+    if fim - inicio + 1 >= colunas:
+        return [(0, colunas - 1)]
+    inicio, fim = inicio % colunas, fim % colunas
+    if inicio <= fim:
+        return [(inicio, fim)]
+    return [(inicio, colunas - 1), (0, fim)]
+
+
+def query_radius(index, lat, lon, radius_km):
+    '''
+    Função que encontra os pontos a até radius_km do ponto (lat, lon).
+    Input: SpatialIndex, latitude e longitude em graus, raio em km
+    Output: tupla (posições no data frame de origem em ordem crescente, distâncias em km)
+    '''
+    angulo = radius_km / AVG_EARTH_RADIUS_KM
+    dlat = np.degrees(angulo)
+    lat_min, lat_max = lat - dlat, lat + dlat
+    if lat_min <= -90 or lat_max >= 90 or angulo >= np.pi / 2:
+        # o círculo contém um polo: todas as longitudes
+        dlon = None
+    else:
+        dlon = np.degrees(np.arcsin(min(1.0, np.sin(angulo) / np.cos(np.radians(lat)))))
+
+    linhas = np.arange(int(np.floor((max(lat_min, -90) + 90) / index.cell)),
+                       int(np.floor((min(lat_max, 90) + 90) / index.cell)) + 1)
+    colunas = _columns(index.cell)
+    faixas = []
+    for inicio, fim in _lon_ranges(lon, dlon, index.cell):
+        esquerda = np.searchsorted(index.codes, linhas * colunas + inicio, side='left')
+        direita = np.searchsorted(index.codes, linhas * colunas + fim, side='right')
+        faixas.extend(np.arange(a, b) for a, b in zip(esquerda, direita) if b > a)
+    candidatos = np.concatenate(faixas) if faixas else np.empty(0, dtype=np.int64)
+
+    distancias = haversine_km(lat, lon, index.lat[candidatos], index.lon[candidatos])
+    dentro = distancias <= radius_km
+    posicoes, distancias = index.positions[candidatos[dentro]], distancias[dentro]
+    ordem = np.argsort(posicoes)
+    return posicoes[ordem], distancias[ordem]
+
+
+def query_nearest(index, lat, lon, k=1):
+    '''
+    Função que encontra os k pontos mais próximos de (lat, lon), com consultas por raio
+    que dobram de tamanho até conter k pontos.
+    Input: SpatialIndex, latitude e longitude em graus, quantidade de vizinhos
+    Output: tupla (posições no data frame de origem, distâncias em km), da mais próxima à mais distante
+    '''
+    raio = np.radians(index.cell) * AVG_EARTH_RADIUS_KM
+    while True:
+        posicoes, distancias = query_radius(index, lat, lon, raio)
+        if len(posicoes) >= k or raio >= np.pi * AVG_EARTH_RADIUS_KM:
+            break
+        raio *= 2
+    ordem = np.argsort(distancias, kind='stable')[:k]
+    return posicoes[ordem], distancias[ordem]
+
+
+def build_geo_index(df1):
+    '''
+    Função que monta os índices espaciais dos restaurantes (pares de coordenadas
+    distintos) e dos locais de entrega (um ponto por pedido) do data frame limpo.
+    Input: Dataframe limpo
+    Output: GeoIndex
+    '''
+    restaurants = (df1.groupby(['Restaurant_latitude', 'Restaurant_longitude'], sort=True)
+                   .size().rename('orders').reset_index()
+                   .rename(columns={'Restaurant_latitude': 'lat', 'Restaurant_longitude': 'lon'}))
+    return GeoIndex(
+        restaurants=restaurants,
+        restaurant_index=build_spatial_index(restaurants['lat'], restaurants['lon']),
+        delivery_index=build_spatial_index(df1['Delivery_location_latitude'], df1['Delivery_location_longitude']),
+    )
+
+
+def load_geo_index(path=DATA_PATH):
+    '''
+    Função que retorna os índices espaciais da versão atual do arquivo, calculados uma única vez por processo.
+    Input: caminho do arquivo csv
+    Output: GeoIndex
+    '''
+    return load_derived(GEO_INDEX_NAME, build_geo_index, path)
+
+
+def restrict(posicoes, selecao):
+    '''
+    Função que mantém apenas as posições que fazem parte da seleção dos filtros da página.
+    Input: posições (ordenadas), seleção (slice ou array ordenado, como em select_positions)
+    Output: array de posições
+    '''
+    if selecao is None:
+        return posicoes
+    if isinstance(selecao, slice):
+        return posicoes[(posicoes >= (selecao.start or 0)) & (posicoes < selecao.stop)]
+    if len(selecao) == 0:
+        return posicoes[:0]
+    encontrado = np.minimum(np.searchsorted(selecao, posicoes), len(selecao) - 1)
+    return posicoes[selecao[encontrado] == posicoes]
+
+
+def orders_near(geo, lat, lon, radius_km, selecao=None):
+    '''
+    Função que encontra os pedidos entregues a até radius_km do ponto (lat, lon).
+    Input: GeoIndex, latitude e longitude em graus, raio em km, seleção dos filtros da página
+    Output: array de posições no data frame limpo (ordenado)
+    '''
+    posicoes, _ = query_radius(geo.delivery_index, lat, lon, radius_km)
+    return restrict(posicoes, selecao)
+
+
+def nearest_restaurants(geo, lat, lon, k=10):
+    '''
+    Função que encontra os k restaurantes mais próximos do ponto (lat, lon).
+    Input: GeoIndex, latitude e longitude em graus, quantidade de restaurantes
+    Output: Dataframe com lat, lon, orders e distance_km
+    '''
+    posicoes, distancias = query_nearest(geo.restaurant_index, lat, lon, k)
+    df_aux = geo.restaurants.iloc[posicoes].reset_index(drop=True)
+    df_aux['distance_km'] = distancias
+    return df_aux
@@ -0,0 +1,446 @@
+'''
+Cache colunar (Feather/Arrow IPC) do data frame de pedidos já limpo.
+
+Uso (etapa de build, após cada atualização do train.csv):
+    python -m cury.store train.csv
+    python -m cury.store train.csv --chunksize 200000   # modo streaming, memória limitada
+    python -m cury.store train.csv --workers 4          # limpeza paralela em 4 processos
+
+Ingestões incrementais (cury.ingest) não regravam o arquivo: as linhas novas vão para
+arquivos delta ao lado dele (train.feather.1.delta, ...), lidos junto com o arquivo base.
+Um build completo junta tudo num arquivo só e apaga os deltas.
+'''
+# Import libraries
+import argparse
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from cury.cleaning import CATEGORICAL_COLUMNS, TEXT_COLUMNS, concat_orders, prepare_orders, sort_orders
+from cury.memory import peak_rss_mb
+from cury.parallel import prepare_orders_parallel
+
+try:
+    import pyarrow as pa
+    from pyarrow import feather
+except ImportError:  # sem pyarrow os dashboards continuam lendo direto do csv
+    pa = None
+    feather = None
+
+# Incrementar sempre que o resultado de prepare_orders mudar de colunas ou tipos (ou o formato dos metadados)
+SCHEMA_VERSION = 6
+
+# arquivos delta aceitos antes de a ingestão regravar o cache completo
+MAX_DELTAS = 16
+
+_META_VERSION = b'cury.schema_version'
+# trechos do csv cobertos pelo arquivo: lista json de [tamanho em bytes, sha256], um por anexo
+_META_SEGMENTS = b'cury.source_segments'
+# linhas de dados do csv (a posição da próxima linha anexada)
+_META_ROWS = b'cury.source_rows'
+_META_MTIME = b'cury.source_mtime_ns'
+_META_SIZE = b'cury.source_size'
+
+# Resumo do build em streaming (peak_rss_mb: pico de memória do processo, em MB)
+StreamReport = namedtuple('StreamReport', ['path', 'rows_read', 'rows_written', 'chunks', 'peak_rss_mb'])
+
+
+def store_path(csv_path):
+    '''
+    Função que retorna o caminho padrão do cache colunar, ao lado do csv de origem.
+    Input: caminho do csv
+    Output: caminho do arquivo .feather
+    '''
+    return os.path.splitext(csv_path)[0] + '.feather'
+
+
+def delta_path(out, n):
+    '''
+    Função que retorna o caminho do n-ésimo arquivo delta do cache colunar.
+    Input: caminho do arquivo base, número do delta (a partir de 1)
+    Output: caminho do delta
+    '''
+    return f'{out}.{n}.delta'
+
+
+def _scan_source(csv_path, chunk_size=1 << 20):
+    '''
+    Função que lê o csv em blocos, calculando o sha256 e contando as linhas de dados.
+    obs.: assume, como cury.parallel, que nenhum campo tem quebra de linha dentro de aspas
+    e que o arquivo não tem linhas em branco.
+    Output: tupla (hash em hexadecimal, linhas de dados sem o cabeçalho)
+    '''
+    digest = hashlib.sha256()
+    linhas, ultimo = 0, b'\n'
+    with open(csv_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+            linhas += chunk.count(b'\n')
+            ultimo = chunk[-1:]
+    # a última linha sem quebra de linha no fim também conta
+    if ultimo != b'\n':
+        linhas += 1
+    return digest.hexdigest(), max(linhas - 1, 0)
+
+
+def source_hash(csv_path):
+    '''
+    Função que calcula o sha256 do arquivo de origem, lendo em blocos.
+    Input: caminho do csv
+    Output: hash em hexadecimal
+    '''
+    return _scan_source(csv_path)[0]
+
+
+def count_rows(csv_path):
+    '''
+    Função que conta as linhas de dados do csv (sem o cabeçalho), que são também as
+    posições usadas no índice do data frame limpo.
+    Input: caminho do csv
+    Output: int
+    '''
+    return _scan_source(csv_path)[1]
+
+
+def metadata_rows(metadata):
+    '''
+    Função que retorna a quantidade de linhas de dados do csv registrada nos metadados.
+    Input: dicionário de metadados do schema
+    Output: int
+    '''
+    return int(metadata[_META_ROWS])
+
+
+def _segments(metadata):
+    return json.loads(metadata.get(_META_SEGMENTS, b'[]'))
+
+
+def _remove_deltas(out):
+    n = 1
+    while os.path.exists(delta_path(out, n)):
+        os.remove(delta_path(out, n))
+        n += 1
+
+
+def build_store(csv_path, out=None, df1=None):
+    '''
+    Função que grava o data frame limpo em formato colunar tipado, sem compressão
+    (para permitir memory-map), com a versão do schema e o hash do csv nos metadados.
+    A escrita é atômica: os leitores nunca enxergam um arquivo pela metade.
+    Input:
+        - csv_path: caminho do csv de origem
+        - out: caminho de saída (padrão: store_path(csv_path))
+        - df1: data frame já limpo, para evitar reprocessar o csv
+    Output: caminho do arquivo gravado
+    '''
+    if pa is None:
+        raise ImportError('pyarrow é necessário para gravar o cache colunar')
+    out = out or store_path(csv_path)
+    stat = os.stat(csv_path)
+    if df1 is None:
+        df1 = prepare_orders(pd.read_csv(csv_path))
+
+    table = pa.Table.from_pandas(df1, preserve_index=True)
+    table = table.replace_schema_metadata(_store_metadata(table.schema, csv_path, stat))
+
+    tmp = f'{out}.{os.getpid()}.tmp'
+    feather.write_feather(table, tmp, compression='uncompressed')
+    os.replace(tmp, out)
+    _remove_deltas(out)
+    return out
+
+
+def append_store(csv_path, df1, dados, metadata, out=None):
+    '''
+    Função que grava as linhas anexadas ao csv por uma ingestão num novo arquivo delta,
+    sem reescrever o cache: os metadados são os do arquivo anterior com mais um trecho do
+    csv (o hash é calculado só sobre os bytes anexados). A escrita é atômica.
+    Input:
+        - csv_path: caminho do csv, já com as linhas anexadas
+        - df1: data frame limpo só com as linhas novas (índice = posição da linha no csv)
+        - dados: bytes anexados ao csv
+        - metadata: metadados do último arquivo do cache antes do anexo (fresh_chain)
+        - out: caminho do arquivo base (padrão: store_path(csv_path))
+    Output: caminho do delta gravado
+    '''
+    if pa is None:
+        raise ImportError('pyarrow é necessário para gravar o cache colunar')
+    out = out or store_path(csv_path)
+    stat = os.stat(csv_path)
+    segmentos = _segments(metadata) + [[len(dados), hashlib.sha256(dados).hexdigest()]]
+
+    table = pa.Table.from_pandas(df1, preserve_index=True)
+    table = table.replace_schema_metadata(
+        _store_metadata(table.schema, csv_path, stat, segmentos, metadata_rows(metadata) + len(df1)))
+
+    destino = delta_path(out, len(store_chain(csv_path, out)))
+    tmp = f'{destino}.{os.getpid()}.tmp'
+    feather.write_feather(table, tmp, compression='uncompressed')
+    os.replace(tmp, destino)
+    return destino
+
+
+def _store_metadata(schema, csv_path, stat, segments=None, rows=None):
+    '''
+    Função que acrescenta aos metadados do schema a versão do schema e a identificação do
+    csv (sem segments, o csv inteiro é lido para calcular o hash e contar as linhas).
+    '''
+    if segments is None:
+        digest, rows = _scan_source(csv_path)
+        segments = [[stat.st_size, digest]]
+    metadata = dict(schema.metadata or {})
+    metadata.update({
+        _META_VERSION: str(SCHEMA_VERSION).encode(),
+        _META_SEGMENTS: json.dumps(segments).encode(),
+        _META_ROWS: str(rows).encode(),
+        _META_MTIME: str(stat.st_mtime_ns).encode(),
+        _META_SIZE: str(stat.st_size).encode(),
+    })
+    return metadata
+
+
+def build_store_streaming(csv_path, out=None, chunksize=100_000):
+    '''
+    Função que grava o cache colunar lendo o csv em blocos de tamanho fixo, para arquivos
+    maiores que a memória. O pico de memória depende de chunksize, e não do tamanho do csv.
+        1. cada bloco passa por prepare_orders e é gravado num arquivo temporário, com um
+           record batch por dia (as categóricas vão como texto, pois cada bloco tem as suas)
+        2. os record batches são relidos em ordem de data e gravados no arquivo final em
+           grupos de até chunksize linhas, com as categorias unificadas
+    O resultado é idêntico ao de build_store.
+    Input:
+        - csv_path: caminho do csv de origem
+        - out: caminho de saída (padrão: store_path(csv_path))
+        - chunksize: quantidade de linhas por bloco
+    Output: StreamReport
+    '''
+    if pa is None:
+        raise ImportError('pyarrow é necessário para gravar o cache colunar')
+    out = out or store_path(csv_path)
+    stat = os.stat(csv_path)
+    tmp_runs = f'{out}.{os.getpid()}.runs'
+    tmp = f'{out}.{os.getpid()}.tmp'
+
+    # 1. blocos limpos -> arquivo temporário, um record batch por (bloco, dia)
+    categorias = {col: set() for col in CATEGORICAL_COLUMNS}
+    lotes = []  # por record batch, na ordem de gravação: (dia, quantidade de linhas)
+    linhas_lidas = 0
+    blocos = 0
+    schema = None
+    try:
+        with pa.OSFile(tmp_runs, 'wb') as sink:
+            writer = None
+            # as colunas com 'NaN ' são lidas como texto em todos os blocos, como no arquivo inteiro
+            for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype={col: object for col in TEXT_COLUMNS}):
+                linhas_lidas += len(chunk)
+                blocos += 1
+                df1 = prepare_orders(chunk)
+                for col in CATEGORICAL_COLUMNS:
+                    categorias[col].update(df1[col].cat.categories)
+                    df1[col] = df1[col].astype(object)
+                batch = pa.RecordBatch.from_pandas(df1, schema=schema, preserve_index=True)
+                if writer is None:
+                    schema = batch.schema
+                    writer = pa.ipc.new_file(sink, schema)
+                dias, inicios = np.unique(df1['Order_Date'].to_numpy(), return_index=True)
+                for dia, inicio, fim in zip(dias, inicios, np.append(inicios[1:], len(df1))):
+                    writer.write_batch(batch.slice(inicio, fim - inicio))
+                    lotes.append((dia, int(fim - inicio)))
+            if writer is not None:
+                writer.close()
+
+        if not lotes:
+            build_store(csv_path, out)
+            return StreamReport(out, linhas_lidas, 0, blocos, peak_rss_mb())
+
+        # 2. record batches em ordem de data -> arquivo final, em grupos de até chunksize linhas
+        # (leitura comum, sem memory-map: só os bytes de cada record batch são lidos)
+        dtypes = {col: pd.CategoricalDtype(sorted(categorias[col])) for col in CATEGORICAL_COLUMNS}
+        linhas_gravadas = 0
+        schema = None
+        with pa.OSFile(tmp_runs, 'rb') as source, pa.OSFile(tmp, 'wb') as sink:
+            reader = pa.ipc.open_file(source)
+            writer = None
+            for grupo in _merge_plan(lotes, chunksize):
+                tabela = pa.Table.from_batches([reader.get_batch(i).slice(inicio, qtd) for i, inicio, qtd in grupo])
+                df1 = tabela.to_pandas()
+                for col in CATEGORICAL_COLUMNS:
+                    df1[col] = df1[col].astype(dtypes[col])
+                table = pa.Table.from_pandas(df1, schema=schema, preserve_index=True)
+                if writer is None:
+                    schema = table.schema.with_metadata(_store_metadata(table.schema, csv_path, stat))
+                    table = table.replace_schema_metadata(schema.metadata)
+                    writer = pa.ipc.new_file(sink, schema)
+                writer.write_table(table)
+                linhas_gravadas += len(df1)
+            writer.close()
+        os.replace(tmp, out)
+        _remove_deltas(out)
+    finally:
+        for caminho in (tmp_runs, tmp):
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+    return StreamReport(out, linhas_lidas, linhas_gravadas, blocos, peak_rss_mb())
+
+
+def _merge_plan(lotes, chunksize):
+    '''
+    Função que planeja a releitura dos record batches em ordem de data: gera grupos de
+    até chunksize linhas, cada um uma lista de (record batch, posição inicial, quantidade).
+    Dentro de um mesmo dia os record batches seguem a ordem de gravação (a ordem do
+    arquivo), que é exatamente a ordem de uma ordenação estável do arquivo inteiro.
+    Input: lista de (dia, quantidade de linhas) por record batch
+    Output: gerador de listas de (record batch, início, quantidade)
+    '''
+    grupo, linhas = [], 0
+    for i in sorted(range(len(lotes)), key=lambda i: lotes[i][0]):
+        inicio, n = 0, lotes[i][1]
+        while inicio < n:
+            qtd = min(n - inicio, chunksize - linhas)
+            grupo.append((i, inicio, qtd))
+            linhas += qtd
+            inicio += qtd
+            if linhas == chunksize:
+                yield grupo
+                grupo, linhas = [], 0
+    if grupo:
+        yield grupo
+
+
+def store_chain(csv_path, out=None):
+    '''
+    Função que lista os arquivos do cache colunar: o arquivo base seguido dos deltas que o
+    continuam (cada delta cobre os trechos do csv do arquivo anterior e mais um). Um delta
+    que não continua o anterior (sobra de um cache antigo) encerra a lista.
+    Input: caminho do csv e do cache
+    Output: lista de tuplas (caminho, metadados); vazia se não houver cache
+    '''
+    out = out or store_path(csv_path)
+    cadeia = []
+    caminho = out
+    while pa is not None and os.path.exists(caminho):
+        try:
+            with pa.memory_map(caminho) as source:
+                metadata = pa.ipc.open_file(source).schema.metadata or {}
+        except (OSError, pa.ArrowInvalid):
+            break
+        if cadeia:
+            anteriores = _segments(cadeia[-1][1])
+            if metadata.get(_META_VERSION) != cadeia[-1][1].get(_META_VERSION) \
+                    or _segments(metadata)[:len(anteriores)] != anteriores:
+                break
+        cadeia.append((caminho, metadata))
+        caminho = delta_path(out, len(cadeia))
+    return cadeia
+
+
+def fresh_chain(csv_path, out=None):
+    '''
+    Função que retorna os arquivos do cache colunar (store_chain) se o último deles
+    corresponder ao csv atual e à versão do schema.
+    Input: caminho do csv e do cache
+    Output: lista de tuplas (caminho, metadados), ou None se o cache estiver ausente ou desatualizado
+    '''
+    cadeia = store_chain(csv_path, out)
+    if not cadeia or not metadata_is_fresh(cadeia[-1][1], csv_path):
+        return None
+    return cadeia
+
+
+def is_fresh(csv_path, out=None):
+    '''
+    Função que verifica se o cache colunar corresponde ao csv atual e à versão do schema.
+    Se mtime e tamanho baterem, o hash não é recalculado; caso contrário o hash decide
+    (um deploy que só copia o arquivo muda o mtime mas não o conteúdo).
+    Input: caminho do csv e do cache
+    Output: bool
+    '''
+    return fresh_chain(csv_path, out) is not None
+
+
+def _segments_match(csv_path, segmentos):
+    '''
+    Função que confere o hash de cada trecho do csv registrado nos metadados.
+    '''
+    if sum(tamanho for tamanho, _ in segmentos) != os.path.getsize(csv_path):
+        return False
+    with open(csv_path, 'rb') as f:
+        for tamanho, esperado in segmentos:
+            digest = hashlib.sha256()
+            restante = tamanho
+            while restante > 0:
+                chunk = f.read(min(restante, 1 << 20))
+                if not chunk:
+                    return False
+                digest.update(chunk)
+                restante -= len(chunk)
+            if digest.hexdigest() != esperado:
+                return False
+    return True
+
+
+def metadata_is_fresh(metadata, csv_path):
+    '''
+    Função que verifica se os metadados gravados por build_store ou append_store (também
+    copiados para outros formatos derivados do cache, como o Parquet de cury.backend)
+    correspondem ao csv atual e à versão do schema.
+    Input: dicionário de metadados do schema, caminho do csv
+    Output: bool
+    '''
+    if metadata.get(_META_VERSION) != str(SCHEMA_VERSION).encode():
+        return False
+    stat = os.stat(csv_path)
+    if (metadata.get(_META_MTIME) == str(stat.st_mtime_ns).encode()
+            and metadata.get(_META_SIZE) == str(stat.st_size).encode()):
+        return True
+    return _segments_match(csv_path, _segments(metadata))
+
+
+def read_store(csv_path, out=None):
+    '''
+    Função que abre o cache colunar via memory-map, se ele estiver atualizado. Com
+    arquivos delta, as partes são unidas e ordenadas como no build completo.
+    Input: caminho do csv e do cache
+    Output: Dataframe limpo, ou None se o cache estiver ausente ou desatualizado
+    '''
+    cadeia = fresh_chain(csv_path, out)
+    if cadeia is None:
+        return None
+    frames = [feather.read_table(caminho, memory_map=True).to_pandas(split_blocks=True) for caminho, _ in cadeia]
+    if len(frames) == 1:
+        return frames[0]
+    return sort_orders(concat_orders(frames))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera o cache colunar do dataset de pedidos limpo.')
+    parser.add_argument('csv_path', nargs='?', default='train.csv')
+    parser.add_argument('--out', default=None, help='arquivo de saída (padrão: <csv>.feather)')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='lê o csv em blocos com essa quantidade de linhas (modo streaming)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='limpa o csv em paralelo com essa quantidade de processos')
+    args = parser.parse_args()
+    if args.chunksize:
+        report = build_store_streaming(args.csv_path, args.out, args.chunksize)
+        mensagem = (f'cache gravado em {report.path} (schema v{SCHEMA_VERSION}): {report.rows_read} linhas '
+                    f'lidas em {report.chunks} blocos, {report.rows_written} gravadas')
+        if report.peak_rss_mb is not None:
+            mensagem += f', pico de memória {report.peak_rss_mb:.0f} MB'
+        print(mensagem)
+    elif args.workers:
+        df1 = prepare_orders_parallel(args.csv_path, args.workers)
+        out = build_store(args.csv_path, args.out, df1=df1)
+        print(f'cache gravado em {out} (schema v{SCHEMA_VERSION}) usando {args.workers} processos')
+    else:
+        out = build_store(args.csv_path, args.out)
+        print(f'cache gravado em {out} (schema v{SCHEMA_VERSION})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+'''
+Métricas de tempo de entrega da visão restaurante calculadas numa única passada.
+
+Um só groupby sobre os pedidos (no grão City x Type_of_order x Road_traffic_density x
+Festival) acumula contagem, soma e soma dos quadrados do tempo e a soma das distâncias.
+As tabelas por Festival, City, City x Type_of_order e City x Road_traffic_density são
+reagregações dessa tabela pequena, sem voltar aos pedidos.
+'''
+# Import libraries
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+SUMMARY_KEYS = ['City', 'Type_of_order', 'Road_traffic_density', 'Festival']
+
+TIME_COLUMN = 'Time_taken(min)'
+
+# festival, city, city_order, city_traffic: Dataframes com as chaves e avg_time, std_time e n;
+# distance: Dataframe com City e a distância média (coluna distance)
+TimeSummary = namedtuple('TimeSummary', ['festival', 'city', 'city_order', 'city_traffic', 'distance'])
+
+
+def summary_cells(df1):
+    '''
+    Função que acumula, numa única passada pelos pedidos, a contagem, a soma e a soma dos
+    quadrados do tempo (deslocado pela média) e a soma das distâncias por SUMMARY_KEYS.
+    Input: Dataframe limpo (já filtrado)
+    Output: tupla (Dataframe com SUMMARY_KEYS, n, soma, quadrados e distancia; deslocamento)
+    '''
+    tempo = df1[TIME_COLUMN].to_numpy(dtype=float)
+    # deslocamento pela média: evita o cancelamento numérico em soma dos quadrados - soma * média
+    deslocamento = tempo.mean() if len(tempo) > 0 else 0.0
+    aux = df1.loc[:, SUMMARY_KEYS]
+    aux['n'] = 1
+    aux['soma'] = tempo - deslocamento
+    aux['quadrados'] = aux['soma'] ** 2
+    aux['distancia'] = df1['distance'].to_numpy(dtype=float)
+    celulas = aux.groupby(SUMMARY_KEYS, observed=True, sort=True).sum().reset_index()
+    return celulas, deslocamento
+
+
+def time_summary(df1):
+    '''
+    Função que calcula todas as médias, desvios padrão e contagens do tempo de entrega
+    usadas pela visão restaurante, numa única passada pelos pedidos.
+    Input: Dataframe limpo (já filtrado)
+    Output: TimeSummary
+    '''
+    return summary_from_cells(*summary_cells(df1))
+
+
+def summary_from_cells(celulas, deslocamento):
+    '''
+    Função que monta as tabelas da visão restaurante reagregando as células de summary_cells
+    (ou as mesmas células calculadas por outro backend, ex.: cury.backend).
+    Input: Dataframe das células, deslocamento do tempo usado nas somas
+    Output: TimeSummary
+    '''
+    def tempos(keys):
+        df_aux = celulas.groupby(keys, observed=True, sort=True)[['n', 'soma', 'quadrados']].sum().reset_index()
+        n, soma, quadrados = (df_aux[c].to_numpy(dtype=float) for c in ['n', 'soma', 'quadrados'])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variancia = np.clip(quadrados - soma * soma / n, 0, None) / (n - 1)
+        df_aux['avg_time'] = soma / n + deslocamento
+        df_aux['std_time'] = np.where(n > 1, np.sqrt(variancia), np.nan)
+        df_aux['n'] = n.astype(int)
+        return df_aux.loc[:, keys + ['avg_time', 'std_time', 'n']]
+
+    distancia = celulas.groupby('City', observed=True, sort=True)[['n', 'distancia']].sum().reset_index()
+    distancia['distance'] = distancia['distancia'] / distancia['n']
+
+    return TimeSummary(
+        festival=tempos(['Festival']),
+        city=tempos(['City']),
+        city_order=tempos(['City', 'Type_of_order']),
+        city_traffic=tempos(['City', 'Road_traffic_density']),
+        distance=distancia.loc[:, ['City', 'n', 'distance']],
+    )
+
+
+def festival_time(summary, festival, op):
+    '''
+    Função que retorna o tempo médio ou o desvio padrão das entregas com ou sem festival.
+    Input: TimeSummary, valor de Festival ('Yes' ou 'No'), 'avg_time' ou 'std_time'
+    Output: float arredondado em 2 casas, ou None quando não há entregas no recorte
+    '''
+    linha = summary.festival.loc[summary.festival['Festival'] == festival, op]
+    if len(linha) == 0:
+        return None
+    return float(np.round(linha.iloc[0], 2))
+
+
+def mean_distance(summary):
+    '''
+    Função que retorna a distância média de todo o recorte, a partir das médias por cidade.
+    Input: TimeSummary
+    Output: float arredondado em 2 casas
+    '''
+    n = summary.distance['n'].sum()
+    return float(np.round((summary.distance['distance'] * summary.distance['n']).sum() / n, 2)) if n else None
@@ -0,0 +1,111 @@
+'''
+Paginação, ordenação e busca no servidor para tabelas grandes (ex.: uma linha por entregador).
+
+A tabela agregada e a sua ordenação ficam em cache por estado dos filtros (no cache de
+resultados do figcache); a
+cada execução da página só a janela visível (page_size linhas) é enviada ao navegador,
+então o tamanho da mensagem e o tempo de serialização não crescem com a tabela.
+'''
+# Import libraries
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from cury.figcache import cached_result
+from cury.instrument import traced
+
+PAGE_SIZE = 50
+
+# rows: Dataframe com as linhas da página; total: linhas depois da busca;
+# page: página exibida (a partir de 1); pages: quantidade de páginas
+TablePage = namedtuple('TablePage', ['rows', 'total', 'page', 'pages'])
+
+
+def sort_table(df_aux, by=None, ascending=True):
+    '''
+    Função que ordena a tabela (ordenação estável, nulos no fim).
+    Input: Dataframe, coluna (None mantém a ordem original), ordem crescente
+    Output: Dataframe ordenado
+    '''
+    if by is None:
+        return df_aux
+    return df_aux.sort_values(by, ascending=ascending, kind='stable', na_position='last')
+
+
+def search_mask(df_aux, search, columns):
+    '''
+    Função que marca as linhas em que alguma das colunas contém o texto buscado
+    (sem diferenciar maiúsculas). Nas colunas categóricas a busca é feita só nas categorias.
+    Input: Dataframe, texto, lista de colunas
+    Output: array booleano
+    '''
+    mascara = np.zeros(len(df_aux), dtype=bool)
+    for col in columns:
+        serie = df_aux[col]
+        if hasattr(serie, 'cat'):
+            achou = serie.cat.categories.astype(str).str.contains(search, case=False, regex=False)
+            codes = serie.cat.codes.to_numpy()
+            mascara |= (codes >= 0) & np.append(achou, False)[codes]
+        else:
+            mascara |= serie.astype(str).str.contains(search, case=False, regex=False).to_numpy()
+    return mascara
+
+
+def page_table(df_aux, page=1, page_size=PAGE_SIZE, search=None, search_columns=()):
+    '''
+    Função que aplica a busca e recorta uma página da tabela (já ordenada).
+    Input: Dataframe, página (a partir de 1; limitada à última), linhas por página,
+           texto buscado (None ou vazio: sem busca), colunas da busca
+    Output: TablePage
+    '''
+    if search:
+        df_aux = df_aux.loc[search_mask(df_aux, search, search_columns), :]
+    total = len(df_aux)
+    pages = max(math.ceil(total / page_size), 1)
+    page = min(max(int(page), 1), pages)
+    inicio = (page - 1) * page_size
+    return TablePage(df_aux.iloc[inicio:inicio + page_size], total, page, pages)
+
+
+def show_table(df_aux, key, filters, search_columns=(), page_size=PAGE_SIZE):
+    '''
+    Função que exibe a tabela paginada com busca e ordenação no servidor: só a página
+    visível vai para o st.dataframe. A ordenação fica em cache por (filtros, tabela,
+    coluna, ordem), no cache de resultados.
+    Input:
+        - df_aux: tabela completa (já agregada para o estado dos filtros)
+        - key: nome da tabela (prefixo das chaves dos widgets e parte da chave do cache)
+        - filters: filtros da página que determinam df_aux
+        - search_columns: colunas da busca por texto (vazio: sem campo de busca)
+        - page_size: linhas por página
+    Output: TablePage exibida
+    '''
+    import streamlit as st
+
+    def primeira_pagina():
+        # nova busca ou ordenação volta para a primeira página
+        st.session_state[f'{key}_pagina'] = 1
+
+    colunas = list(df_aux.columns)
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        busca = st.text_input('Buscar', key=f'{key}_busca', on_change=primeira_pagina) if search_columns else None
+    with col2:
+        by = st.selectbox('Ordenar por', colunas, key=f'{key}_ordem', on_change=primeira_pagina)
+    with col3:
+        decrescente = st.toggle('Decrescente', key=f'{key}_decrescente', on_change=primeira_pagina)
+
+    ordenada = cached_result(sort_table, df_aux, {'table': key, 'filters': filters}, by=by, ascending=not decrescente)
+    pagina = page_table(ordenada, st.session_state.get(f'{key}_pagina', 1), page_size, busca, search_columns)
+    # a busca pode reduzir o número de páginas: a página atual fica limitada à última
+    st.session_state[f'{key}_pagina'] = pagina.page
+
+    traced('dataframe', st.dataframe, pagina.rows, hide_index=True, use_container_width=True)
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        st.number_input('Página', min_value=1, max_value=pagina.pages, step=1, key=f'{key}_pagina')
+    with col2:
+        inicio = (pagina.page - 1) * page_size
+        st.caption(f'Linhas {min(inicio + 1, pagina.total)}–{inicio + len(pagina.rows)} de {pagina.total}')
+    return pagina
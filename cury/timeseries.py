@@ -0,0 +1,155 @@
+'''
+Séries semanais e em janelas móveis diárias de pedidos, entregadores e tempo de entrega.
+
+Os períodos são códigos inteiros, sem formatar datas como texto: o dia é a quantidade de
+dias desde 1970-01-01 e a semana (de domingo a sábado, como no '%U') a quantidade de
+semanas desde o domingo 1969-12-28. Contagens e somas do tempo vêm das células do cubo
+diário e os entregadores distintos dos conjuntos diários de entregadores do cubo. O cubo
+é atualizado incrementalmente na ingestão (merge_cube), então dias novos entram nas
+séries sem reprocessar os pedidos.
+'''
+# Import libraries
+import numpy as np
+import pandas as pd
+
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+# janelas móveis oferecidas na visão tática, em dias
+WINDOWS = [7, 28]
+
+
+def day_codes(datas):
+    '''
+    Função que converte datas em códigos inteiros de dia (dias desde 1970-01-01).
+    Input: datas (array ou Series datetime64)
+    Output: array int64
+    '''
+    return (np.asarray(datas, dtype='datetime64[D]') - EPOCH).astype(np.int64)
+
+
+def week_codes(dias):
+    '''
+    Função que converte códigos de dia em códigos de semana (semanas de domingo a sábado).
+    Input: array de códigos de dia
+    Output: array int64
+    '''
+    # 1970-01-01 foi uma quinta-feira: o domingo anterior é o dia -4
+    return (np.asarray(dias) + 4) // 7
+
+
+def week_of_year(dias):
+    '''
+    Função que calcula a semana do ano de cada dia com a regra do '%U' (a semana 1 começa
+    no primeiro domingo do ano; os dias anteriores ficam na semana 0).
+    Input: array de códigos de dia
+    Output: array int64
+    '''
+    dias = np.asarray(dias, dtype=np.int64)
+    inicio_do_ano = (EPOCH + dias).astype('datetime64[Y]').astype('datetime64[D]')
+    dia_do_ano = dias - (inicio_do_ano - EPOCH).astype(np.int64)
+    dia_da_semana = (dias + 4) % 7  # domingo = 0
+    return (dia_do_ano + 7 - dia_da_semana) // 7
+
+
+def _to_dates(dias):
+    return pd.to_datetime(EPOCH + np.asarray(dias, dtype=np.int64))
+
+
+def _time_stats(df_aux, orders, couriers, n, soma, quadrados):
+    '''
+    Função que acrescenta as colunas de pedidos, entregadores, pedidos por entregador e
+    média e desvio padrão amostral do tempo, a partir das contagens e somas do período.
+    '''
+    with np.errstate(invalid='ignore', divide='ignore'):
+        df_aux['orders'] = orders.astype(int)
+        df_aux['couriers'] = couriers.astype(int)
+        df_aux['orders_per_courier'] = np.where(couriers > 0, orders / couriers, np.nan)
+        media = soma / n
+        variancia = np.clip(quadrados - soma * media, 0, None) / (n - 1)
+        df_aux['avg_time'] = media
+        df_aux['std_time'] = np.where(n > 1, np.sqrt(variancia), np.nan)
+    return df_aux
+
+
+def _period_sums(cube, periodo):
+    '''
+    Função que soma as células do cubo e conta os entregadores distintos por período.
+    Input: DailyCube, função que converte códigos de dia no código do período
+    Output: tupla (códigos dos períodos, pedidos, entregadores, n, soma e soma dos quadrados do tempo)
+    '''
+    cells, couriers = cube
+    codigos = periodo(day_codes(cells['Order_Date']))
+    periodos, posicao = np.unique(codigos, return_inverse=True)
+
+    def somar(col):
+        return np.bincount(posicao, weights=cells[col].to_numpy(dtype=float), minlength=len(periodos))
+
+    pares = pd.DataFrame({
+        'periodo': np.searchsorted(periodos, periodo(day_codes(couriers['Order_Date']))),
+        'courier': couriers['courier'].to_numpy(),
+    }).drop_duplicates()
+    distintos = np.bincount(pares['periodo'].to_numpy(), minlength=len(periodos))
+    return periodos, somar('orders'), distintos, somar('time_n'), somar('time_sum'), somar('time_sq')
+
+
+def weekly_series(cube):
+    '''
+    Função que calcula a série semanal (semanas de domingo a sábado) de pedidos,
+    entregadores distintos, pedidos por entregador e tempo de entrega.
+    Input: DailyCube (já filtrado)
+    Output: Dataframe com week (domingo que inicia a semana), week_of_year e as colunas da série
+    '''
+    semanas, *valores = _period_sums(cube, week_codes)
+    inicio = semanas * 7 - 4
+    df_aux = pd.DataFrame({'week': _to_dates(inicio), 'week_of_year': week_of_year(inicio)})
+    return _time_stats(df_aux, *valores)
+
+
+def _rolling_distinct(dias, couriers, primeiro, total, window):
+    '''
+    Função que conta, para cada dia, os entregadores com algum pedido nos window dias
+    terminados nele. Cada par (entregador, dia) cobre os dias [dia, dia + window - 1];
+    a cobertura de um entregador começa depois do fim da cobertura do seu pedido anterior,
+    então cada entregador é contado uma única vez por dia.
+    '''
+    pares = pd.DataFrame({'courier': couriers, 'dia': dias}).drop_duplicates()
+    pares = pares.sort_values(['courier', 'dia'], kind='stable')
+    dia = pares['dia'].to_numpy()
+    courier = pares['courier'].to_numpy()
+    mesmo = np.zeros(len(dia), dtype=bool)
+    mesmo[1:] = courier[1:] == courier[:-1]
+    anterior = np.roll(dia, 1)
+    inicio = np.where(mesmo, np.maximum(dia, anterior + window), dia) - primeiro
+    fim = dia + window - primeiro
+    validos = inicio < fim
+    variacao = (np.bincount(inicio[validos], minlength=total + window + 1)
+                - np.bincount(fim[validos], minlength=total + window + 1))
+    return np.cumsum(variacao)[:total]
+
+
+def rolling_series(cube, window=7):
+    '''
+    Função que calcula, para cada dia do recorte, os pedidos, os entregadores distintos,
+    os pedidos por entregador e o tempo de entrega dos window dias terminados nele
+    (dias sem pedidos contam como zero).
+    Input: DailyCube (já filtrado), tamanho da janela em dias
+    Output: Dataframe com Order_Date e as colunas da série
+    '''
+    cells, couriers = cube
+    colunas = ['Order_Date', 'orders', 'couriers', 'orders_per_courier', 'avg_time', 'std_time']
+    if len(cells) == 0:
+        return pd.DataFrame(columns=colunas)
+    dias = day_codes(cells['Order_Date'])
+    primeiro = int(dias.min())
+    total = int(dias.max()) - primeiro + 1
+
+    def movel(col):
+        acumulado = np.concatenate([[0.0], np.cumsum(np.bincount(
+            dias - primeiro, weights=cells[col].to_numpy(dtype=float), minlength=total))])
+        return acumulado[1:] - acumulado[np.maximum(np.arange(1, total + 1) - window, 0)]
+
+    distintos = _rolling_distinct(day_codes(couriers['Order_Date']), couriers['courier'].to_numpy(),
+                                  primeiro, total, window)
+    df_aux = pd.DataFrame({'Order_Date': _to_dates(np.arange(primeiro, primeiro + total))})
+    df_aux = _time_stats(df_aux, movel('orders'), distintos, movel('time_n'), movel('time_sum'), movel('time_sq'))
+    return df_aux.loc[:, colunas]
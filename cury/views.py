@@ -0,0 +1,213 @@
+'''
+Funções que montam os gráficos das páginas a partir das estruturas já agregadas (cubo
+diário, grade geográfica, resumo do tempo de entrega), uma seção por página.
+
+As páginas, o pré-cálculo (cury.warmup) e o benchmark (cury.bench) importam as funções
+daqui. A chave do figcache inclui o módulo e o nome da função, então os gráficos
+pré-calculados são os mesmos que as páginas procuram.
+
+As bibliotecas pesadas (plotly, folium, numpy) são importadas dentro das funções: só
+carregam quando o gráfico não está no cache do processo.
+'''
+# Import libraries
+from cury.geobins import cell_totals
+from cury.rollup import cube_count
+from cury.summary import mean_distance
+from cury.timeseries import WINDOWS, rolling_series, weekly_series
+
+# marcador de cada célula de restaurantes no FastMarkerCluster (row = [lat, lon, pedidos])
+RESTAURANT_MARKER = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindPopup('Pedidos: ' + row[2]);
+    return marker;
+}
+"""
+
+
+# =========================================
+# Visão empresa
+# =========================================
+def order_metric(cube):
+    '''
+    Função para contagem de pedidos por "Order_Date" (a partir do cubo diário) e plotagem em gráfico de barras
+    Input: DailyCube
+    Output: Fig
+    '''
+    import plotly.express as px
+
+    df_aux = cube_count(cube, ['Order_Date'])
+    fig = px.bar(df_aux, x='Order_Date', y='ID')
+    return fig
+
+
+def Traffic_Order_Share(cube):
+    '''
+    Função calcula a porcentagem de pedidos por densidade de tráfego e retorna um gráfico de pizza representando essa distribuição.
+    Input: DailyCube
+    Output: Fig
+    '''
+    import plotly.express as px
+
+    df_aux3 = cube_count(cube, ['Road_traffic_density'])
+    df_aux3['entrega_perc'] = df_aux3['ID'] / df_aux3['ID'].sum()
+    fig = px.pie(df_aux3, values='entrega_perc', names='Road_traffic_density')
+    return fig
+
+
+def Traffic_Order_City(cube):
+    '''
+    A função cria um gráfico de dispersão que mostra a quantidade de pedidos por cidade e densidade de tráfego, representando o volume de pedidos pelo tamanho dos pontos.
+    Input: DailyCube
+    Output: Fig
+    '''
+    import plotly.express as px
+
+    df_aux4 = cube_count(cube, ['City', 'Road_traffic_density'])
+    fig = px.scatter(df_aux4, x='City', y='Road_traffic_density', size='ID', color='City')
+    return fig
+
+
+def Order_by_Week(cube):
+    '''
+    A fução cria um gráfico de linha que mostra a quantidade de pedidos por semana ao longo do tempo.
+    O eixo x é a data de início da semana: semanas de mesmo número em anos diferentes não se misturam.
+    Input: DailyCube
+    Output: Fig
+    '''
+    import plotly.express as px
+
+    df_aux2 = weekly_series(cube)
+    fig = px.line(df_aux2, x='week', y='orders', hover_data=['week_of_year'])
+    return fig
+
+
+def Order_Share_by_Week(cube):
+    '''
+    A função cria um gráfico de linha que mostra a média semanal de pedidos por entregador ao longo do tempo,
+    com a data de início da semana no eixo x.
+    Input: DailyCube
+    Output: Fig
+    '''
+    import plotly.express as px
+
+    df_aux5 = weekly_series(cube)
+    fig = px.line(df_aux5, x='week', y='orders_per_courier', hover_data=['week_of_year'])
+    return fig
+
+
+def Rolling_Orders(cube, window=WINDOWS[0]):
+    '''
+    A função cria um gráfico de linha com os pedidos por entregador e o tempo médio de entrega
+    em janela móvel (os window dias terminados em cada data).
+    Input: DailyCube, tamanho da janela em dias
+    Output: Fig
+    '''
+    import plotly.express as px
+
+    df_aux7 = rolling_series(cube, window)
+    fig = px.line(df_aux7, x='Order_Date', y=['orders_per_courier', 'avg_time'])
+    return fig
+
+
+def Country_Maps(data):
+    '''
+    A função cria um mapa interativo com as camadas: mapa de calor das entregas e restaurantes agrupados
+    (a partir da grade pré-agregada) e marcadores com a mediana das localizações de entrega por cidade e densidade de tráfego.
+    Input: tupla (medianas por cidade e tráfego, GeoBins filtrada)
+    Output: html do mapa
+    '''
+    import folium
+    from folium.plugins import FastMarkerCluster, HeatMap
+
+    # mediana dos pontos geográficos por cidade e densidade de tráfego
+    df_aux7, geo = data
+
+    # Criando o mapa
+    map = folium.Map()
+
+    # Mapa de calor das entregas (uma entrada por célula da grade, com peso pela quantidade de pedidos)
+    entregas = cell_totals(geo, 'delivery')
+    if len(entregas) > 0:
+        pesos = entregas['orders'] / entregas['orders'].max()
+        HeatMap(list(zip(entregas['lat'], entregas['lon'], pesos)), name='Entregas (mapa de calor)').add_to(map)
+
+    # Restaurantes agrupados no navegador (uma entrada por célula da grade)
+    restaurantes = cell_totals(geo, 'restaurant')
+    FastMarkerCluster(
+        restaurantes.to_numpy().tolist(),
+        callback=RESTAURANT_MARKER,
+        name='Restaurantes (agrupados)'
+    ).add_to(map)
+
+    # Adicionando marcadores ao mapa
+    medianas = folium.FeatureGroup(name='Mediana por cidade e tráfego')
+    for _, location_info in df_aux7.iterrows():
+        folium.Marker(
+            [location_info['Delivery_location_latitude'], location_info['Delivery_location_longitude']],
+            popup=f"City: {location_info['City']}, Traffic: {location_info['Road_traffic_density']}"
+        ).add_to(medianas)
+    medianas.add_to(map)
+    folium.LayerControl().add_to(map)
+
+    # Renderizando o mapa (o html fica em cache por estado dos filtros)
+    return folium.Figure().add_child(map).render()
+
+
+# =========================================
+# Visão restaurantes
+# =========================================
+def distance(summary, fig):
+    '''
+    Função que usa as distâncias médias por cidade do resumo da página (a coluna "distance"
+    é calculada uma única vez na ingestão dos dados) para retornar a distância média ou o
+    gráfico de pizza da distância média por cidade.
+    Input: TimeSummary, fig (False: distância média; True: gráfico por cidade)
+    Output: float ou Fig
+    '''
+    if fig == False:
+        avg_distance = mean_distance(summary)
+        return avg_distance
+
+    else:
+        import plotly.graph_objects as go
+
+        avg_distance = summary.distance
+        # destaca a segunda fatia, qualquer que seja a quantidade de cidades nos dados
+        pull = [0.1 if i == 1 else 0 for i in range(len(avg_distance))]
+        fig = go.Figure(data=[go.Pie(labels=avg_distance['City'], values=avg_distance['distance'], pull=pull)])
+        return fig
+
+
+def avg_std_time_graph(summary):
+    '''
+    Função que cria um gráfico de barras com o tempo médio de entrega por cidade e o desvio padrão como barra de erro.
+    Input: TimeSummary
+    Output: Fig
+    '''
+    import plotly.graph_objects as go
+
+    df_aux7 = summary.city
+    fig = go.Figure()
+    fig.add_trace(go.Bar(name='Control',
+                        x=df_aux7['City'],
+                        y=df_aux7['avg_time'],
+                        error_y=dict(type='data', array=df_aux7['std_time'])))
+    fig.update_layout(barmode='group')
+    return fig
+
+
+def avg_std_time_on_traffic(summary):
+    '''
+    Função que cria um gráfico sunburst com o tempo médio de entrega por cidade e densidade de tráfego, colorido pelo desvio padrão.
+    Input: TimeSummary
+    Output: Fig
+    '''
+    import numpy as np
+    import plotly.express as px
+
+    df_aux9 = summary.city_traffic
+    fig = px.sunburst(df_aux9, path=['City', 'Road_traffic_density'], values='avg_time',
+                  color='std_time', color_continuous_scale='RdBu',
+                  color_continuous_midpoint=np.average(df_aux9['std_time']))
+    return fig
@@ -0,0 +1,232 @@
+'''
+Pré-cálculo em segundo plano dos agregados e gráficos dos filtros padrão das páginas.
+
+Na primeira execução de qualquer página o processo inicia uma thread que acompanha a
+versão dos dados (loader.data_key). A cada versão nova ela prepara os dados do backend
+em uso (cury.backend: o data frame em memória ou o Parquet do DuckDB) e, num pool
+de threads, monta as estruturas derivadas e os gráficos de cada página com os filtros
+padrão da barra lateral (DEFAULT_FILTERS). Cada resultado vai para os caches do processo
+(loader e os caches de gráficos e de resultados do figcache) assim que fica pronto, então as sessões já o encontram pronto.
+
+O módulo só importa a biblioteca padrão no topo: pandas, as estruturas derivadas e as
+funções dos gráficos (cury.views, as mesmas que as páginas usam) são carregados pela
+própria thread, então a Home (e a primeira execução de cada página) não espera por eles.
+
+Fica ligado por padrão; CURY_WARMUP=0 desliga.
+'''
+# Import libraries
+import datetime
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# mesmo valor de cury.loader.DATA_PATH (sem importar o loader, que carrega o pandas)
+DATA_PATH = 'train.csv'
+
+# threads do pool de pré-cálculo
+WARMUP_WORKERS = 2
+
+# intervalo entre as verificações de versão dos dados, em segundos
+CHECK_INTERVAL = 10
+
+DEFAULT_DATE = datetime.datetime(2022, 4, 13)
+TRAFFIC_OPTIONS = ['Low', 'Medium', 'High', 'Jam']
+WEATHER_OPTIONS = ['conditions Cloudy', 'conditions Fog', 'conditions Sandstorms', 'conditions Stormy',
+                   'conditions Sunny', 'conditions Windy']
+
+# página -> valores padrão dos filtros da barra lateral (a mesma chave usada em cached_figure e cached_result)
+DEFAULT_FILTERS = {
+    'visao_empresa': {'date': DEFAULT_DATE, 'traffic': TRAFFIC_OPTIONS},
+    'visao_entregadores': {'date': DEFAULT_DATE, 'traffic': ['Low'], 'clima': ['conditions Cloudy']},
+    'visao_restaurante': {'date': DEFAULT_DATE, 'traffic': TRAFFIC_OPTIONS},
+}
+
+# version: versão dos dados em pré-cálculo (ou a última concluída); total/done/failed: tarefas;
+# running: se há pré-cálculo em andamento; seconds: duração do último pré-cálculo concluído
+WarmupStatus = namedtuple('WarmupStatus', ['version', 'total', 'done', 'failed', 'running', 'seconds'])
+
+logger = logging.getLogger('cury.warmup')
+
+_enabled = True
+_thread = None
+_status = WarmupStatus(None, 0, 0, 0, False, 0.0)
+_lock = threading.Lock()
+
+
+def configure(enabled=None):
+    '''
+    Função que liga ou desliga o pré-cálculo (vale para as próximas chamadas de start_warmup).
+    Input: bool; None lê a variável CURY_WARMUP
+    '''
+    global _enabled
+    if enabled is None:
+        enabled = os.environ.get('CURY_WARMUP', '1').strip().lower() not in ('0', 'off', 'false', '')
+    _enabled = bool(enabled)
+
+
+def _figures_empresa(path):
+    from cury import views
+    from cury.backend import load_cube
+    from cury.figcache import cached_figure
+    from cury.rollup import filter_cube
+    from cury.timeseries import WINDOWS
+
+    filtros = DEFAULT_FILTERS['visao_empresa']
+    cube = filter_cube(load_cube(path), filtros['date'], filtros['traffic'])
+    for builder in [views.order_metric, views.Traffic_Order_Share, views.Traffic_Order_City, views.Order_by_Week,
+                    views.Order_Share_by_Week]:
+        cached_figure(builder, cube, filtros, path)
+    # janela padrão do st.radio da página (a primeira opção)
+    cached_figure(views.Rolling_Orders, cube, filtros, path, window=WINDOWS[0])
+
+
+def _map_empresa(path):
+    from cury.backend import Filters, city_centers, load_geo_bins
+    from cury.figcache import cached_figure, cached_result
+    from cury.geobins import filter_geo_bins
+    from cury.views import Country_Maps
+
+    filtros = DEFAULT_FILTERS['visao_empresa']
+    centros = cached_result(city_centers, Filters(filtros['date'], filtros['traffic'], path=path), filtros, path)
+    geo = filter_geo_bins(load_geo_bins(path), filtros['date'], filtros['traffic'])
+    cached_figure(Country_Maps, (centros, geo), filtros, path)
+
+
+def _tables_entregadores(path):
+    from cury.backend import Filters, courier_overview, rank_couriers, rating_by_courier, rating_stats
+    from cury.figcache import cached_result
+    from cury.tables import sort_table
+
+    filtros = DEFAULT_FILTERS['visao_entregadores']
+    selecao = Filters(filtros['date'], filtros['traffic'], filtros['clima'], path=path)
+    cached_result(courier_overview, selecao, filtros, path)
+    cached_result(rating_stats, selecao, filtros, path, column='Road_traffic_density', label='Traffic')
+    cached_result(rating_stats, selecao, filtros, path, column='Weatherconditions')
+    # estatística padrão do st.radio da página (a primeira opção, média)
+    cached_result(rank_couriers, selecao, filtros, path, k=10, stat='mean')
+    # avaliações por entregador e a ordenação padrão da tabela paginada (primeira coluna, crescente)
+    media = cached_result(rating_by_courier, selecao, filtros, path)
+    cached_result(sort_table, media, {'table': 'avaliacao_entregador', 'filters': filtros}, path,
+                  by=media.columns[0], ascending=True)
+
+
+def _figures_restaurante(path):
+    from cury.backend import Filters, restaurant_center, time_summary
+    from cury.figcache import cached_figure, cached_result
+    from cury.views import avg_std_time_graph, avg_std_time_on_traffic, distance
+
+    filtros = DEFAULT_FILTERS['visao_restaurante']
+    selecao = Filters(filtros['date'], filtros['traffic'], path=path)
+    summary = cached_result(time_summary, selecao, filtros, path)
+    # ponto inicial das consultas por raio
+    cached_result(restaurant_center, selecao, filtros, path)
+    cached_figure(avg_std_time_graph, summary, filtros, path)
+    cached_figure(distance, summary, filtros, path, fig=True)
+    cached_figure(avg_std_time_on_traffic, summary, filtros, path)
+
+
+def _tasks(path):
+    '''
+    Função que monta as tarefas de pré-cálculo: primeiro as estruturas derivadas, depois
+    os gráficos de cada página (que esperam pelas estruturas de que dependem).
+    Output: lista de tuplas (nome, função sem argumentos)
+    '''
+    from cury.backend import derived_loaders
+
+    tarefas = [(load.__name__, lambda load=load: load(path)) for load in derived_loaders()]
+    tarefas += [
+        ('visao_empresa:figures', lambda: _figures_empresa(path)),
+        ('visao_empresa:map', lambda: _map_empresa(path)),
+        ('visao_entregadores:tables', lambda: _tables_entregadores(path)),
+        ('visao_restaurante:figures', lambda: _figures_restaurante(path)),
+    ]
+    return tarefas
+
+
+def warm_defaults(path=DATA_PATH, workers=WARMUP_WORKERS):
+    '''
+    Função que prepara os dados do backend em uso e pré-calcula as estruturas derivadas e
+    os gráficos dos filtros padrão, atualizando o progresso a cada tarefa concluída.
+    Input: caminho do arquivo csv, quantidade de threads
+    Output: WarmupStatus ao final
+    '''
+    from cury.backend import prepare
+    from cury.loader import data_key
+
+    global _status
+    version = data_key(path)
+    inicio = time.perf_counter()
+    with _lock:
+        _status = WarmupStatus(version, 0, 0, 0, True, 0.0)
+    prepare(path)
+    tarefas = _tasks(path)
+    with _lock:
+        _status = _status._replace(total=len(tarefas))
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cury-warmup') as pool:
+        futuros = {pool.submit(func): nome for nome, func in tarefas}
+        for futuro in as_completed(futuros):
+            erro = futuro.exception()
+            with _lock:
+                if erro is None:
+                    _status = _status._replace(done=_status.done + 1)
+                else:
+                    _status = _status._replace(failed=_status.failed + 1)
+                atual = _status
+            if erro is not None:
+                logger.error('pré-cálculo %s falhou', futuros[futuro], exc_info=erro)
+            else:
+                logger.info('pré-cálculo %s pronto (%d/%d)', futuros[futuro], atual.done + atual.failed, atual.total)
+
+    with _lock:
+        _status = _status._replace(running=False, seconds=time.perf_counter() - inicio)
+        return _status
+
+
+def _watch(path):
+    '''
+    Função executada pela thread de acompanhamento: pré-calcula a cada nova versão dos dados.
+    '''
+    from cury.loader import data_key
+
+    ultima = None
+    while True:
+        try:
+            version = data_key(path)
+            if version != ultima:
+                warm_defaults(path)
+                ultima = version
+        except Exception:
+            # arquivo ausente ou em troca: tenta de novo na próxima verificação
+            logger.exception('pré-cálculo interrompido')
+        time.sleep(CHECK_INTERVAL)
+
+
+def start_warmup(path=DATA_PATH):
+    '''
+    Função que inicia (uma única vez por processo) a thread de pré-cálculo.
+    Input: caminho do arquivo csv
+    '''
+    global _thread
+    if not _enabled:
+        return
+    with _lock:
+        if _thread is not None:
+            return
+        _thread = threading.Thread(target=_watch, args=(path,), name='cury-warmup-watch', daemon=True)
+        _thread.start()
+
+
+def warmup_status():
+    '''
+    Função que retorna o progresso do pré-cálculo.
+    Output: WarmupStatus
+    '''
+    with _lock:
+        return _status
+
+
+configure()
@@ -1,149 +1,30 @@
 # Import libraries
-import pandas as pd
-import plotly.express as px
-from haversine import haversine
+# os gráficos são montados pelas funções de cury.views; as bibliotecas pesadas (plotly,
+# numpy) só carregam quando o gráfico não está no cache do processo
 import streamlit as st
 import datetime
-from PIL import Image
-import folium
-from streamlit_folium import folium_static
-import plotly.graph_objects as go
-import numpy as np
+from cury.backend import (Filters, load_geo_index, load_sketches, nearest_restaurants, radius_stats,
+                          restaurant_center, time_summary)
+from cury.figcache import cached_figure, cached_result
+from cury.instrument import finish_run, start_run, traced
+from cury.sketch import distinct_couriers, filter_sketches, time_quantiles
+from cury.summary import festival_time
+from cury.views import avg_std_time_graph, avg_std_time_on_traffic, distance
+from cury.warmup import DEFAULT_FILTERS, TRAFFIC_OPTIONS, start_warmup
 
 st.set_page_config(page_title='Visão Restaurante', layout='wide')
 
-#-----------------------
-# Funções
-#-----------------------
-def clean_code(df1):
-    '''Esta função tem a responsabilidade de limpar o data frame
-        Tipos de limpeza:
-        1. Remoção dos dados NaN
-        2. Mudança do tipo da coluna de dados
-        3. Remoção dos espaços das variáveis de texto
-        4. Formatação da coluna de datas
-        5. Limpeza da coluna de tempo (remoção do texto da variável numérica)
-
-        Input: Dataframe
-        Output: Dataframe
-    '''
-    # 1. convertendo a coluna Age de texto para número
-    linhas_selecionadas = (df1['Delivery_person_Age'] != 'NaN ')
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-
-    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype(int)
-
-    # 2 convertendo a coluna Ratings de texto para numero decimal (float)
-    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(float)
-
-    # 3 convertendo a coluna order_date de texto para data
-    df1['Order_Date'] = pd.to_datetime(df1['Order_Date'], format='%d-%m-%Y')
-
-    # 4 convertendo multiple_deliveries de texto para numero inteiro (int)
-    linhas_selecionadas2 = (df1['multiple_deliveries'] != 'NaN ')
-    df1 = df1.loc[linhas_selecionadas2, :].copy()
-    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype(int)
-
-    # 5Removendo os espaços dentro de strings/texto/object
-    df1.loc[:, "ID"] = df1.loc[:, "ID"].str.strip()
-    df1.loc[:, "Road_traffic_density"] = df1.loc[:, "Road_traffic_density"].str.strip()
-    df1.loc[:, "Type_of_order"] = df1.loc[:, "Type_of_order"].str.strip()
-    df1.loc[:, "Type_of_vehicle"] = df1.loc[:, "Type_of_vehicle"].str.strip()
-    df1.loc[:, "City"] = df1.loc[:, "City"].str.strip()
-    df1.loc[:, "Festival"] = df1.loc[:, "Festival"].str.strip()
-
-    # 6 Removendo os NaN
-    df1 = df1.loc[df1['Road_traffic_density'] != 'NaN', :]
-    df1 = df1.loc[df1['City'] != 'NaN', :]
-    df1 = df1.loc[df1['Time_taken(min)'] != 'NaN', :]
-    df1 = df1.loc[df1['Festival'] != 'NaN ', :]
-
-    # 7 Removendo o (min) do Time_Taken
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply(lambda x: x.split( '(min)')[1])
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
-
-    return df1
-
-def distance(df1, fig):
-    if fig == False:
-        cols = ['Delivery_location_latitude', 'Delivery_location_longitude', 'Restaurant_latitude', 'Restaurant_longitude']
-        df1['distance'] = df1.loc[:, cols].apply(
-                lambda x: haversine(
-                (x['Delivery_location_latitude'], x['Delivery_location_longitude']),
-                (x['Restaurant_latitude'], x['Restaurant_longitude'])
-                ),
-                axis=1
-                )
-        avg_distance = np.round(df1['distance'].mean(), 2)
-        return avg_distance
-    
-    else:
-        cols = ['Delivery_location_latitude', 'Delivery_location_longitude', 'Restaurant_latitude', 'Restaurant_longitude']
-        df1['distance'] = df1.loc[:, cols].apply(
-            lambda x: haversine(
-                (x['Delivery_location_latitude'], x['Delivery_location_longitude']),
-                (x['Restaurant_latitude'], x['Restaurant_longitude'])
-                ),
-                axis=1
-                )
-        avg_distance = df1.loc[:, ['City', 'distance']].groupby('City').mean().reset_index()
-        fig = go.Figure(data=[go.Pie(labels=avg_distance['City'], values=avg_distance['distance'], pull=[0, 0.1, 0])])
-        return fig
-    
-def avg_std_time_delivery(df1, festival, op):
-
-    """
-    Esta função calcula o tempo médio e desvio padrão de tempo de entrega.
-    Input:
-        - df: Dataframe com os dados necessários para o cálculo
-        - op: Tipo de operação que precisa ser calculado
-            'avg_time': calcula o tempo médio
-            'std_time': calcula o desvio padrão do tempo
-    Output:
-        - df: Dataframe com 2 colunas e 1 linha
-    """
-    cols = ['Time_taken(min)', 'Festival']
-    df_aux10 = df1.loc[:, cols].groupby('Festival').agg({'Time_taken(min)': ['mean', 'std']})
-    df_aux10.columns = [ 'avg_time', 'std_time']
-    df_aux10 = df_aux10.reset_index() 
-    df_aux10 = np.round(df_aux10.loc[df_aux10['Festival'] == festival, op], 2)
-    return df_aux10    
-
-def avg_std_time_graph(df1):       
-    cols = ['City', 'Time_taken(min)']
-    df_aux7 = df1.loc[:,cols].groupby('City').agg({'Time_taken(min)':['mean', 'std']})
-    df_aux7.columns = ['avg_time', 'std_time']
-    df_aux7 = df_aux7.reset_index()
-    fig = go.Figure()
-    fig.add_trace(go.Bar(name='Control',
-                        x=df_aux7['City'],
-                        y=df_aux7['avg_time'],
-                        error_y=dict(type='data', array=df_aux7['std_time'])))
-    fig.update_layout(barmode='group')
-    return fig
-
-def avg_std_time_on_traffic(df1):
-    cols = ['City', 'Time_taken(min)', 'Road_traffic_density']
-    df_aux9 = df1.loc[:,cols].groupby(['City', 'Road_traffic_density']).agg({"Time_taken(min)": ['mean', 'std']})
-    df_aux9.columns = ['avg_time', 'std_time']
-    df_aux9 = df_aux9.reset_index()
-    fig = px.sunburst(df_aux9, path=['City', 'Road_traffic_density'], values='avg_time',
-                  color='std_time', color_continuous_scale='RdBu',
-                  color_continuous_midpoint=np.average(df_aux9['std_time']))
-    return fig 
 #--------------------- Inicio da Estrutura Lógica do Código-----------------------------
-# Import datasets
-df1 = pd.read_csv("train.csv")
-
-# limpeza
-df1 = clean_code(df1)
-
-# backup
-df1 = df1.copy()
+# Import datasets (lidos e limpos uma única vez por processo)
+start_run('visao_restaurante')
+# pré-cálculo dos filtros padrão em segundo plano (uma thread por processo)
+start_warmup()
 
 # =========================================
 # Barra Lateral
 # =========================================
+# valores padrão dos filtros (os mesmos pré-calculados pelo cury.warmup)
+padrao = DEFAULT_FILTERS['visao_restaurante']
 st.header("Marketplace - Visão Restaurantes")
 
 st.sidebar.markdown('# Cury Company')
@@ -153,7 +34,7 @@ st.sidebar.markdown('''---''')
 st.sidebar.markdown('## Selecione uma data limite')
 date_slider = st.sidebar.slider(
     'Até qual valor?',
-    value=datetime.datetime( 2022, 4, 13),
+    value=padrao['date'],
     min_value=datetime.datetime(2022, 2, 11),
     max_value=datetime.datetime(2022, 4, 6),
     format='DD-MM-YYYY'
@@ -163,25 +44,30 @@ st.sidebar.markdown('''---''')
 
 traffic_options = st.sidebar.multiselect(
     'Quais as condições do trânsito?',
-    ['Low', 'Medium', 'High', 'Jam'],
-    default=['Low', 'Medium', 'High', 'Jam']
+    TRAFFIC_OPTIONS,
+    default=padrao['traffic']
 )
 
 st.sidebar.markdown('''---''')
 st.sidebar.markdown( '### Powered by Lucy Souza')
 
-# filtro de data
-linhas_selecionadas = df1['Order_Date'] < date_slider
-df1 = df1.loc[linhas_selecionadas,:]
+# filtros da página (também são a chave dos gráficos em cache)
+filtros = {'date': date_slider, 'traffic': traffic_options}
+
+# recorte de data e de transito (consultado pelo backend: pandas ou duckdb)
+selecao = Filters(date_slider, traffic_options)
 
-# filtro de transito
-linhas_selecionadas = df1['Road_traffic_density'].isin(traffic_options)
-df1 = df1.loc[linhas_selecionadas,:]
+# médias, desvios e contagens do tempo de entrega de todos os widgets, numa única passada
+# (em cache por estado dos filtros, no cache de resultados)
+summary = cached_result(time_summary, selecao, filtros)
+
+# sketches diários (entregadores distintos e percentis do tempo) mesclados no recorte dos filtros
+sketches = traced('filter_sketches', filter_sketches, load_sketches(), date_slider, traffic_options)
 
 # =========================================
 # Layout no Stremlite
 # =========================================
-tab1, tab2, tab3 = st.tabs(['Visão Gerencial', '_', '_'])
+tab1, tab2, tab3 = st.tabs(['Visão Gerencial', 'Consultas por raio', '_'])
 
 with tab1:
     with st.container():
@@ -189,44 +75,58 @@ with tab1:
 
         col1, col2, col3, col4, col5, col6 = st.columns(6)
         with col1:
-            delivery_unique = df1.loc[:, 'Delivery_person_ID'].nunique()
+            delivery_unique = traced('distinct_couriers', distinct_couriers, sketches)
             col1.metric('Entregadores', delivery_unique)
 
         with col2:
-            avg_distance = distance(df1, fig=False)
+            avg_distance = distance(summary, fig=False)
             col2.metric('A distância média', avg_distance)
 
         with col3:
-            df_aux10 = avg_std_time_delivery(df1, 'Yes', 'avg_time')
+            df_aux10 = festival_time(summary, 'Yes', 'avg_time')
             col3.metric('Tempo médio', df_aux10)
 
         with col4:
-            df_aux10 = avg_std_time_delivery(df1, 'Yes', 'std_time')
+            df_aux10 = festival_time(summary, 'Yes', 'std_time')
             col4.metric('STD entrega', df_aux10)
 
         with col5:
-            df_aux10 = avg_std_time_delivery(df1, 'No', 'avg_time')
+            df_aux10 = festival_time(summary, 'No', 'avg_time')
             col5.metric('Tempo médio', df_aux10)
 
         with col6:
-            df_aux10 = avg_std_time_delivery(df1, 'No', 'std_time')
+            df_aux10 = festival_time(summary, 'No', 'std_time')
             col6.metric('STD entrega', df_aux10)
 
+    with st.container():
+        st.markdown('''---''')
+        st.title('Percentis do tempo de entrega')
+        # percentis aproximados (erro relativo de até 1%) a partir dos sketches diários: do recorte
+        # inteiro e por cidade (percentis não se somam, então são duas passadas nos histogramas)
+        percentis = traced('time_quantiles', time_quantiles, sketches)
+        df_aux12 = traced('time_quantiles(City)', time_quantiles, sketches, ['City'])
+
+        col1, col2, col3, col4 = st.columns(4)
+        for col, nome in zip([col1, col2, col3], ['p50', 'p90', 'p99']):
+            with col:
+                valor = percentis[nome].iloc[0] if len(percentis) > 0 else None
+                col.metric(f'Tempo {nome}', None if valor is None else round(float(valor), 2))
+
+        with col4:
+            st.dataframe(df_aux12.round(2), use_container_width=True, hide_index=True)
+
     with st.container():
         st.markdown('''---''')
         col1, col2 = st.columns(2)
 
         with col1:
             st.title('Tempo Médio de entrega por cidade')
-            fig = avg_std_time_graph(df1)
-            st.plotly_chart(fig, use_container_width=True)
+            fig = cached_figure(avg_std_time_graph, summary, filtros)
+            traced('plotly_chart', st.plotly_chart, fig, use_container_width=True)
 
         with col2:
             st.title('Distribuição da Distancia')
-            cols = ['City', "Time_taken(min)", 'Type_of_order']
-            df_aux8 = df1.loc[:,cols].groupby(['City', 'Type_of_order']).agg({"Time_taken(min)": ['mean', 'std']})
-            df_aux8.columns = ['avg_time', 'std_time']
-            df_aux8 = df_aux8.reset_index()
+            df_aux8 = summary.city_order.loc[:, ['City', 'Type_of_order', 'avg_time', 'std_time']]
             st.dataframe(df_aux8, use_container_width=True)
         
     with st.container():
@@ -235,11 +135,53 @@ with tab1:
 
         col1, col2 = st.columns(2)
         with col1:
-            fig = distance(df1, fig=True)
-            st.plotly_chart(fig, use_container_width=True)
+            fig = cached_figure(distance, summary, filtros, fig=True)
+            traced('plotly_chart', st.plotly_chart, fig, use_container_width=True)
+
+
+        with col2:
+            fig = cached_figure(avg_std_time_on_traffic, summary, filtros)
+            traced('plotly_chart', st.plotly_chart, fig, use_container_width=True)
+
+with tab2:
+    with st.container():
+        st.title('Pedidos e entregadores próximos de um ponto')
+        # índice espacial dos restaurantes (e dos locais de entrega, no backend pandas),
+        # montado uma vez por versão do arquivo
+        traced('load_geo_index', load_geo_index)
+
+        # ponto inicial: mediana da localização dos restaurantes do recorte
+        ponto = cached_result(restaurant_center, selecao, filtros)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            lat = st.number_input('Latitude', min_value=-90.0, max_value=90.0, format='%.6f',
+                                  value=ponto[0] if ponto is not None else 0.0)
+        with col2:
+            lon = st.number_input('Longitude', min_value=-180.0, max_value=180.0, format='%.6f',
+                                  value=ponto[1] if ponto is not None else 0.0)
+        with col3:
+            raio = st.slider('Raio (km)', min_value=1, max_value=20, value=5)
+
+        # pedidos entregues no raio (com os filtros da barra lateral), entregadores ativos na
+        # última semana antes da data limite e restaurantes no raio (sem cache: as coordenadas
+        # são livres e a consulta usa o índice espacial)
+        no_raio = traced('radius_stats', radius_stats, selecao, lat, lon, raio)
 
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            col1.metric('Pedidos entregues no raio', no_raio.orders)
 
         with col2:
-            fig = avg_std_time_on_traffic(df1)
-            st.plotly_chart(fig, use_container_width=True)
+            col2.metric('Entregadores ativos no raio (7 dias)', no_raio.active_couriers)
+
+        with col3:
+            col3.metric('Restaurantes no raio', no_raio.restaurants)
+
+    with st.container():
+        st.markdown('''---''')
+        st.markdown('##### Restaurantes mais próximos')
+        df_aux11 = traced('nearest_restaurants', nearest_restaurants, lat, lon, k=10)
+        st.dataframe(df_aux11, use_container_width=True)
 
+# tempos desta execução (log, arquivo de métricas e painel de debug, quando ligados)
+finish_run()
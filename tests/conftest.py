@@ -0,0 +1,31 @@
+'''
+Fixtures dos testes: csv sintéticos no formato bruto do train.csv (gerados por cury.bench)
+e caches do processo limpos entre os testes.
+'''
+# Import libraries
+import pytest
+
+from cury import figcache, loader
+from cury.bench import synthetic_orders
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    loader.clear_cache()
+    figcache.clear_figures()
+    yield
+    loader.clear_cache()
+    figcache.clear_figures()
+
+
+@pytest.fixture
+def orders_csv(tmp_path):
+    '''
+    Fixture que grava csv sintéticos no diretório temporário do teste.
+    Output: função (n, seed, start, name) -> caminho do csv
+    '''
+    def gravar(n, seed=0, start=0, name='train.csv'):
+        path = tmp_path / name
+        synthetic_orders(n, seed=seed, start=start).to_csv(path, index=False)
+        return str(path)
+    return gravar
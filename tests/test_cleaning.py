@@ -0,0 +1,88 @@
+'''
+Limpeza vetorizada: clean_code precisa manter as mesmas linhas e os mesmos valores da
+versão original, que tratava as colunas uma a uma (com apply linha a linha no tempo), e
+remover as linhas com valores inválidos com o motivo, sem interromper a limpeza do lote.
+'''
+# Import libraries
+import pandas as pd
+import pytest
+
+from cury.bench import synthetic_orders
+from cury.cleaning import clean_code, rejection_reasons
+
+
+def _clean_code_reference(df1):
+    # versão original de clean_code
+    linhas_selecionadas = (df1['Delivery_person_Age'] != 'NaN ')
+    df1 = df1.loc[linhas_selecionadas, :].copy()
+    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype(int)
+    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(float)
+    df1['Order_Date'] = pd.to_datetime(df1['Order_Date'], format='%d-%m-%Y')
+    linhas_selecionadas2 = (df1['multiple_deliveries'] != 'NaN ')
+    df1 = df1.loc[linhas_selecionadas2, :].copy()
+    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype(int)
+
+    for col in ['ID', 'Road_traffic_density', 'Type_of_order', 'Type_of_vehicle', 'City', 'Festival']:
+        df1.loc[:, col] = df1.loc[:, col].str.strip()
+
+    df1 = df1.loc[df1['Road_traffic_density'] != 'NaN', :]
+    df1 = df1.loc[df1['City'] != 'NaN', :]
+    df1 = df1.loc[df1['Time_taken(min)'] != 'NaN', :]
+    df1 = df1.loc[df1['Festival'] != 'NaN ', :]
+
+    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply(lambda x: x.split('(min)')[1])
+    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
+    return df1
+
+
+def _normalize(df1):
+    # categóricas voltam a texto e inteiros ao int64, como na versão original
+    colunas = {}
+    for col in df1.columns:
+        serie = df1[col]
+        if isinstance(serie.dtype, pd.CategoricalDtype) or serie.dtype.kind not in 'biufM':
+            serie = serie.astype(object)
+        elif serie.dtype.kind in 'iu':
+            serie = serie.astype('int64')
+        colunas[col] = serie
+    return pd.DataFrame(colunas, index=df1.index)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_clean_code_matches_reference(seed):
+    df = synthetic_orders(3000, seed=seed)
+    esperado = _clean_code_reference(df)
+    assert 0 < len(esperado) < len(df)
+    pd.testing.assert_frame_equal(_normalize(clean_code(df)), _normalize(esperado))
+
+
+def test_invalid_integers_are_rejected():
+    df = synthetic_orders(20, seed=3)
+    df['Delivery_person_Age'] = '30'
+    df['multiple_deliveries'] = '1'
+    df['Time_taken(min)'] = '(min) 25'
+    df.loc[0, 'Delivery_person_Age'] = '200'
+    df.loc[1, 'multiple_deliveries'] = '1.5'
+    df.loc[2, 'Time_taken(min)'] = '(min) 99999'
+
+    motivos = rejection_reasons(df)
+    assert list(motivos[:3]) == ['Delivery_person_Age invalid', 'multiple_deliveries invalid',
+                                 'Time_taken(min) invalid']
+    assert list(clean_code(df).index) == list(df.index[motivos.isna()])
+
+
+def test_invalid_ratings_are_rejected():
+    df = synthetic_orders(20, seed=4)
+    df['Delivery_person_Ratings'] = '4.5'
+    df.loc[0, 'Delivery_person_Ratings'] = 'abc'
+    df.loc[1, 'Delivery_person_Ratings'] = '4,5'
+    # 'NaN ' continua aceito e vira NaN, como no astype(float)
+    df.loc[2, 'Delivery_person_Ratings'] = 'NaN '
+
+    motivos = rejection_reasons(df)
+    assert list(motivos[:2]) == ['Delivery_person_Ratings invalid'] * 2
+    assert motivos[2] != 'Delivery_person_Ratings invalid'
+    limpo = clean_code(df)
+    assert list(limpo.index) == list(df.index[motivos.isna()])
+    if 2 in limpo.index:
+        assert pd.isna(limpo.loc[2, 'Delivery_person_Ratings'])
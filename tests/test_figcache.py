@@ -0,0 +1,96 @@
+'''
+Cache de gráficos e resultados: descarte LRU, contadores de acertos e falhas e chaves
+iguais para filtros equivalentes (ordem das listas, datetime e date).
+'''
+# Import libraries
+import datetime
+
+import pytest
+
+from cury import figcache
+from cury.figcache import cache_info, cached_figure, cached_result, normalize_filters, result_cache_info
+
+
+@pytest.fixture
+def path(orders_csv):
+    return orders_csv(50, seed=120)
+
+
+def _builder(data, **kwargs):
+    return {'data': data, **kwargs}
+
+
+def _result(data, **kwargs):
+    return [data, kwargs]
+
+
+def test_normalize_filters_ignores_list_order():
+    assert normalize_filters(['Low', 'Jam', 'High']) == normalize_filters(['High', 'Low', 'Jam'])
+    assert normalize_filters({'traffic': ['Low', 'Jam'], 'city': ('Urban',)}) == \
+        normalize_filters({'city': ['Urban'], 'traffic': ('Jam', 'Low')})
+    assert normalize_filters(['Low', 'Jam']) != normalize_filters(['Low'])
+
+
+def test_normalize_filters_dates():
+    # o slider devolve datetime; o mesmo dia como date (ou outro horário) é outro recorte
+    assert normalize_filters(datetime.datetime(2022, 3, 10)) == normalize_filters(datetime.datetime(2022, 3, 10))
+    assert normalize_filters(datetime.datetime(2022, 3, 10)) != normalize_filters(datetime.date(2022, 3, 10))
+    assert normalize_filters(datetime.datetime(2022, 3, 10)) != normalize_filters(datetime.datetime(2022, 3, 10, 12))
+    hash(normalize_filters({'date': datetime.date(2022, 3, 10), 'traffic': ['Low']}))
+
+
+def test_equivalent_filters_share_the_cached_figure(path):
+    d = datetime.datetime(2022, 3, 10)
+    primeiro = cached_figure(_builder, 'a', (d, ['Low', 'Jam']), path)
+    assert cached_figure(_builder, 'b', (d, ['Jam', 'Low']), path) is primeiro
+    assert cached_figure(_builder, 'c', (d, ['Low']), path) is not primeiro
+    assert cached_figure(_builder, 'd', (d, ['Low', 'Jam']), path, kind='x') is not primeiro
+
+
+def test_hit_and_miss_counters(path):
+    assert cache_info() == {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': figcache.MAX_FIGURES}
+    for filtros in ['a', 'b', 'a', 'a', 'c', 'b']:
+        cached_figure(_builder, filtros, filtros, path)
+    assert cache_info() == {'hits': 3, 'misses': 3, 'size': 3, 'maxsize': figcache.MAX_FIGURES}
+    # os resultados de dados têm contadores próprios e não entram na taxa dos gráficos
+    assert result_cache_info()['hits'] == result_cache_info()['misses'] == 0
+    cached_result(_result, 'a', 'a', path)
+    cached_result(_result, 'a', 'a', path)
+    assert result_cache_info() == {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': figcache.MAX_RESULTS}
+    assert cache_info()['hits'] == 3
+
+    figcache.clear_figures()
+    assert cache_info()['size'] == cache_info()['hits'] == cache_info()['misses'] == 0
+    assert result_cache_info()['size'] == 0
+
+
+def test_lru_eviction(path, monkeypatch):
+    monkeypatch.setattr(figcache, 'MAX_FIGURES', 3)
+    chamadas = []
+
+    def builder(data):
+        chamadas.append(data)
+        return data
+
+    for filtros in ['a', 'b', 'c']:
+        cached_figure(builder, filtros, filtros, path)
+    # 'a' é usado de novo e passa a ser o mais recente: 'b' sai quando 'd' entra
+    cached_figure(builder, 'a', 'a', path)
+    cached_figure(builder, 'd', 'd', path)
+    assert cache_info()['size'] == 3
+    chamadas.clear()
+    for filtros in ['a', 'c', 'd']:
+        cached_figure(builder, filtros, filtros, path)
+    assert chamadas == []
+    cached_figure(builder, 'b', 'b', path)
+    assert chamadas == ['b']
+    assert cache_info()['size'] == 3
+
+
+def test_result_eviction_keeps_figures(path, monkeypatch):
+    monkeypatch.setattr(figcache, 'MAX_RESULTS', 2)
+    figura = cached_figure(_builder, 'f', 'f', path)
+    for filtros in ['a', 'b', 'c', 'd']:
+        cached_result(_result, filtros, filtros, path)
+    assert result_cache_info()['size'] == 2
+    assert cached_figure(_builder, 'f', 'f', path) is figura
@@ -0,0 +1,86 @@
+'''
+Grade espacial: as células filtradas e os totais do mapa precisam dar as mesmas contagens
+de pedidos do data frame filtrado (data < limite e isin do trânsito), ponto a ponto.
+'''
+# Import libraries
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cury import backend
+from cury.geobins import BIN_KEYS, CELL_DEG, POINTS, cell_totals, filter_geo_bins
+from cury.loader import load_orders
+
+D = datetime.datetime
+
+FILTROS = [
+    (None, None),
+    (D(2022, 3, 10), ['Low', 'Jam']),
+    (D(2022, 4, 1), ['High']),
+    (D(2022, 3, 1), []),
+    (D(2021, 1, 1), None),
+]
+
+
+@pytest.fixture(params=['pandas', 'duckdb'])
+def csv_path(request, orders_csv):
+    if request.param == 'duckdb':
+        pytest.importorskip('duckdb')
+    backend.configure(request.param)
+    yield orders_csv(3000, seed=150)
+    backend.configure('pandas')
+
+
+def _filtrar(df1, date_slider, traffic_options):
+    mascara = pd.Series(True, index=df1.index)
+    if date_slider is not None:
+        mascara &= df1['Order_Date'] < date_slider
+    if traffic_options is not None:
+        mascara &= df1['Road_traffic_density'].isin(traffic_options)
+    return df1[mascara]
+
+
+def _celulas(pedidos, layer):
+    lat, lon = POINTS[layer]
+    return pedidos.assign(ilat=np.floor(pedidos[lat] / CELL_DEG).astype(int),
+                          ilon=np.floor(pedidos[lon] / CELL_DEG).astype(int))
+
+
+@pytest.mark.parametrize('date_slider, traffic_options', FILTROS)
+@pytest.mark.parametrize('layer', POINTS)
+def test_filter_geo_bins_matches_filtered_orders(csv_path, date_slider, traffic_options, layer):
+    pedidos = _celulas(_filtrar(load_orders(csv_path), date_slider, traffic_options), layer)
+    bins = filter_geo_bins(backend.load_geo_bins(csv_path), date_slider, traffic_options)
+
+    cells = getattr(bins, layer).reset_index(drop=True)
+    esperado = pedidos.groupby(BIN_KEYS, observed=True).size().rename('orders').reset_index()
+    assert cells['Order_Date'].tolist() == esperado['Order_Date'].tolist()
+    assert cells['Road_traffic_density'].astype(str).tolist() == esperado['Road_traffic_density'].astype(str).tolist()
+    for col in ['ilat', 'ilon', 'orders']:
+        assert cells[col].tolist() == esperado[col].tolist(), col
+
+    # totais do mapa sem limite de células: pedidos por célula, no centro da célula
+    totais = cell_totals(bins, layer, max_cells=None)
+    por_celula = pedidos.groupby(['ilat', 'ilon']).size()
+    assert totais['orders'].tolist() == por_celula.tolist()
+    np.testing.assert_allclose(totais['lat'], (por_celula.index.get_level_values('ilat') + 0.5) * CELL_DEG)
+    np.testing.assert_allclose(totais['lon'], (por_celula.index.get_level_values('ilon') + 0.5) * CELL_DEG)
+    assert totais['orders'].sum() == len(pedidos)
+
+
+@pytest.mark.parametrize('max_cells', [1, 10, 100])
+def test_cell_totals_coarsening_keeps_orders(csv_path, max_cells):
+    pedidos = _celulas(load_orders(csv_path), 'delivery')
+    totais = cell_totals(backend.load_geo_bins(csv_path), 'delivery', max_cells)
+    assert len(totais) <= max_cells
+    assert totais['orders'].sum() == len(pedidos)
+
+    # blocos de fator x fator células: mesma contagem do agrupamento dos pedidos por bloco
+    fator = 1
+    while pedidos.groupby([pedidos['ilat'] // fator, pedidos['ilon'] // fator]).ngroups > max_cells:
+        fator *= 2
+    por_bloco = pedidos.groupby([pedidos['ilat'] // fator, pedidos['ilon'] // fator]).size()
+    assert totais['orders'].tolist() == por_bloco.tolist()
+    np.testing.assert_allclose(totais['lat'], (por_bloco.index.get_level_values(0) + 0.5) * CELL_DEG * fator)
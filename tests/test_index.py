@@ -0,0 +1,37 @@
+'''
+Índice de posições: filter_orders precisa dar o mesmo recorte das máscaras booleanas
+(data < limite e isin em cada coluna filtrada), na mesma ordem.
+'''
+# Import libraries
+import datetime
+
+import pandas as pd
+import pytest
+
+from cury.index import build_index, filter_orders
+from cury.loader import load_orders
+
+D = datetime.datetime
+
+FILTROS = [
+    (None, None),
+    (D(2022, 3, 10, 12), None),
+    (D(2022, 3, 10), {'Road_traffic_density': ['Low', 'Jam']}),
+    (D(2022, 4, 1), {'Road_traffic_density': ['High'], 'Weatherconditions': ['conditions Fog', 'conditions Sunny']}),
+    (None, {'Weatherconditions': ['conditions Cloudy', 'inexistente']}),
+    (D(2022, 3, 1), {'Road_traffic_density': []}),
+    (D(2021, 1, 1), None),
+    (D(2030, 1, 1), {'Road_traffic_density': ['Medium']}),
+]
+
+
+@pytest.mark.parametrize('date_slider, filters', FILTROS)
+def test_filter_orders_matches_masks(orders_csv, date_slider, filters):
+    df1 = load_orders(orders_csv(3000, seed=70))
+    mascara = pd.Series(True, index=df1.index)
+    if date_slider is not None:
+        mascara &= df1['Order_Date'] < date_slider
+    for col, valores in (filters or {}).items():
+        mascara &= df1[col].isin(valores)
+
+    pd.testing.assert_frame_equal(filter_orders(df1, build_index(df1), date_slider, filters), df1[mascara])
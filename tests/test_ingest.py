@@ -0,0 +1,102 @@
+'''
+Ingestão incremental: o csv, o cache colunar e o data frame em memória precisam ficar
+iguais aos de um build completo a partir do csv com os lotes anexados.
+'''
+# Import libraries
+import pandas as pd
+import pytest
+
+from cury import ingest, loader, store
+from cury.bench import synthetic_orders
+from cury.cleaning import prepare_orders
+
+pytestmark = pytest.mark.skipif(store.pa is None, reason='pyarrow não instalado')
+
+
+def _rebuild(path):
+    return prepare_orders(pd.read_csv(path))
+
+
+def _write_batch(path, n, seed, start, repeat=0):
+    lote = synthetic_orders(n, seed=seed, start=start)
+    # IDs repetidos dentro do lote
+    lote = pd.concat([lote, lote.iloc[:repeat]])
+    lote.to_csv(path, index=False)
+    return str(path)
+
+
+def test_ingest_equals_full_rebuild(orders_csv, tmp_path):
+    path = orders_csv(2000, seed=1)
+    # a última linha do histórico é descartada pela limpeza: o índice das linhas novas
+    # continua a contagem de linhas do csv, e não o maior índice do data frame limpo
+    historico = pd.read_csv(path)
+    historico.loc[len(historico) - 1, 'Delivery_person_Age'] = 'NaN '
+    historico.to_csv(path, index=False)
+    loader.load_orders(path)
+
+    # 100 IDs já existentes no histórico e 5 repetidos dentro do lote
+    lote = _write_batch(tmp_path / 'lote1.csv', 300, seed=2, start=1900, repeat=5)
+    with open(path, 'rb') as f:
+        antes = f.read()
+    report = ingest.ingest_batch(lote, path)
+    assert report.accepted + report.rejected == 305
+    assert report.reasons[ingest.DUPLICATE_REASON] > 0
+
+    # o csv recebe as linhas aceitas exatamente como estavam no lote
+    with open(lote, 'rb') as f:
+        linhas = ingest.batch_lines(f.read())
+    rejeitadas = set(report.rejected_rows['row'])
+    with open(path, 'rb') as f:
+        assert f.read() == antes + b''.join(l for i, l in enumerate(linhas) if i not in rejeitadas)
+
+    esperado = _rebuild(path)
+    pd.testing.assert_frame_equal(loader.load_orders(path), esperado)
+    # o cache colunar ganhou só um delta, e a leitura dele dá o mesmo resultado
+    assert len(store.fresh_chain(path)) == 2
+    loader.clear_cache()
+    pd.testing.assert_frame_equal(loader.load_orders(path), esperado)
+
+
+def test_consecutive_ingests_equal_full_rebuild(orders_csv, tmp_path):
+    path = orders_csv(1500, seed=3)
+    loader.load_orders(path)
+    for i in range(3):
+        lote = _write_batch(tmp_path / f'lote{i}.csv', 200, seed=10 + i, start=1500 + 150 * i)
+        ingest.ingest_batch(lote, path)
+
+    esperado = _rebuild(path)
+    pd.testing.assert_frame_equal(loader.load_orders(path), esperado)
+    pd.testing.assert_frame_equal(store.read_store(path), esperado)
+
+    # um build completo junta os deltas num arquivo só
+    store.build_store(path)
+    assert len(store.fresh_chain(path)) == 1
+    pd.testing.assert_frame_equal(store.read_store(path), esperado)
+
+
+def test_ingest_without_columnar_cache(orders_csv, tmp_path, monkeypatch):
+    path = orders_csv(800, seed=4)
+    monkeypatch.setattr(store, 'pa', None)
+    loader.load_orders(path)
+    ingest.ingest_batch(_write_batch(tmp_path / 'lote.csv', 100, seed=5, start=800), path)
+    pd.testing.assert_frame_equal(loader.load_orders(path), _rebuild(path))
+
+
+def test_ingest_rejects_out_of_range_rows(orders_csv, tmp_path):
+    path = orders_csv(500, seed=6)
+    loader.load_orders(path)
+    lote = synthetic_orders(50, seed=7, start=500)
+    lote['Delivery_person_Age'] = '30'
+    lote['multiple_deliveries'] = '1'
+    lote.loc[0, 'Delivery_person_Age'] = '200'
+    lote.loc[1, 'multiple_deliveries'] = '300'
+    lote.loc[2, 'Delivery_person_Age'] = '3x'
+    lote.to_csv(tmp_path / 'lote.csv', index=False)
+
+    report = ingest.ingest_batch(str(tmp_path / 'lote.csv'), path)
+    motivos = report.rejected_rows.set_index('row')['reason']
+    assert motivos[0] == 'Delivery_person_Age invalid'
+    assert motivos[1] == 'multiple_deliveries invalid'
+    assert motivos[2] == 'Delivery_person_Age invalid'
+    assert report.accepted == 50 - report.rejected
+    pd.testing.assert_frame_equal(loader.load_orders(path), _rebuild(path))
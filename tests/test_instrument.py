@@ -0,0 +1,60 @@
+'''
+Instrumentação: com a coleta ligada cada execução registra as etapas (tempo, linhas de
+entrada e saída, memória) no arquivo de métricas; desligada, nada é medido nem gravado.
+'''
+# Import libraries
+import json
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+from cury import instrument
+
+
+@pytest.fixture(autouse=True)
+def _desligar():
+    yield
+    instrument.configure('')
+    tracemalloc.stop()
+
+
+def _executar():
+    instrument.start_run('pagina')
+    df1 = pd.DataFrame({'a': range(10)})
+    with instrument.stage('filtro', rows_in=len(df1)) as s:
+        df_aux = df1[df1['a'] < 4]
+        s.rows_out = len(df_aux)
+    resultado = instrument.traced('soma', lambda df: df.groupby('a').sum(), df_aux)
+    return resultado, instrument.finish_run()
+
+
+def test_disabled_records_nothing(tmp_path):
+    instrument.configure('')
+    resultado, registro = _executar()
+    assert not instrument.enabled()
+    assert registro is None
+    assert len(resultado) == 4
+
+
+def test_run_records_stages_in_metrics_file(tmp_path):
+    arquivo = tmp_path / 'metricas.jsonl'
+    instrument.configure('memory', str(arquivo))
+    _, registro = _executar()
+    _, segundo = _executar()
+
+    assert [s['name'] for s in registro['stages']] == ['filtro', 'soma']
+    assert [(s['rows_in'], s['rows_out']) for s in registro['stages']] == [(10, 4), (4, 4)]
+    assert all(s['bytes'] is not None and s['seconds'] >= 0 for s in registro['stages'])
+    assert registro['seconds'] >= sum(s['seconds'] for s in registro['stages'])
+
+    linhas = [json.loads(linha) for linha in arquivo.read_text(encoding='utf-8').splitlines()]
+    assert linhas == [registro, segundo]
+
+
+def test_stages_outside_a_run_are_ignored(tmp_path):
+    instrument.configure('', str(tmp_path / 'metricas.jsonl'))
+    with instrument.stage('solta') as s:
+        s.rows_out = 1
+    assert instrument.finish_run() is None
+    assert not (tmp_path / 'metricas.jsonl').exists()
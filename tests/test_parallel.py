@@ -0,0 +1,34 @@
+'''
+Pré-processamento paralelo: as faixas de bytes cobrem todas as linhas do csv e o
+resultado é idêntico ao de prepare_orders(read_csv).
+'''
+# Import libraries
+import pandas as pd
+import pytest
+
+from cury.cleaning import prepare_orders
+from cury.parallel import byte_ranges, prepare_orders_parallel
+
+
+@pytest.mark.parametrize('workers', [1, 3, 8])
+def test_parallel_prepare_equals_prepare_orders(orders_csv, workers):
+    path = orders_csv(2500, seed=81)
+    pd.testing.assert_frame_equal(prepare_orders_parallel(path, workers), prepare_orders(pd.read_csv(path)))
+
+
+def test_byte_ranges_cover_every_line(orders_csv):
+    path = orders_csv(1000, seed=82)
+    with open(path, 'rb') as f:
+        f.readline()
+        inicio = f.tell()
+        linhas = f.read()
+    faixas = byte_ranges(path, 7)
+    assert faixas[0][0] == inicio
+    assert all(a[1] == b[0] for a, b in zip(faixas[:-1], faixas[1:]))
+    with open(path, 'rb') as f:
+        partes = []
+        for a, b in faixas:
+            f.seek(a)
+            partes.append(f.read(b - a))
+    assert all(parte.endswith(b'\n') for parte in partes)
+    assert b''.join(partes) == linhas
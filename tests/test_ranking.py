@@ -0,0 +1,60 @@
+'''
+Ranking dos entregadores: rank_couriers precisa dar as mesmas linhas do top_delivers
+original (groupby, ordenação completa por cidade e tempo, head(k) por cidade), incluindo
+os empates, desfeitos pelo ID do entregador.
+'''
+# Import libraries
+import numpy as np
+import pandas as pd
+import pytest
+
+from cury.loader import load_orders
+from cury.ranking import rank_couriers
+
+TIME = 'Time_taken(min)'
+
+
+def _aparada(serie, trim=0.1):
+    corte = int(np.floor(len(serie) * trim))
+    return serie.sort_values().iloc[corte:len(serie) - corte].mean()
+
+
+def _top_delivers(df1, top_asc, stat, k):
+    # top_delivers da página original, com a estatística no lugar da média
+    grupos = df1.loc[:, ['Delivery_person_ID', 'City', TIME]].groupby(['City', 'Delivery_person_ID'])[TIME]
+    df2 = grupos.agg(_aparada) if stat == 'trimmed' else grupos.agg(stat)
+    df2 = df2.reset_index().sort_values(['City', TIME], ascending=top_asc).reset_index(drop=True)
+    return pd.concat([df2.loc[df2['City'] == cidade, :].head(k) for cidade in sorted(df2['City'].unique())],
+                     ignore_index=True)
+
+
+def _assert_ranking(df1, stat, k):
+    ranking = rank_couriers(df1, k=k, stat=stat)
+    for resultado, top_asc in [(ranking.fastest, True), (ranking.slowest, False)]:
+        esperado = _top_delivers(df1, top_asc, stat, k)
+        assert resultado['City'].astype(str).tolist() == esperado['City'].astype(str).tolist()
+        assert resultado['Delivery_person_ID'].tolist() == esperado['Delivery_person_ID'].tolist()
+        np.testing.assert_allclose(resultado[TIME].to_numpy(dtype=float), esperado[TIME].to_numpy(dtype=float),
+                                   rtol=1e-12)
+
+
+@pytest.mark.parametrize('stat', ['mean', 'median', 'trimmed'])
+@pytest.mark.parametrize('k', [1, 10, 10_000])
+def test_rank_couriers_matches_top_delivers(orders_csv, stat, k):
+    _assert_ranking(load_orders(orders_csv(4000, seed=130)), stat, k)
+
+
+@pytest.mark.parametrize('stat', ['mean', 'median', 'trimmed'])
+def test_rank_couriers_ties_by_courier_id(stat):
+    # poucos valores de tempo possíveis: quase todos os entregadores empatam com outros,
+    # inclusive na fronteira do k-ésimo lugar; IDs embaralhados para não coincidir com a ordem das linhas
+    rng = np.random.default_rng(131)
+    n = 3000
+    ids = np.array([f'COURIER{i:03d}' for i in rng.permutation(200)])
+    df1 = pd.DataFrame({
+        'Delivery_person_ID': rng.choice(ids, n),
+        'City': rng.choice(['Urban', 'Metropolitian', 'Semi-Urban'], n),
+        TIME: rng.choice([10, 20, 30], n).astype(float),
+    })
+    for k in [1, 5, 10, 60]:
+        _assert_ranking(df1, stat, k)
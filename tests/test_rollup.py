@@ -0,0 +1,90 @@
+'''
+Cubo diário: os dados dos gráficos montados pelo cubo precisam ser iguais aos das
+agregações originais sobre os pedidos filtrados (groupby das páginas).
+'''
+# Import libraries
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cury import backend, couriers
+from cury.backend import Filters
+from cury.loader import load_orders
+from cury.rollup import build_cube, cube_count, filter_cube
+from cury.timeseries import weekly_series
+
+D = datetime.datetime
+
+FILTROS = [
+    (None, None),
+    (D(2022, 3, 10), ['Low', 'Jam']),
+    (D(2022, 4, 1), ['High', 'Medium']),
+    (D(2022, 3, 1), []),
+]
+
+
+@pytest.fixture
+def df1(orders_csv):
+    return load_orders(orders_csv(3000, seed=90))
+
+
+def _filtrar(df1, date_slider, traffic_options):
+    mascara = pd.Series(True, index=df1.index)
+    if date_slider is not None:
+        mascara &= df1['Order_Date'] < date_slider
+    if traffic_options is not None:
+        mascara &= df1['Road_traffic_density'].isin(traffic_options)
+    return df1[mascara]
+
+
+@pytest.mark.parametrize('date_slider, traffic_options', FILTROS)
+def test_cube_counts_match_groupby(df1, date_slider, traffic_options):
+    cube = filter_cube(build_cube(df1), date_slider, traffic_options)
+    pedidos = _filtrar(df1, date_slider, traffic_options)
+
+    for keys in (['Order_Date'], ['Road_traffic_density'], ['City', 'Road_traffic_density']):
+        # groupby das páginas originais: contagem de ID por chave
+        esperado = pedidos.loc[:, ['ID'] + keys].groupby(keys, observed=True).count().reset_index()
+        pd.testing.assert_frame_equal(cube_count(cube, keys), esperado, check_dtype=False)
+
+
+@pytest.mark.parametrize('date_slider, traffic_options', FILTROS)
+def test_weekly_series_matches_groupby(df1, date_slider, traffic_options):
+    cube = filter_cube(build_cube(df1), date_slider, traffic_options)
+    pedidos = _filtrar(df1, date_slider, traffic_options).copy()
+    semanal = weekly_series(cube)
+
+    # groupby das páginas originais: semana pelo '%U' (os dados são de um único ano)
+    pedidos['week_of_year'] = pedidos['Order_Date'].dt.strftime('%U').astype(int)
+    contagem = pedidos.loc[:, ['ID', 'week_of_year']].groupby('week_of_year').count().reset_index()
+    entregadores = pedidos.loc[:, ['Delivery_person_ID', 'week_of_year']].groupby('week_of_year').nunique().reset_index()
+    esperado = pd.merge(contagem, entregadores, how='inner')
+    esperado['order_by_deliver'] = esperado['ID'] / esperado['Delivery_person_ID']
+
+    assert semanal['week_of_year'].tolist() == esperado['week_of_year'].tolist()
+    assert semanal['orders'].tolist() == esperado['ID'].tolist()
+    np.testing.assert_allclose(semanal['orders_per_courier'], esperado['order_by_deliver'], rtol=1e-12)
+
+
+@pytest.mark.parametrize('filtros', [
+    {},
+    {'date': D(2022, 3, 10), 'traffic': ['Low', 'Jam']},
+    {'date': D(2022, 4, 1), 'weather': ['conditions Sunny', 'conditions Fog'], 'city': ['Urban']},
+    {'traffic': []},
+])
+@pytest.mark.parametrize('column', ['Road_traffic_density', 'Weatherconditions'])
+def test_rating_stats_from_cube_match_groupby(orders_csv, filtros, column):
+    path = orders_csv(3000, seed=91)
+    df1 = load_orders(path)
+    mascara = pd.Series(True, index=df1.index)
+    if 'date' in filtros:
+        mascara &= df1['Order_Date'] < filtros['date']
+    for campo, coluna in backend.FILTER_COLUMNS.items():
+        if campo in filtros:
+            mascara &= df1[coluna].isin(filtros[campo])
+
+    esperado = couriers.rating_stats(df1[mascara], column, 'label')
+    pd.testing.assert_frame_equal(backend.rating_stats(Filters(path=path, **filtros), column, 'label'), esperado,
+                                  check_dtype=False, rtol=1e-9)
@@ -0,0 +1,71 @@
+'''
+Servidor de métricas: respostas JSON para consultas válidas, parâmetros inválidos e falhas
+no cálculo dos KPIs.
+'''
+# Import libraries
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from cury import server
+from cury.metrics import KPIS
+
+
+@pytest.fixture
+def base_url(orders_csv):
+    httpd = server.make_server(port=0, path=orders_csv(500, seed=40))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _get(url):
+    try:
+        with urllib.request.urlopen(url) as resposta:
+            return resposta.status, json.loads(resposta.read())
+    except urllib.error.HTTPError as erro:
+        return erro.code, json.loads(erro.read())
+
+
+def test_kpi_and_invalid_params(base_url):
+    status, corpo = _get(f'{base_url}/metrics/orders_per_week?traffic=Low,Jam')
+    assert status == 200
+    assert corpo['kpi'] == 'orders_per_week'
+    status, corpo = _get(f'{base_url}/metrics/orders_per_week?date=ontem')
+    assert status == 400
+    assert 'error' in corpo
+
+
+@pytest.mark.parametrize('query', [
+    'courier_ranking?k=0', 'courier_ranking?k=-3', 'courier_ranking?k=dez',
+    'rolling_orders?window=-1', 'rolling_orders?window=0',
+])
+def test_out_of_range_integers_return_400(base_url, query):
+    status, corpo = _get(f'{base_url}/metrics/{query}')
+    assert status == 400
+    assert 'error' in corpo
+
+
+def test_valid_integers(base_url):
+    status, corpo = _get(f'{base_url}/metrics/courier_ranking?k=1')
+    assert status == 200
+    assert corpo['params'] == {'k': 1}
+    status, _ = _get(f'{base_url}/metrics/rolling_orders?window=1')
+    assert status == 200
+
+
+def test_unexpected_error_returns_500(base_url, monkeypatch, caplog):
+    def quebrado(date=None, path=None):
+        raise KeyError('coluna')
+
+    monkeypatch.setitem(KPIS, 'orders_per_week', quebrado)
+    with caplog.at_level('ERROR', logger='cury.server'):
+        status, corpo = _get(f'{base_url}/metrics/orders_per_week')
+    assert status == 500
+    assert corpo == {'error': "KeyError: 'coluna'"}
+    assert any(registro.exc_info for registro in caplog.records)
@@ -0,0 +1,56 @@
+'''
+Dataset compartilhado: o data frame anexado ao snapshot precisa ser igual ao carregado do
+csv, com as colunas apontando para o arquivo mapeado.
+'''
+# Import libraries
+import os
+
+import pandas as pd
+import pytest
+
+from cury import loader, shared
+from cury.bench import synthetic_orders
+
+pytestmark = pytest.mark.skipif(shared.pa is None, reason='pyarrow não instalado')
+
+
+def test_attach_equals_loaded_frame(orders_csv, tmp_path):
+    path = orders_csv(1000, seed=20)
+    esperado = loader.load_orders(path)
+    version = shared.publish(path, str(tmp_path / 'shm'))
+    df1 = shared.attach(path, version, str(tmp_path / 'shm'))
+    pd.testing.assert_frame_equal(df1, esperado)
+
+    # numéricas e códigos das categóricas são views somente leitura do arquivo mapeado
+    assert not df1['Delivery_person_Age'].to_numpy().flags.writeable
+    assert not df1['City'].cat.codes.to_numpy().flags.writeable
+    if isinstance(df1['ID'].array, pd.arrays.ArrowStringArray):
+        # strings Arrow (pandas 3): os buffers do texto também são os do arquivo
+        source = shared.pa.memory_map(shared._snapshot_path(path, version, str(tmp_path / 'shm')), 'r')
+        table = shared.pa.ipc.open_file(source).read_all()
+        texto = shared._from_table(table)['ID'].array._pa_array.chunk(0).buffers()[2]
+        assert texto.address == table.column('ID').chunk(0).buffers()[2].address
+
+
+def test_same_file_name_in_different_directories(tmp_path):
+    # dois train.csv publicados no mesmo diretório de snapshots não se sobrescrevem
+    shm = str(tmp_path / 'shm')
+    caminhos = []
+    for i, pasta in enumerate(['a', 'b']):
+        os.makedirs(tmp_path / pasta)
+        caminho = str(tmp_path / pasta / 'train.csv')
+        synthetic_orders(300 + 100 * i, seed=21 + i).to_csv(caminho, index=False)
+        caminhos.append(caminho)
+    versoes = [shared.publish(caminho, shm) for caminho in caminhos]
+
+    # republicar o segundo com outro conteúdo limpa só os snapshots antigos dele
+    synthetic_orders(600, seed=23).to_csv(caminhos[1], index=False)
+    shared.publish(caminhos[1], shm)
+    synthetic_orders(700, seed=24).to_csv(caminhos[1], index=False)
+    shared.publish(caminhos[1], shm)
+
+    assert shared.current_version(caminhos[0], shm) == versoes[0]
+    df1 = shared.attach(caminhos[0], versoes[0], shm)
+    pd.testing.assert_frame_equal(df1, loader.load_orders(caminhos[0]))
+    assert len(shared.attach(caminhos[1], shared.current_version(caminhos[1], shm), shm)) == len(
+        loader.load_orders(caminhos[1]))
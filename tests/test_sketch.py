@@ -0,0 +1,102 @@
+'''
+Sketches: os entregadores distintos do HyperLogLog ficam dentro do erro padrão de
+2**HLL_PRECISION registradores e os percentis do histograma logarítmico dentro do erro
+relativo QUANTILE_ACCURACY, comparados com nunique() e quantile() exatos.
+'''
+# Import libraries
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cury.loader import load_orders
+from cury.sketch import (COURIER_KEYS, HLL_PRECISION, QUANTILE_ACCURACY, QUANTILES, TIME_COLUMN, TIME_KEYS,
+                         build_sketches, distinct_couriers, filter_sketches, sketches_from_counts, time_quantiles)
+
+# erro padrão do HyperLogLog: 1,04 / sqrt(m); os testes aceitam 3 erros padrão
+HLL_ERROR = 1.04 / np.sqrt(2 ** HLL_PRECISION)
+
+
+@pytest.fixture
+def df1(orders_csv):
+    return load_orders(orders_csv(5000, seed=110))
+
+
+def _sketch_ids(ids):
+    couriers = pd.DataFrame({'Order_Date': pd.Timestamp('2022-03-01'), 'Road_traffic_density': 'Low',
+                             'Delivery_person_ID': ids})
+    times = pd.DataFrame({col: [] for col in TIME_KEYS + [TIME_COLUMN, 'count']})
+    return sketches_from_counts(couriers, times)
+
+
+@pytest.mark.parametrize('n', [10, 1000, 20_000, 200_000])
+def test_hll_within_standard_error(n):
+    ids = pd.Series([f'COURIER{i:07d}' for i in range(n)])
+    # repetições não mudam a estimativa
+    estimativa = distinct_couriers(_sketch_ids(pd.concat([ids, ids.iloc[: n // 2]])))
+    assert abs(estimativa - n) <= 3 * HLL_ERROR * n
+
+
+@pytest.mark.parametrize('keys', [[], ['Order_Date'], ['Road_traffic_density'], COURIER_KEYS])
+@pytest.mark.parametrize('date_slider, traffic', [(None, None), (datetime.datetime(2022, 3, 10), ['Low', 'Jam'])])
+def test_distinct_couriers_match_nunique(df1, keys, date_slider, traffic):
+    sketches = filter_sketches(build_sketches(df1), date_slider, traffic)
+    recorte = df1
+    if date_slider is not None:
+        recorte = recorte[recorte['Order_Date'] < date_slider]
+    if traffic is not None:
+        recorte = recorte[recorte['Road_traffic_density'].isin(traffic)]
+
+    estimativa = distinct_couriers(sketches, keys)
+    if not keys:
+        exato = recorte['Delivery_person_ID'].nunique()
+        assert abs(estimativa - exato) <= max(1, 3 * HLL_ERROR * exato)
+        return
+    exato = recorte.groupby(keys, observed=True)['Delivery_person_ID'].nunique().reset_index()
+    assert estimativa.loc[:, keys].astype(str).values.tolist() == exato.loc[:, keys].astype(str).values.tolist()
+    diferenca = np.abs(estimativa['Delivery_person_ID'].to_numpy() - exato['Delivery_person_ID'].to_numpy())
+    # a estimativa é arredondada para inteiro: em grupos pequenos a tolerância é de 1 entregador
+    assert (diferenca <= np.maximum(1, 3 * HLL_ERROR * exato['Delivery_person_ID'].to_numpy())).all()
+
+
+def _assert_quantiles(estimado, exato, keys):
+    assert estimado.loc[:, keys].astype(str).values.tolist() == exato.loc[:, keys].astype(str).values.tolist()
+    for nome in QUANTILES:
+        valores = exato[nome].to_numpy(dtype=float)
+        erro = np.abs(estimado[nome].to_numpy(dtype=float) - valores)
+        assert (erro <= QUANTILE_ACCURACY * valores * (1 + 1e-9)).all(), nome
+
+
+def _exact_quantiles(df, keys):
+    # o sketch devolve o elemento de ordem floor(q * (n - 1)): quantile com interpolação 'lower'
+    grupos = df.groupby(keys, observed=True)[TIME_COLUMN] if keys else df.assign(_g=0).groupby('_g')[TIME_COLUMN]
+    exato = pd.DataFrame({nome: grupos.quantile(q, interpolation='lower') for nome, q in QUANTILES.items()})
+    exato['n'] = grupos.size()
+    return exato.reset_index()
+
+
+@pytest.mark.parametrize('keys', [[], ['City'], ['City', 'Road_traffic_density'], ['Festival']])
+def test_time_quantiles_within_accuracy(df1, keys):
+    estimado = time_quantiles(build_sketches(df1), keys)
+    exato = _exact_quantiles(df1, keys)
+    _assert_quantiles(estimado, exato, keys)
+    assert estimado['n'].tolist() == exato['n'].tolist()
+
+
+def test_time_quantiles_on_continuous_values():
+    # valores contínuos em várias ordens de grandeza cruzam as bordas das faixas logarítmicas
+    rng = np.random.default_rng(111)
+    n = 50_000
+    times = pd.DataFrame({
+        'Order_Date': pd.Timestamp('2022-03-01'),
+        'City': rng.choice(['Urban', 'Metropolitian', 'Semi-Urban'], n),
+        'Road_traffic_density': 'Low',
+        'Festival': 'No',
+        TIME_COLUMN: rng.lognormal(3, 1.5, n),
+        'count': 1,
+    })
+    couriers = pd.DataFrame({'Order_Date': [], 'Road_traffic_density': [], 'Delivery_person_ID': []})
+    sketches = sketches_from_counts(couriers, times)
+    for keys in ([], ['City']):
+        _assert_quantiles(time_quantiles(sketches, keys), _exact_quantiles(times, keys), keys)
@@ -0,0 +1,132 @@
+'''
+Índice espacial em grade: as consultas por raio e de vizinhos mais próximos precisam dar
+o mesmo resultado de uma varredura com a distância haversine em todos os pontos.
+'''
+# Import libraries
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cury import backend, spatial
+from cury.backend import Filters
+from cury.geo import haversine_km
+from cury.loader import load_orders
+
+CELL = spatial.INDEX_CELL_DEG
+
+
+def _pontos(seed, n=3000):
+    # metade dos pontos exatamente sobre as linhas da grade (bordas das células)
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(12.0, 13.5, n)
+    lon = rng.uniform(77.0, 78.5, n)
+    lat[::2] = np.round(lat[::2] / CELL) * CELL
+    lon[1::4] = np.round(lon[1::4] / CELL) * CELL
+    return lat, lon
+
+
+def _varredura(lat, lon, centro_lat, centro_lon, raio):
+    distancias = haversine_km(centro_lat, centro_lon, lat, lon)
+    posicoes = np.flatnonzero(distancias <= raio)
+    return posicoes, distancias[posicoes]
+
+
+CONSULTAS = [
+    (12.5, 77.5, 1.0),
+    (12.5, 77.5, 30.0),
+    (12.0 + 3 * CELL, 77.0 + 7 * CELL, 2.5),   # centro no canto de uma célula
+    (12.73, 77.0 + 10 * CELL, CELL * 111.0),   # raio do tamanho de uma célula, centro na borda
+    (12.7, 77.7, 0.0),
+    (14.5, 79.5, 5.0),                         # longe de todos os pontos
+    (12.7, 77.7, 500.0),                       # todos os pontos
+]
+
+
+@pytest.mark.parametrize('centro_lat, centro_lon, raio', CONSULTAS)
+def test_query_radius_matches_scan(centro_lat, centro_lon, raio):
+    lat, lon = _pontos(100)
+    index = spatial.build_spatial_index(lat, lon)
+    posicoes, distancias = spatial.query_radius(index, centro_lat, centro_lon, raio)
+    esperado, esperado_dist = _varredura(lat, lon, centro_lat, centro_lon, raio)
+    np.testing.assert_array_equal(posicoes, esperado)
+    np.testing.assert_allclose(distancias, esperado_dist, rtol=1e-12)
+
+
+def test_query_radius_at_edges_of_the_grid():
+    # antimeridiano e polo: as faixas de longitude se dividem ou cobrem a volta inteira
+    rng = np.random.default_rng(101)
+    lat = np.concatenate([rng.uniform(-5, 5, 500), rng.uniform(85, 90, 500)])
+    lon = np.concatenate([rng.uniform(175, 180, 250), rng.uniform(-180, -175, 250), rng.uniform(-180, 180, 500)])
+    index = spatial.build_spatial_index(lat, lon)
+    for centro_lat, centro_lon, raio in [(0, 179.9, 200), (0, -179.99, 50), (89.5, 0, 300), (88, 120, 50)]:
+        posicoes, _ = spatial.query_radius(index, centro_lat, centro_lon, raio)
+        np.testing.assert_array_equal(posicoes, _varredura(lat, lon, centro_lat, centro_lon, raio)[0])
+
+
+@pytest.mark.parametrize('k', [1, 5, 50, 2999, 3000, 5000])
+def test_query_nearest_matches_scan(k):
+    lat, lon = _pontos(102)
+    index = spatial.build_spatial_index(lat, lon)
+    for centro_lat, centro_lon in [(12.5, 77.5), (12.0 + 4 * CELL, 77.0 + 4 * CELL), (20.0, 70.0)]:
+        posicoes, distancias = spatial.query_nearest(index, centro_lat, centro_lon, k)
+        esperado = haversine_km(centro_lat, centro_lon, lat, lon)
+        # k maior que a quantidade de pontos: todos os pontos, do mais próximo ao mais distante
+        assert len(posicoes) == min(k, len(lat))
+        np.testing.assert_allclose(distancias, np.sort(esperado)[:k], rtol=1e-12)
+        np.testing.assert_allclose(esperado[posicoes], distancias, rtol=1e-12)
+
+
+@pytest.fixture
+def csv_path(orders_csv):
+    return orders_csv(3000, seed=103)
+
+
+@pytest.mark.parametrize('filtros', [
+    {},
+    {'date': datetime.datetime(2022, 3, 20), 'traffic': ['Low', 'Jam']},
+    {'date': datetime.datetime(2022, 3, 1), 'weather': ['conditions Sunny']},
+])
+def test_radius_stats_matches_scan(csv_path, filtros):
+    df1 = load_orders(csv_path)
+    restaurantes = df1.loc[:, ['Restaurant_latitude', 'Restaurant_longitude']].drop_duplicates()
+    mascara = pd.Series(True, index=df1.index)
+    if 'date' in filtros:
+        mascara &= df1['Order_Date'] < filtros['date']
+    for campo, coluna in backend.FILTER_COLUMNS.items():
+        if campo in filtros:
+            mascara &= df1[coluna].isin(filtros[campo])
+    recorte = df1[mascara]
+
+    for i in range(0, len(df1), 600):
+        centro_lat, centro_lon = df1['Delivery_location_latitude'].iloc[i], df1['Delivery_location_longitude'].iloc[i]
+        for raio in [0.5, 5.0, 25.0, 150.0, 1000.0]:
+            dist = haversine_km(centro_lat, centro_lon, recorte['Delivery_location_latitude'].to_numpy(),
+                                recorte['Delivery_location_longitude'].to_numpy())
+            perto = recorte[dist <= raio]
+            semana = perto
+            if 'date' in filtros:
+                inicio = filtros['date'] - datetime.timedelta(days=backend.ACTIVE_DAYS)
+                semana = perto[perto['Order_Date'] >= inicio]
+            dist_rest = haversine_km(centro_lat, centro_lon, restaurantes['Restaurant_latitude'].to_numpy(),
+                                     restaurantes['Restaurant_longitude'].to_numpy())
+
+            stats = backend.radius_stats(Filters(path=csv_path, **filtros), centro_lat, centro_lon, raio)
+            assert stats == (len(perto), semana['Delivery_person_ID'].nunique(), int((dist_rest <= raio).sum()))
+
+
+@pytest.mark.parametrize('k', [1, 10, 10_000])
+def test_nearest_restaurants_matches_scan(csv_path, k):
+    df1 = load_orders(csv_path)
+    restaurantes = (df1.groupby(['Restaurant_latitude', 'Restaurant_longitude']).size()
+                    .rename('orders').reset_index())
+    centro_lat, centro_lon = df1['Restaurant_latitude'].median(), df1['Restaurant_longitude'].median()
+    dist = haversine_km(centro_lat, centro_lon, restaurantes['Restaurant_latitude'].to_numpy(),
+                        restaurantes['Restaurant_longitude'].to_numpy())
+    ordem = np.argsort(dist, kind='stable')[:k]
+
+    resultado = backend.nearest_restaurants(centro_lat, centro_lon, k, csv_path)
+    assert len(resultado) == min(k, len(restaurantes))
+    np.testing.assert_allclose(resultado['distance_km'], dist[ordem], rtol=1e-12)
+    assert resultado['orders'].sum() == restaurantes['orders'].iloc[ordem].sum()
@@ -0,0 +1,34 @@
+'''
+Partida dos pontos de entrada: a Home e o módulo de pré-cálculo não carregam o pandas e as
+páginas não carregam bibliotecas que não usam (medido num processo Python novo).
+'''
+# Import libraries
+import os
+import subprocess
+import sys
+
+import pytest
+
+from cury import loader, warmup
+from cury.bench import HEAVY_MODULES, ROOT, measure_startup
+
+pytest.importorskip('streamlit.testing.v1')
+
+
+def test_warmup_imports_only_the_standard_library():
+    script = f'import json, sys, cury.warmup; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))'
+    saida = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert saida.stdout.strip() == '[]'
+    # cópia de loader.DATA_PATH feita para não importar o loader
+    assert warmup.DATA_PATH == loader.DATA_PATH
+
+
+@pytest.mark.parametrize('entry, ausentes', [
+    ('Home.py', ['pandas', 'pyarrow', 'duckdb', 'folium', 'streamlit_folium', 'haversine']),
+    ('pages/2_visao_entregadores.py', ['folium', 'streamlit_folium', 'haversine']),
+    ('pages/3_visao_restaurante.py', ['folium', 'streamlit_folium', 'haversine']),
+])
+def test_entry_points_skip_unused_libraries(orders_csv, entry, ausentes):
+    workdir = os.path.dirname(orders_csv(500, seed=160))
+    _, modulos = measure_startup(entry, workdir, timeout=300)
+    assert not set(ausentes) & set(modulos)
@@ -0,0 +1,47 @@
+'''
+Cache colunar: o build em streaming precisa dar o mesmo data frame (e o mesmo arquivo) do
+build_store a partir de prepare_orders(read_csv), qualquer que seja o tamanho dos blocos.
+'''
+# Import libraries
+import pandas as pd
+import pytest
+
+from cury import store
+from cury.cleaning import prepare_orders
+
+pytestmark = pytest.mark.skipif(store.pa is None, reason='pyarrow não instalado')
+
+
+def _read_table(out):
+    with store.pa.memory_map(out) as source:
+        return store.pa.ipc.open_file(source).read_all()
+
+
+@pytest.mark.parametrize('chunksize', [250, 1000, 100_000])
+def test_streaming_build_equals_build_store(orders_csv, tmp_path, chunksize):
+    path = orders_csv(2500, seed=80)
+    completo = str(tmp_path / 'completo.feather')
+    streaming = str(tmp_path / 'streaming.feather')
+    store.build_store(path, completo)
+    store.build_store_streaming(path, streaming, chunksize)
+
+    esperado = prepare_orders(pd.read_csv(path))
+    pd.testing.assert_frame_equal(store.read_store(path, completo), esperado)
+    pd.testing.assert_frame_equal(store.read_store(path, streaming), esperado)
+    # mesmo schema (incluindo as categorias) e mesmos valores; só a divisão em record batches muda
+    assert _read_table(streaming).equals(_read_table(completo))
+
+
+def test_streaming_chunks_without_nan_text(orders_csv, tmp_path):
+    # os 'NaN ' ficam só no primeiro bloco: os demais blocos, lidos sozinhos, teriam as
+    # colunas de idade, avaliação e entregas múltiplas inferidas como numéricas
+    path = orders_csv(1000, seed=83)
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    for col in ['Delivery_person_Age', 'Delivery_person_Ratings', 'multiple_deliveries']:
+        df.loc[100:, col] = df.loc[100:, col].replace('NaN ', '1')
+        df.loc[5, col] = 'NaN '
+    df.to_csv(path, index=False)
+
+    streaming = str(tmp_path / 'streaming.feather')
+    store.build_store_streaming(path, streaming, 250)
+    pd.testing.assert_frame_equal(store.read_store(path, streaming), prepare_orders(pd.read_csv(path)))
@@ -0,0 +1,88 @@
+'''
+Resumo da visão restaurante: time_summary, festival_time e mean_distance precisam dar os
+mesmos valores dos groupbys originais de cada widget da página (mean/std por Festival,
+City, City x Type_of_order e City x Road_traffic_density e a distância média).
+'''
+# Import libraries
+import datetime
+
+import numpy as np
+import pytest
+
+from cury.loader import load_orders
+from cury.summary import festival_time, mean_distance, time_summary
+
+TIME = 'Time_taken(min)'
+
+
+@pytest.fixture
+def df1(orders_csv):
+    return load_orders(orders_csv(4000, seed=140))
+
+
+RECORTES = {
+    'todos': lambda df: df,
+    'data': lambda df: df[df['Order_Date'] < datetime.datetime(2022, 3, 10)],
+    'sem_festival': lambda df: df[df['Festival'] == 'No'],
+    'poucos': lambda df: df.head(7),
+    'um_pedido': lambda df: df.head(1),
+}
+
+
+def _avg_std(df, keys):
+    # groupby dos widgets originais: agg mean/std do tempo por chave
+    df_aux = df.loc[:, keys + [TIME]].groupby(keys, observed=True).agg({TIME: ['mean', 'std']})
+    df_aux.columns = ['avg_time', 'std_time']
+    return df_aux.reset_index()
+
+
+@pytest.mark.parametrize('recorte', RECORTES)
+def test_time_summary_matches_widget_groupbys(df1, recorte):
+    pedidos = RECORTES[recorte](df1)
+    summary = time_summary(pedidos)
+    tabelas = {'Festival': summary.festival, 'City': summary.city,
+               'City,Type_of_order': summary.city_order, 'City,Road_traffic_density': summary.city_traffic}
+    for chaves, tabela in tabelas.items():
+        keys = chaves.split(',')
+        esperado = _avg_std(pedidos, keys)
+        assert tabela.loc[:, keys].astype(str).values.tolist() == esperado.loc[:, keys].astype(str).values.tolist()
+        np.testing.assert_allclose(tabela['avg_time'], esperado['avg_time'], rtol=1e-9)
+        # grupos com um só pedido: desvio padrão indefinido (NaN) nos dois
+        np.testing.assert_allclose(tabela['std_time'], esperado['std_time'], rtol=1e-9, atol=1e-9)
+        assert tabela['n'].tolist() == pedidos.groupby(keys, observed=True).size().tolist()
+
+    distancia = pedidos.loc[:, ['City', 'distance']].groupby('City', observed=True).mean().reset_index()
+    np.testing.assert_allclose(summary.distance['distance'], distancia['distance'], rtol=1e-9)
+
+
+@pytest.mark.parametrize('recorte', RECORTES)
+def test_festival_time_and_mean_distance_match_original(df1, recorte):
+    pedidos = RECORTES[recorte](df1)
+    summary = time_summary(pedidos)
+    esperado = _avg_std(pedidos, ['Festival'])
+    for festival in ['Yes', 'No']:
+        for op in ['avg_time', 'std_time']:
+            # avg_std_time_delivery original: valor arredondado da linha do festival (vazio sem entregas)
+            linha = np.round(esperado.loc[esperado['Festival'] == festival, op], 2)
+            valor = festival_time(summary, festival, op)
+            if len(linha) == 0:
+                assert valor is None
+            elif np.isnan(linha.iloc[0]):
+                assert np.isnan(valor)
+            else:
+                assert valor == linha.iloc[0]
+    assert mean_distance(summary) == pytest.approx(np.round(pedidos['distance'].mean(), 2), abs=1e-9)
+
+
+def test_time_summary_of_empty_selection(df1):
+    summary = time_summary(df1.iloc[:0])
+    assert all(len(tabela) == 0 for tabela in summary)
+    assert festival_time(summary, 'Yes', 'avg_time') is None
+    assert mean_distance(summary) is None
+
+
+def test_time_summary_is_stable_for_large_times(df1):
+    # tempos com deslocamento grande: soma dos quadrados sem cancelamento numérico
+    pedidos = df1.assign(**{TIME: df1[TIME] + 1e9})
+    esperado = _avg_std(pedidos, ['City'])
+    np.testing.assert_allclose(time_summary(pedidos).city['std_time'], esperado['std_time'], rtol=1e-6)
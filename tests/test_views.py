@@ -0,0 +1,36 @@
+'''
+Gráficos da visão empresa montados a partir do cubo diário.
+'''
+# Import libraries
+import pandas as pd
+import pytest
+
+from cury import views
+from cury.bench import synthetic_orders
+from cury.cleaning import prepare_orders
+from cury.rollup import build_cube
+from cury.summary import time_summary
+
+
+def test_weekly_charts_keep_years_apart():
+    df = synthetic_orders(200, seed=30)
+    # a primeira semana de 2021 e a de 2022 têm o mesmo week_of_year
+    df['Order_Date'] = ['03-01-2021', '02-01-2022'] * 100
+    df1 = prepare_orders(df)
+    cube = build_cube(df1)
+
+    for fig in (views.Order_by_Week(cube), views.Order_Share_by_Week(cube)):
+        semanas = pd.to_datetime(pd.Series(fig.data[0].x))
+        assert list(semanas) == [pd.Timestamp('2021-01-03'), pd.Timestamp('2022-01-02')]
+    assert list(views.Order_by_Week(cube).data[0].y) == df1['Order_Date'].value_counts().sort_index().tolist()
+
+
+@pytest.mark.parametrize('cidades', [['Urban'], ['Urban', 'Metropolitian'], ['Urban', 'Metropolitian', 'Semi-Urban', 'Rural']])
+def test_distance_pie_pulls_one_slice_per_city(cidades):
+    df = synthetic_orders(200, seed=31)
+    df['City'] = (cidades * 200)[:200]
+    summary = time_summary(prepare_orders(df))
+
+    pie = views.distance(summary, True).data[0]
+    assert len(pie.pull) == len(pie.labels) == len(summary.distance)
+    assert list(pie.pull) == [0.1 if i == 1 else 0 for i in range(len(cidades))]